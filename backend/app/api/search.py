@@ -1,36 +1,163 @@
-from fastapi import APIRouter, Query
+import asyncio
+import base64
+import json
+import time
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
 from app.services.search_engine_service import search_engine_service
-from app.services.vector_db_service import vector_db_service
-from app.services.ai_models import models_loader, DEVICE
-import torch
+from app.services.visual_search import flatten_groups, search_frames, search_grouped
+from app.services.ai_models import models_loader
+from app.services.model_client import get_model_client
+from app.services.embedding_cache import text_embedding_cache
+from app.services.text_embedding_batcher import TextEmbeddingBatcher
+from app.services.hybrid_search import fuse_results
+from app.services.metrics import SEARCH_BACKEND_SECONDS, time_search_backend
 
 router = APIRouter()
 
+def _encode_texts(texts: list[str]) -> list[list[float]]:
+    """使用 CLIP 文本编码器把一批查询文本（padding 到同一长度）编码为向量；配置了模型服务时交给模型服务。"""
+    client = get_model_client()
+    if client is not None:
+        return client.embed_texts(texts).tolist()
+    return models_loader.encode_texts(texts).tolist()
+
+text_embedding_batcher = TextEmbeddingBatcher(
+    _encode_texts,
+    max_batch_size=settings.TEXT_EMBEDDING_BATCH_SIZE,
+    max_wait_ms=settings.TEXT_EMBEDDING_BATCH_WAIT_MS,
+)
+
+async def _embed_query(text: str) -> list[float]:
+    """查询向量：先查缓存，未命中时交给合并推理服务。"""
+    model_name = models_loader.CLIP_MODEL_NAME
+    # 缓存可能访问 Redis，放到线程池中执行以免阻塞事件循环
+    query_vector = await run_in_threadpool(text_embedding_cache.get, text, model_name)
+    if query_vector is None:
+        query_vector = await text_embedding_batcher.embed(text)
+        await run_in_threadpool(text_embedding_cache.put, text, model_name, query_vector)
+    return query_vector
+
+def _encode_search_after(values: list | None) -> str | None:
+    if values is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def _decode_search_after(cursor: str) -> list:
+    try:
+        score, subtitle_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [float(score), int(subtitle_id)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid search_after cursor")
+
 @router.get("/text", summary="Search subtitles by text")
-async def search_by_text(q: str = Query(..., min_length=1, description="Search query for subtitles")):
+async def search_by_text(
+    q: str = Query(..., min_length=1, description="Search query for subtitles"),
+    size: int = Query(10, ge=1, le=100, description="Page size"),
+    phrase: bool = Query(False, description="Match the words as a phrase, in order"),
+    slop: int = Query(0, ge=0, le=10, description="Positions allowed between the words of a phrase"),
+    video_id: int | None = Query(None, description="Only search the subtitles of this video"),
+    search_after: str | None = Query(None, description="Opaque cursor returned as next_search_after by the previous page"),
+):
     """
-    根据关键词在所有视频的字幕中进行全文检索。
+    根据关键词在所有视频的字幕中进行全文检索，按相关度 (BM25) 排序，每条结果带得分与高亮后的字幕。
+    用 search_after 游标翻页：每页的代价与翻到第几页无关，Elasticsearch 与本地索引的翻页语义相同。
     """
-    results = await search_engine_service.search_subtitles_by_text(query_text=q)
-    return {"query": q, "results": results}
+    cursor = _decode_search_after(search_after) if search_after else None
+    with time_search_backend("text", "text"):
+        page = await search_engine_service.search(
+            q, size=size, search_after=cursor, phrase=phrase, slop=slop, video_id=video_id,
+        )
+    return {
+        "query": q,
+        "total": page["total"],
+        "results": page["hits"],
+        "next_search_after": _encode_search_after(page["next_search_after"]),
+    }
 
 @router.get("/image-by-text", summary="Search images by text description")
-def search_image_by_text(q: str = Query(..., min_length=1, description="Textual description of an image to search for")):
-    """
-    以文搜图：使用文本描述在所有视频帧中检索最相似的图像。
-    """
-    # 1. 加载 CLIP 模型
-    clip_model, clip_processor = models_loader.get_clip_model_and_processor()
-    
-    # 2. 将查询文本编码为向量
-    inputs = clip_processor(text=[q], return_tensors="pt", padding=True).to(DEVICE)
-    with torch.no_grad():
-        text_features = clip_model.get_text_features(**inputs)
-    query_vector = text_features[0].cpu().numpy().tolist()
-    
-    # 3. 在 ChromaDB 中进行向量相似度查询
-    query_results = vector_db_service.collection.query(
-        query_embeddings=[query_vector],
-        n_results=10 # 返回最相似的 10 个结果
+async def search_image_by_text(
+    q: str = Query(..., min_length=1, description="Textual description of an image to search for"),
+    size: int = Query(10, ge=1, le=50, description="Number of videos to return"),
+    frames_per_video: int = Query(settings.VISUAL_SEARCH_FRAMES_PER_VIDEO, ge=1, le=20, description="Frames kept per video"),
+    mode: str | None = Query(None, pattern="^(coarse|flat)$", description="coarse: candidate videos first; flat: all frames"),
+):
+    """
+    以文搜图：使用文本描述检索最相似的视频帧。
+    默认先按视频摘要选出候选视频再检索其中的帧；结果按视频分组（groups），同一视频只保留几帧不同时间、不同镜头的画面。
+    results 为同样这些帧的 ChromaDB 结构，兼容旧的调用方。
+    """
+    # 1~2. 将查询文本编码为向量（热门查询直接命中缓存；并发请求合并为一批推理）
+    with time_search_backend("image-by-text", "query_embedding"):
+        query_vector = await _embed_query(q)
+
+    # 3. 粗排 → 精排检索帧，按视频分组去重
+    with time_search_backend("image-by-text", "visual"):
+        groups = await run_in_threadpool(
+            search_grouped, query_vector, size=size, frames_per_video=frames_per_video, mode=mode,
+        )
+    return {"query": q, "groups": groups, "results": flatten_groups(groups)}
+
+async def _timed(name: str, coroutine, timeout: float, timings: dict):
+    """执行一个后端查询并记录耗时；超时或出错时返回 None，不影响另一个后端的结果。"""
+    started = time.perf_counter()
+    # 先写入条目：请求被取消（CancelledError）时 finally 中也能正常记录，不会用 KeyError 掩盖取消
+    timings[name] = {"status": "cancelled"}
+    try:
+        result = await asyncio.wait_for(coroutine, timeout)
+        timings[name]["status"] = "ok"
+        return result
+    except asyncio.TimeoutError:
+        timings[name] = {"status": "timeout"}
+    except Exception as e:
+        print(f"Hybrid search: {name} backend failed: {e}")
+        timings[name] = {"status": "error", "error": str(e)}
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[name]["ms"] = round(elapsed * 1000, 2)
+        SEARCH_BACKEND_SECONDS.labels("hybrid", name, timings[name]["status"]).observe(elapsed)
+    return None
+
+async def _search_frames(q: str, n_results: int) -> dict:
+    query_vector = await _embed_query(q)
+    return await run_in_threadpool(search_frames, query_vector, n_results)
+
+@router.get("/hybrid", summary="Hybrid search over subtitles and frames")
+async def search_hybrid(
+    q: str = Query(..., min_length=1, description="Search query"),
+    size: int = Query(10, ge=1, le=100, description="Number of fused results"),
+    window_seconds: float = Query(10.0, gt=0, description="Time window used to group hits within a video"),
+):
+    """
+    混合检索：并发查询字幕全文索引与帧向量库，按 (视频, 时间窗口) 用倒数排名融合结果。
+    任一后端超时或出错时仍返回另一个后端的结果，总延迟取决于较慢的后端而不是两者之和。
+    """
+    started = time.perf_counter()
+    timeout = settings.HYBRID_SEARCH_TIMEOUT_MS / 1000
+    candidates = settings.HYBRID_CANDIDATES
+    timings: dict = {}
+    subtitle_hits, frame_hits = await asyncio.gather(
+        _timed("text", search_engine_service.search_subtitles_by_text(query_text=q, size=candidates), timeout, timings),
+        _timed("visual", _search_frames(q, candidates), timeout, timings),
     )
-    return {"query": q, "results": query_results}
\ No newline at end of file
+    results = fuse_results(
+        subtitle_hits or [],
+        frame_hits,
+        window_seconds=window_seconds,
+        rrf_k=settings.HYBRID_RRF_K,
+        text_weight=settings.HYBRID_TEXT_WEIGHT,
+        visual_weight=settings.HYBRID_VISUAL_WEIGHT,
+        size=size,
+    )
+    elapsed = time.perf_counter() - started
+    timings["total"] = {"ms": round(elapsed * 1000, 2)}
+    SEARCH_BACKEND_SECONDS.labels("hybrid", "total", "ok").observe(elapsed)
+    return {"query": q, "results": results, "timings": timings}
+
+@router.get("/image-by-text/stats", summary="Text embedding cache and batching statistics")
+def text_embedding_stats():
+    """
+    查询向量缓存的命中/未命中计数，以及合并推理的批次统计。
+    """
+    return {"cache": text_embedding_cache.stats(), "batcher": text_embedding_batcher.stats()}
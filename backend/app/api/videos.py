@@ -1,74 +1,277 @@
-import shutil
+import base64
+from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder # 从 fastapi.encoders 导入
-from sqlalchemy.orm import Session
-from sqlalchemy import desc 
-from app.database.base import get_db
-from app.models.video import Video
+from sqlalchemy import desc, or_, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.base import get_async_db
+from app.models.video import Video, TaskStatus
 from app.models.subtitle import Subtitle 
-from app.schemas.video import VideoCreateResponse
-from app.tasks.worker import process_video
+from app.models.stage_metric import VideoStageMetric
+from app.core.config import settings
+from app.schemas.video import VideoCreateResponse, UploadInitRequest, UploadStatusResponse
+from app.services.upload_service import StreamedUpload, UploadError, save_upload, resumable_uploads
 
 router = APIRouter()
-MEDIA_PATH = Path("/media")
 API_BASE_URL = "http://127.0.0.1:8000" # 用于构建封面URL
 
-@router.get("/", summary="Get a list of all videos")
-def get_video_list(db: Session = Depends(get_db)):
+# 列表与详情只查询需要的列，跳过 ORM 对象的构造
+VIDEO_COLUMNS = (Video.id, Video.filename, Video.filepath, Video.status, Video.created_at)
+SUBTITLE_COLUMNS = (Subtitle.id, Subtitle.video_id, Subtitle.start_time, Subtitle.end_time, Subtitle.text)
+
+def _cover_url(filename: str | None) -> str | None:
+    filename_without_ext = Path(filename or '').stem
+    if filename_without_ext:
+        return f"{API_BASE_URL}/media/{filename_without_ext}/cover.jpg"
+    return None # 处理异常情况
+
+def _video_row_to_dict(row) -> dict:
+    video_dict = jsonable_encoder(row._asdict())
+    # 帧目录与封面按存储的文件名（而不是客户端的原始文件名）定位
+    video_dict['cover_url'] = _cover_url(row.filepath)
+    return video_dict
+
+def _encode_cursor(created_at: datetime, video_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{video_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, video_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(video_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _encode_subtitle_cursor(start_time: float, subtitle_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{start_time!r}|{subtitle_id}".encode()).decode()
+
+def _decode_subtitle_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        start_time, subtitle_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return float(start_time), int(subtitle_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _query_subtitles(db: AsyncSession, video_id: int, start: float | None, end: float | None,
+                           limit: int | None = None, after: tuple[float, int] | None = None) -> list[dict]:
     """
-    获取所有视频的列表，按上传时间倒序排列，并为每个视频添加封面URL。
+    按 [start, end) 时间窗口读取字幕，按 (start_time, id) 排序，走 (video_id, start_time) 复合索引。
+    :param after: 键集游标 (start_time, id)，只返回排在它之后的字幕
     """
-    videos = db.query(Video).order_by(desc(Video.created_at)).all()
-    
-    # 将 SQLAlchemy 对象转换为可修改的字典
-    videos_data = jsonable_encoder(videos)
-    
-    # 动态添加 cover_url 字段
-    for video_dict in videos_data:
-        filename_without_ext = Path(video_dict.get('filename', '')).stem
-        if filename_without_ext:
-            video_dict['cover_url'] = f"{API_BASE_URL}/media/{filename_without_ext}/cover.jpg"
-        else:
-            video_dict['cover_url'] = None # 处理异常情况
-            
-    return videos_data
-
-@router.post("/upload", response_model=VideoCreateResponse)
-async def upload_video(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No filename found")
-
-    filepath = MEDIA_PATH / file.filename
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    video_obj = Video(filename=file.filename, filepath=str(filepath))
+    query = select(*SUBTITLE_COLUMNS).where(Subtitle.video_id == video_id)
+    if start is not None:
+        query = query.where(Subtitle.start_time >= start)
+    if end is not None:
+        query = query.where(Subtitle.start_time < end)
+    if after is not None:
+        query = query.where(or_(
+            Subtitle.start_time > after[0],
+            and_(Subtitle.start_time == after[0], Subtitle.id > after[1]),
+        ))
+    query = query.order_by(Subtitle.start_time, Subtitle.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [row._asdict() for row in (await db.execute(query)).all()]
+
+@router.get("/", summary="Get a page of videos")
+async def get_video_list(
+    limit: int = Query(50, ge=1, le=200, description="Page size"),
+    cursor: str | None = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    分页获取视频列表，按上传时间倒序排列，并为每个视频添加封面URL。
+    使用键集 (created_at, id) 分页：每页的代价与翻到第几页、库里有多少视频无关。
+    """
+    query = select(*VIDEO_COLUMNS)
+    if cursor:
+        created_at, video_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            Video.created_at < created_at,
+            and_(Video.created_at == created_at, Video.id < video_id),
+        ))
+    query = query.order_by(desc(Video.created_at), desc(Video.id)).limit(limit + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return {"items": [_video_row_to_dict(row) for row in rows], "next_cursor": next_cursor}
+
+def _enqueue_processing(video_id: int, duration: float | None):
+    # 任务模块（Celery 应用与处理流水线）只在第一次投递任务时导入，API 启动时不加载
+    from app.tasks.worker import enqueue_video_processing
+    enqueue_video_processing(video_id, duration)
+
+def _enqueue_clone(source_video_id: int, target_video_id: int):
+    from app.tasks.worker import clone_video_results
+    clone_video_results.delay(source_video_id, target_video_id)
+
+async def _register_upload(db: AsyncSession, upload: StreamedUpload) -> dict:
+    """
+    为已落盘的上传创建视频记录并投递任务（投递任务是同步的 broker 调用，放在线程池中执行）。
+    内容与已处理完成的视频相同时复用其结果，并删除这份重复的文件。
+    """
+    duration = upload.info.get("duration")
+    existing = (await db.execute(
+        select(Video.id, Video.filepath)
+        .where(Video.content_hash == upload.content_hash, Video.status == TaskStatus.COMPLETED)
+        .order_by(Video.id).limit(1)
+    )).first()
+    if existing:
+        await run_in_threadpool(upload.discard)
+        video_obj = Video(filename=upload.filename, filepath=existing.filepath, content_hash=upload.content_hash,
+                          duration=duration, size_bytes=upload.size)
+        db.add(video_obj)
+        await db.commit()
+
+        await run_in_threadpool(_enqueue_clone, existing.id, video_obj.id)
+
+        return {"message": "Video already processed, reusing results", "video_id": video_obj.id,
+                "cache_hit": True, "duration": duration}
+
+    video_obj = Video(filename=upload.filename, filepath=str(upload.path), content_hash=upload.content_hash,
+                      duration=duration, size_bytes=upload.size)
     db.add(video_obj)
-    db.commit()
-    db.refresh(video_obj)
+    await db.commit()
     
-    process_video.delay(video_obj.id)
+    await run_in_threadpool(_enqueue_processing, video_obj.id, duration)
     
-    return {"message": "Video uploaded successfully", "video_id": video_obj.id}
+    return {"message": "Video uploaded successfully", "video_id": video_obj.id, "cache_hit": False, "duration": duration}
+
+def _upload_http_error(e: UploadError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+# 请求体由 save_upload 直接解析，不声明 File 参数；这里补上 OpenAPI 文档中的表单结构
+_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object", "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}},
+        }}},
+    },
+}
+
+@router.post("/upload", response_model=VideoCreateResponse, openapi_extra=_UPLOAD_REQUEST_BODY)
+async def upload_video(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    单请求上传（multipart/form-data，字段名 file）：直接解析请求体流，文件内容写入唯一命名的临时文件，
+    同时计算 SHA-256；Content-Length 超过上限时不读取请求体即返回 413。
+    探测确认是可读的视频后原子地改名为最终文件，再创建记录并投递处理任务。
+    所有阻塞操作都在线程池中执行，不会阻塞事件循环。
+    """
+    try:
+        upload = await save_upload(request.headers, request.stream())
+    except UploadError as e:
+        raise _upload_http_error(e)
+    return await _register_upload(db, upload)
+
+# --- 可断点续传的分块上传 ---
+# 1. POST   /uploads                      声明文件名与大小，得到 upload_id
+# 2. PUT    /uploads/{upload_id}?offset=N  请求体为从 N 开始的一块原始字节；中断后用 GET 查询 offset 续传
+# 3. POST   /uploads/{upload_id}/complete  数据齐全后校验、入库并投递处理任务
+
+@router.post("/uploads", response_model=UploadStatusResponse, summary="Start a resumable upload")
+async def create_resumable_upload(body: UploadInitRequest):
+    try:
+        return await run_in_threadpool(resumable_uploads.create, body.filename, body.size)
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.get("/uploads/{upload_id}", response_model=UploadStatusResponse, summary="Get resumable upload progress")
+async def get_resumable_upload(upload_id: str):
+    try:
+        return await run_in_threadpool(resumable_uploads.status, upload_id)
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.put("/uploads/{upload_id}", response_model=UploadStatusResponse, summary="Upload one chunk")
+async def upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    # 单块最多缓冲 4 倍建议块大小，避免客户端一次发送整个文件占满内存
+    max_chunk = 4 * settings.UPLOAD_CHUNK_BYTES
+    data = bytearray()
+    async for part in request.stream():
+        data += part
+        if len(data) > max_chunk:
+            raise HTTPException(status_code=413, detail=f"Chunk larger than {max_chunk} bytes")
+    try:
+        return await run_in_threadpool(resumable_uploads.write_chunk, upload_id, offset, bytes(data))
+    except UploadError as e:
+        raise _upload_http_error(e)
+
+@router.post("/uploads/{upload_id}/complete", response_model=VideoCreateResponse, summary="Finish a resumable upload")
+async def complete_resumable_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    try:
+        upload = await run_in_threadpool(resumable_uploads.complete, upload_id)
+    except UploadError as e:
+        raise _upload_http_error(e)
+    return await _register_upload(db, upload)
+
+@router.delete("/uploads/{upload_id}", summary="Abort a resumable upload")
+async def abort_resumable_upload(upload_id: str):
+    try:
+        await run_in_threadpool(resumable_uploads.abort, upload_id)
+    except UploadError as e:
+        raise _upload_http_error(e)
+    return {"upload_id": upload_id, "aborted": True}
 
 @router.get("/{video_id}", summary="Get video details and subtitles")
-def get_video_details(video_id: int, db: Session = Depends(get_db)):
+async def get_video_details(
+    video_id: int,
+    start: float | None = Query(None, ge=0, description="Only subtitles starting at or after this time (seconds)"),
+    end: float | None = Query(None, gt=0, description="Only subtitles starting before this time (seconds)"),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    获取单个视频的详细信息，包括其所有字幕和封面URL。
+    获取单个视频的详细信息、封面URL，以及 [start, end) 时间窗口内的字幕（不传则返回全部字幕）。
     """
-    video = db.query(Video).filter(Video.id == video_id).first()
+    video = (await db.execute(select(*VIDEO_COLUMNS).where(Video.id == video_id))).first()
     
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    subtitles = db.query(Subtitle).filter(Subtitle.video_id == video_id).order_by(Subtitle.start_time).all()
-    
-    video_data = jsonable_encoder(video)
-    filename_without_ext = Path(video_data.get('filename', '')).stem
-    if filename_without_ext:
-        video_data['cover_url'] = f"{API_BASE_URL}/media/{filename_without_ext}/cover.jpg"
-    else:
-        video_data['cover_url'] = None
-        
-    return {"video": video_data, "subtitles": subtitles}
\ No newline at end of file
+    subtitles = await _query_subtitles(db, video_id, start, end)
+    return {"video": _video_row_to_dict(video), "subtitles": subtitles}
+
+@router.get("/{video_id}/subtitles", summary="Get subtitles in a time window")
+async def get_video_subtitles(
+    video_id: int,
+    start: float = Query(0, ge=0, description="Window start (inclusive, seconds)"),
+    end: float | None = Query(None, gt=0, description="Window end (exclusive, seconds)"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum number of subtitles"),
+    cursor: str | None = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    按时间窗口读取字幕，供播放器按播放进度增量加载。
+    使用键集 (start_time, id) 分页：把返回的 next_cursor 作为下一次请求的 cursor（start / end 保持不变），
+    开始时间相同的字幕不会重复返回，也不会因为同一时刻的字幕超过 limit 条而停在同一页。
+    """
+    after = _decode_subtitle_cursor(cursor) if cursor else None
+    subtitles = await _query_subtitles(db, video_id, start, end, limit=limit + 1, after=after)
+    next_cursor = None
+    if len(subtitles) > limit:
+        subtitles = subtitles[:limit]
+        next_cursor = _encode_subtitle_cursor(subtitles[-1]["start_time"], subtitles[-1]["id"])
+    return {"video_id": video_id, "subtitles": subtitles, "next_cursor": next_cursor}
+
+@router.get("/{video_id}/stage-metrics", summary="Get per-stage processing times")
+async def get_video_stage_metrics(video_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    视频处理各阶段的耗时（秒）、开始时刻与处理的帧数 / 字幕条数，按记录顺序返回；
+    重新处理过的视频会包含多次运行的记录。
+    """
+    rows = await db.execute(
+        select(
+            VideoStageMetric.stage, VideoStageMetric.started_offset, VideoStageMetric.seconds,
+            VideoStageMetric.items, VideoStageMetric.recorded_at,
+        )
+        .where(VideoStageMetric.video_id == video_id)
+        .order_by(VideoStageMetric.id)
+    )
+    return {"video_id": video_id, "stages": jsonable_encoder([row._asdict() for row in rows])}
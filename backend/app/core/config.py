@@ -5,15 +5,127 @@ class Settings(BaseSettings):
     POSTGRES_URL: str
     REDIS_URL: str
 
+    # 数据库连接池配置（API 进程的异步引擎）
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True          # 取出连接前先探测，数据库重启后自动丢弃失效连接
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_TIMEOUT_SECONDS: float = 30
+    # Celery worker 的同步引擎：每个 worker 进程只有少量并发的数据库操作
+    WORKER_DB_POOL_SIZE: int = 2
+    WORKER_DB_MAX_OVERFLOW: int = 4
+
     # ChromaDB 配置
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 8001
+
+    # 向量存储后端: chroma (ChromaDB 服务)、local (进程内内存映射索引，精确检索)
+    # 或 ivfpq (在 local 之上的 IVF + PQ 近似检索，适合百万级以上的帧)
+    VECTOR_BACKEND: str = "chroma"
+    VECTOR_DIM: int = 512                              # CLIP ViT-B/32 的向量维度
+    LOCAL_VECTOR_INDEX_PATH: str = "/media/.vector_index"
+    LOCAL_VECTOR_DTYPE: str = "float32"                # float32 或 float16（内存减半）
+    IVF_NLIST: int = 1024                              # 倒排分区数
+    IVF_NPROBE: int = 16                               # 查询时扫描的分区数
+    PQ_SUBSPACES: int = 64                             # PQ 子空间数，每个向量编码为这么多字节
+    IVF_RERANK: int = 200                              # 用全精度向量重排序的候选数
+
+    # 视频级向量摘要（video_summaries 集合）与以文搜图的粗排 → 精排；
+    # 启用前已处理的视频用 python build_vector_index.py summaries 补建摘要
+    VIDEO_SUMMARY_METHOD: str = "mean"                 # mean（每个镜头的均值）、kmeans（帧向量的聚类中心）或 none
+    VIDEO_SUMMARY_MAX_SEGMENTS: int = 16               # 每个视频最多的镜头 / 聚类摘要数（另有一条整体均值）
+    VISUAL_SEARCH_MODE: str = "coarse"                 # coarse（先按摘要选候选视频）或 flat（检索全部帧）
+    VISUAL_SEARCH_CANDIDATE_VIDEOS: int = 50           # 粗排选出的候选视频数
+    VISUAL_SEARCH_FRAMES_PER_VIDEO: int = 3            # 分组结果中每个视频最多的帧数
+    VISUAL_SEARCH_MIN_GAP_SECONDS: float = 10.0        # 同一视频中保留的帧至少相隔这么久
     
-    # Elasticsearch 配置
-    ELASTICSEARCH_HOSTS: str
+    # 字幕全文检索后端: elasticsearch，或 local（进程内的倒排索引，段文件内存映射，不需要 Elasticsearch）
+    TEXT_SEARCH_BACKEND: str = "elasticsearch"
+    LOCAL_TEXT_INDEX_PATH: str = "/media/.text_index"
+    LOCAL_TEXT_MERGE_FACTOR: int = 10          # 同一大小级别的段达到这个数量时合并为一个
+    LOCAL_TEXT_SEGMENT_DOCS: int = 50000       # 写入时每个段最多的字幕条数
+
+    # Elasticsearch 配置（TEXT_SEARCH_BACKEND=elasticsearch 时使用）
+    ELASTICSEARCH_HOSTS: str = "http://localhost:9200"
+    ES_INDEX_SHARDS: int = 1
+    ES_INDEX_REPLICAS: int = 0                 # 单节点部署没有副本可分配；多节点时按需调高
+    ES_INDEX_REFRESH_INTERVAL: str = "5s"      # 批量写入时拉长刷新间隔，新字幕最多延迟这么久可被检索
+    ES_BULK_CHUNK_SIZE: int = 2000             # 每个 bulk 请求的文档数
+    ES_BULK_CONCURRENCY: int = 4               # 同时在途的 bulk 请求数
+    ES_BULK_MAX_RETRIES: int = 3               # 可重试的失败文档（429 / 5xx）的最大重试次数
+    ES_BULK_RETRY_BACKOFF_SECONDS: float = 1.0 # 首次重试的等待时间，之后每次翻倍
+    SUBTITLE_DB_CHUNK_SIZE: int = 5000         # 字幕批量写库与按块读取的行数
+
+    # CLIP 帧向量化配置
+    CLIP_BATCH_SIZE: int = 32          # 每次前向推理的帧数
+    CLIP_PREFETCH_WORKERS: int = 4     # 预取下一批帧（解码 + 预处理）的线程数
+
+    # 以文搜图的查询向量缓存
+    TEXT_EMBEDDING_CACHE_SIZE: int = 1024            # 进程内 LRU 缓存的最大条目数
+    TEXT_EMBEDDING_CACHE_TTL_SECONDS: float = 3600   # 缓存条目的有效期
+    TEXT_EMBEDDING_CACHE_REDIS: bool = False         # 是否启用基于 REDIS_URL 的共享缓存层
+    TEXT_EMBEDDING_BATCH_SIZE: int = 32              # 合并推理时一批最多的查询数
+    TEXT_EMBEDDING_BATCH_WAIT_MS: float = 5          # 凑批的最长等待时间（毫秒）
+
+    # 混合检索配置
+    HYBRID_SEARCH_TIMEOUT_MS: float = 1500  # 单个后端的超时时间
+    HYBRID_CANDIDATES: int = 50             # 每个后端召回的候选数
+    HYBRID_RRF_K: int = 60                  # 倒数排名融合的平滑常数
+    HYBRID_TEXT_WEIGHT: float = 1.0         # 字幕检索的融合权重
+    HYBRID_VISUAL_WEIGHT: float = 1.0       # 帧检索的融合权重
+
+    # 抽帧配置
+    FRAME_SAMPLING_MODE: str = "adaptive"  # adaptive: 按镜头切换与画面变化抽帧；fixed: 固定间隔抽帧
+    FRAME_INTERVAL_SECONDS: int = 5        # fixed 模式的抽帧间隔（秒）
+    FRAME_CANDIDATE_FPS: float = 1.0       # adaptive 模式下解码候选帧的帧率
+    SCENE_CHANGE_THRESHOLD: float = 0.35   # 相邻候选帧灰度直方图差异（0~1）超过该值视为镜头切换
+    FRAME_DEDUP_HAMMING: int = 10          # 同一镜头内与上一保留帧的 dHash 汉明距离低于该值视为重复
+    FRAME_MAX_GAP_SECONDS: float = 60      # 静止镜头中两次保留之间的最长间隔，0 表示不强制
+    FRAME_STREAM_SHORT_SIDE: int = 224     # 流式抽帧时输出帧的短边像素，与 CLIP 输入尺寸一致
+    SAVE_FRAME_THUMBNAILS: bool = True     # 是否额外写出 JPEG 缩略图（仅供前端展示）
+
+    # 处理流水线配置
+    PIPELINE_TORCH_THREADS: int = 0        # 转写与帧向量化并发时每个阶段的 torch 线程数，0 表示核心数的一半
+    PIPELINE_MODE: str = "fused"           # fused: 单个任务内各阶段并发；split: 解码 / 转写 / 向量化作为独立任务路由到各自的队列
+    FAST_LANE_MAX_SECONDS: float = 600     # 时长不超过该值的视频进入 video-fast 快速通道
+    CELERY_VISIBILITY_TIMEOUT_SECONDS: int = 12 * 3600  # 未确认任务的重新投递超时，必须大于最长任务的执行时间
+
+    # 指标导出：API 在 /metrics 暴露；worker 主进程在该端口启动独立的 HTTP 服务，0 表示不启动
+    WORKER_METRICS_PORT: int = 9808
+
+    # 模型服务：设置后 API 与 worker 不再各自加载 Whisper / CLIP，而是作为客户端调用同一个模型服务进程
+    MODEL_SERVER_ADDRESS: str = ""             # Unix socket 路径（如 /media/.model_server.sock）或 host:port，空表示在本进程加载
+    MODEL_SERVER_AUTHKEY: str = ""             # 服务与客户端共享的密钥，使用模型服务时必须设置（连接上传输的是 pickle，知道密钥即可在服务端执行任意代码）
+    MODEL_SERVER_TEXT_BATCH_SIZE: int = 64     # 服务端合并文本请求的最大批大小
+    MODEL_SERVER_IMAGE_BATCH_SIZE: int = 64    # 服务端合并图像请求的最大批大小（帧数）
+    MODEL_SERVER_BATCH_WAIT_MS: float = 2      # 凑批的最长等待时间（毫秒）
+    MODEL_SERVER_TIMEOUT_SECONDS: float = 60   # 客户端等待向量化等请求返回的最长时间，超时后断开连接并报错
+    MODEL_SERVER_TRANSCRIBE_TIMEOUT_SECONDS: float = 14400  # 客户端等待转写返回的最长时间（长音频可能需要数小时）
+    MODEL_SERVER_TRANSCRIBE_CONCURRENCY: int = 2  # 服务端同时进行的转写数，超出的请求排队；并发的转写共享 torch 线程
+    WARMUP_MODELS: bool = False                # API 启动时预加载 CLIP 文本编码器（或连接模型服务），首个以文搜图请求不必等待加载
+    WORKER_PRELOAD_MODELS: bool = False        # 未使用模型服务时，worker 主进程在 fork 子进程前预加载模型（写时复制共享权重）
+
+    # CPU 推理配置
+    WHISPER_MODEL_SIZE: str = "base"           # tiny / base / small / medium / large，越大越准但越慢
+    QUANTIZE_WHISPER: bool = False             # CPU 上对 Whisper 的 Linear 层做动态 int8 量化
+    QUANTIZE_CLIP: bool = False                # CPU 上对 CLIP 的 Linear 层做动态 int8 量化；向量与 fp32 略有差异，切换后应重建帧向量
+    TORCH_NUM_THREADS: int = 0                 # 每个进程的 intra-op 线程数，0 表示 torch 默认（物理核心数）；多个 worker 进程共享节点时设为 核心数 / 进程数
+    TORCH_INTEROP_THREADS: int = 0             # 每个进程的 inter-op 线程数，0 表示 torch 默认
+
+    # 长音频分块转写配置
+    WHISPER_LONG_AUDIO_SECONDS: float = 1200   # 超过该时长的音频走分块并行转写
+    WHISPER_CHUNK_SECONDS: float = 300         # 目标分块时长，实际切分点落在附近的静音处
+    WHISPER_CHUNK_OVERLAP_SECONDS: float = 1.0 # 每块两侧额外读取的上下文
+    WHISPER_CHUNK_WORKERS: int = 0             # 转写进程数，0 表示可用 torch 线程数的一半，1 表示禁用分块模式；各进程平分 torch 线程数
+
+    # 上传配置
+    MEDIA_PATH: str = "/media"
+    MAX_UPLOAD_BYTES: int = 20 * 1024 ** 3     # 单个视频的大小上限，超过返回 413
+    UPLOAD_CHUNK_BYTES: int = 8 * 1024 ** 2    # 流式写盘的块大小，也是分块上传建议的块大小
+    UPLOAD_SESSION_TTL_HOURS: float = 24       # 未完成的分块上传保留多久
 
     # Pydantic-settings 会自动读取环境变量并填充这些字段
     class Config:
         case_sensitive = False
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
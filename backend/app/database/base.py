@@ -1,14 +1,53 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
-engine = create_engine(settings.POSTGRES_URL)
+def _pool_options(pool_size: int, max_overflow: int) -> dict:
+    # SQLite（测试与本地基准）使用默认的连接池，不接受这些参数
+    if make_url(settings.POSTGRES_URL).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+def _async_url(url: str):
+    """把同步驱动的连接串换成对应的异步驱动：postgresql -> asyncpg，sqlite -> aiosqlite。"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+# 同步引擎：Celery worker、流水线与建表使用。worker 进程内并发很低，连接池单独设置得较小
+engine = create_engine(
+    settings.POSTGRES_URL,
+    **_pool_options(settings.WORKER_DB_POOL_SIZE, settings.WORKER_DB_MAX_OVERFLOW),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 异步引擎：API 进程使用，请求在等待数据库时不占用线程
+async_engine = create_async_engine(
+    _async_url(settings.POSTGRES_URL),
+    **_pool_options(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
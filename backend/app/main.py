@@ -1,17 +1,62 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 
-from app.database.base import Base, engine
+from app.core.config import settings
+from app.database.base import Base, engine, async_engine
 from app.api import videos, search
+from app.services.metrics import render_latest
+from app.services.search_engine_service import search_engine_service
+
+
+def _warm_up_models():
+    from app.services.ai_models import models_loader
+    from app.services.model_client import get_model_client
+
+    client = get_model_client()
+    if client is not None:
+        # 模型在模型服务中，预热只需建立连接
+        client.embed_texts(["warm up"])
+    else:
+        # API 只用到 CLIP 文本编码器，不加载 Whisper
+        models_loader.warm_up(whisper=False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    启动时的初始化都放在这里而不是模块导入时：导入 app.main 不连接任何后端，
+    某个后端暂时不可用也不妨碍服务启动（/health 仍可响应），相应的接口在首次使用时再报错。
+    """
+    # 创建所有数据表
+    try:
+        await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    except Exception as e:
+        print(f"Could not create database tables at startup: {e}")
+
+    # 索引在启动时创建一次（带批量写入适用的分片 / 副本 / 刷新设置），写入路径不再重复尝试
+    try:
+        await search_engine_service.create_index_if_not_exists()
+    except Exception as e:
+        print(f"Could not create the subtitle search index at startup: {e}")
+
+    if settings.WARMUP_MODELS:
+        await run_in_threadpool(_warm_up_models)
+
+    yield
+
+    await async_engine.dispose()
+    await search_engine_service.close()
 
-# 在应用启动时创建所有数据表
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
     title="Intelligent Video Analysis Platform",
     description="An API for uploading, processing, and searching video content.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- 添加 CORS 中间件 ---
@@ -28,8 +73,8 @@ app.include_router(videos.router, prefix="/api/videos", tags=["Videos"])
 app.include_router(search.router, prefix="/api/search", tags=["Search"])
 
 # --- 挂载静态文件目录 ---
-# 这会将容器内的 /media 目录映射到 URL 路径 /media
-app.mount("/media", StaticFiles(directory="/media"), name="media")
+# 这会将容器内的 /media 目录映射到 URL 路径 /media（目录不存在时不在导入阶段报错）
+app.mount("/media", StaticFiles(directory=settings.MEDIA_PATH, check_dir=False), name="media")
 
 
 @app.get("/", tags=["Root"])
@@ -38,4 +83,10 @@ def read_root():
 
 @app.get("/health", tags=["Health Check"])
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", tags=["Health Check"], include_in_schema=False)
+def metrics():
+    """Prometheus 文本格式的指标：检索各后端的延迟直方图等。"""
+    content, content_type = render_latest()
+    return Response(content=content, media_type=content_type)
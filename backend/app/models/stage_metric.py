@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class VideoStageMetric(Base):
+    """处理一个视频时单个阶段的耗时与产出；重新处理会追加新的记录。"""
+    __tablename__ = "video_stage_metrics"
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
+    stage = Column(String(32))
+    started_offset = Column(Float)   # 相对于本次处理开始的时刻（秒），用于还原各阶段的重叠关系
+    seconds = Column(Float)
+    items = Column(Integer)          # 本阶段处理的帧数 / 字幕条数，没有意义时为空
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from app.database.base import Base
 
 class Subtitle(Base):
@@ -7,4 +7,7 @@ class Subtitle(Base):
     video_id = Column(Integer, ForeignKey("videos.id"))
     start_time = Column(Float)
     end_time = Column(Float)
-    text = Column(String)
\ No newline at end of file
+    text = Column(String)
+
+    # 按视频 + 时间窗口读取字幕时使用的复合索引
+    __table_args__ = (Index("ix_subtitles_video_id_start_time", "video_id", "start_time"),)
\ No newline at end of file
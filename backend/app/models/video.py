@@ -1,8 +1,8 @@
 import enum
-from sqlalchemy import Column, Integer, String, Enum as SAEnum, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Enum as SAEnum, DateTime, Index
 from sqlalchemy.sql import func
 from app.database.base import Base
-from . import subtitle
+from . import subtitle, stage_metric
 
 class TaskStatus(str, enum.Enum):
     PENDING = "PENDING"
@@ -15,5 +15,11 @@ class Video(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     filepath = Column(String)
+    content_hash = Column(String(64), index=True)  # 文件内容的 SHA-256，用于识别重复上传
+    duration = Column(Float)                        # 上传时 ffprobe 得到的时长（秒）
+    size_bytes = Column(BigInteger)
     status = Column(SAEnum(TaskStatus), default=TaskStatus.PENDING, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # 视频列表按 (created_at, id) 做键集分页
+    __table_args__ = (Index("ix_videos_created_at_id", "created_at", "id"),)
\ No newline at end of file
@@ -4,6 +4,19 @@ from app.models.video import TaskStatus
 class VideoCreateResponse(BaseModel):
     message: str
     video_id: int
+    cache_hit: bool = False  # 是否命中了已处理过的相同内容
+    duration: float | None = None
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    size: int  # 文件总字节数
+
+class UploadStatusResponse(BaseModel):
+    upload_id: str
+    filename: str | None = None
+    size: int
+    offset: int  # 服务端已收到的字节数，下一块应从这里开始
+    chunk_size: int | None = None
 
 class VideoStatusResponse(BaseModel):
     video_id: int
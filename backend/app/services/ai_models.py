@@ -1,13 +1,82 @@
-import whisper
-from transformers import CLIPProcessor, CLIPModel
-import torch
+import functools
+
+import numpy as np
+
+from app.core.config import settings
+
+# torch / whisper / transformers 体积很大，只在第一次真正用到模型时才导入；
+# 只转发请求给模型服务、或根本不做推理的进程（例如只提供列表接口的 API）不需要为它们付出导入时间和内存。
+
+
+@functools.cache
+def get_device() -> str:
+    """判断是否有可用的 GPU，否则使用 CPU"""
+    import torch
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"AI Models: Using device '{device}'")
+    return device
+
+
+@functools.cache
+def configure_torch_threads() -> tuple[int, int]:
+    """
+    按 TORCH_NUM_THREADS / TORCH_INTEROP_THREADS 设置本进程的 torch 线程数，每个进程只执行一次。
+    inter-op 线程数只能在第一次并行计算之前设置，因此在加载模型前调用。
+    """
+    import torch
+    if settings.TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(settings.TORCH_NUM_THREADS)
+    if settings.TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(settings.TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            print(f"AI Models: could not set inter-op threads: {e}")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def quantize_linear_layers(model):
+    """
+    对模型中的 Linear 层做动态 int8 量化（权重预先量化，激活在推理时按批量化），只适用于 CPU 推理。
+    Whisper 使用 nn.Linear 的子类，量化按精确类型匹配，先把它们还原为 nn.Linear。
+    """
+    import torch
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            # whisper.model.Linear 只是在前向时把权重转换为输入的 dtype，fp32 下与 nn.Linear 等价
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper_model(size: str | None = None, quantize: bool | None = None):
+    import whisper
+    size = size or settings.WHISPER_MODEL_SIZE
+    quantize = settings.QUANTIZE_WHISPER if quantize is None else quantize
+    model = whisper.load_model(size, device=get_device())
+    if quantize and get_device() == "cpu":
+        model = quantize_linear_layers(model)
+    return model.eval()
+
+
+def load_clip_model(quantize: bool | None = None):
+    from transformers import CLIPModel
+    quantize = settings.QUANTIZE_CLIP if quantize is None else quantize
+    model = CLIPModel.from_pretrained(AIModels.CLIP_MODEL_NAME).to(get_device())
+    if quantize and get_device() == "cpu":
+        model = quantize_linear_layers(model)
+    return model.eval()
+
+
+def __getattr__(name):
+    # 兼容旧的 `from app.services.ai_models import DEVICE`：访问时才检测设备
+    if name == "DEVICE":
+        return get_device()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 判断是否有可用的 GPU，否则使用 CPU
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"AI Models: Using device '{DEVICE}'")
 
 class AIModels:
     """一个单例类，用于在内存中只加载一次模型"""
+    CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
     _whisper_model = None
     _clip_model = None
     _clip_processor = None
@@ -15,21 +84,64 @@ class AIModels:
     @classmethod
     def get_whisper_model(cls):
         if cls._whisper_model is None:
-            print("Loading Whisper model...")
-            # 可以根据需要选择模型大小: tiny, base, small, medium, large
-            cls._whisper_model = whisper.load_model("base", device=DEVICE)
+            configure_torch_threads()
+            print(f"Loading Whisper model ({settings.WHISPER_MODEL_SIZE}, int8={settings.QUANTIZE_WHISPER})...")
+            cls._whisper_model = load_whisper_model()
             print("Whisper model loaded.")
         return cls._whisper_model
 
     @classmethod
     def get_clip_model_and_processor(cls):
         if cls._clip_model is None or cls._clip_processor is None:
-            print("Loading CLIP model...")
-            model_name = "openai/clip-vit-base-patch32"
-            cls._clip_model = CLIPModel.from_pretrained(model_name).to(DEVICE)
-            cls._clip_processor = CLIPProcessor.from_pretrained(model_name)
+            from transformers import CLIPProcessor
+            configure_torch_threads()
+            print(f"Loading CLIP model (int8={settings.QUANTIZE_CLIP})...")
+            cls._clip_model = load_clip_model()
+            cls._clip_processor = CLIPProcessor.from_pretrained(cls.CLIP_MODEL_NAME)
             print("CLIP model loaded.")
         return cls._clip_model, cls._clip_processor
 
-# 在模块加载时就初始化，确保 worker 启动时加载
-models_loader = AIModels()
\ No newline at end of file
+    @classmethod
+    def warm_up(cls, whisper: bool = True, clip: bool = True):
+        """预先加载模型（并做一次推理），让第一个请求不必承担加载耗时。"""
+        if clip:
+            cls.encode_texts(["warm up"])
+        if whisper:
+            cls.get_whisper_model()
+
+    @classmethod
+    def transcribe(cls, audio) -> dict:
+        """Whisper 转写：audio 为音频文件路径或 16kHz 的 float32 数组。"""
+        import torch
+        whisper_model = cls.get_whisper_model()
+        with torch.inference_mode():
+            return whisper_model.transcribe(audio, fp16=get_device() == "cuda")
+
+    @classmethod
+    def encode_texts(cls, texts: list[str]) -> np.ndarray:
+        """CLIP 文本编码：一批文本 padding 到同一长度后一次前向，返回 [n, dim] 的 float32 向量。"""
+        import torch
+        clip_model, clip_processor = cls.get_clip_model_and_processor()
+        inputs = clip_processor(text=texts, return_tensors="pt", padding=True).to(get_device())
+        with torch.inference_mode():
+            text_features = clip_model.get_text_features(**inputs)
+        return text_features.cpu().numpy().astype(np.float32, copy=False)
+
+    @classmethod
+    def encode_pixel_values(cls, pixel_values) -> np.ndarray:
+        """CLIP 图像编码：输入为预处理器产出的 pixel_values 张量。"""
+        import torch
+        clip_model, _ = cls.get_clip_model_and_processor()
+        with torch.inference_mode():
+            features = clip_model.get_image_features(pixel_values=pixel_values.to(get_device()))
+        return features.cpu().numpy().astype(np.float32, copy=False)
+
+    @classmethod
+    def encode_images(cls, images: list) -> np.ndarray:
+        """CLIP 图像编码：输入为 PIL.Image 或 HxWx3 的 uint8 数组。"""
+        _, clip_processor = cls.get_clip_model_and_processor()
+        inputs = clip_processor(images=images, return_tensors="pt")
+        return cls.encode_pixel_values(inputs["pixel_values"])
+
+# 模块加载时只创建单例，模型在第一次使用时加载（worker 可通过 WORKER_PRELOAD_MODELS 提前加载）
+models_loader = AIModels()
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class EmbeddingCache:
+    """
+    文本查询向量的缓存：进程内有界 LRU（带 TTL，线程安全），可选 Redis 作为多个 API 副本共享的第二层。
+    键由归一化后的查询文本与模型名组成。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600,
+        redis_url: str | None = None,
+        namespace: str = "text-embedding",
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+        self._redis = None
+        if redis_url:
+            import redis
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # CLIP 的分词器本身不区分大小写，多余空白也不影响结果
+        return " ".join(text.lower().split())
+
+    def _key(self, text: str, model_name: str) -> str:
+        return f"{self.namespace}:{model_name}:{self.normalize(text)}"
+
+    def get(self, text: str, model_name: str) -> list[float] | None:
+        key = self._key(text, model_name)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, vector = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+
+        vector = self._redis_get(key)
+        with self._lock:
+            if vector is not None:
+                self.redis_hits += 1
+                self._store(key, vector)
+            else:
+                self.misses += 1
+        return vector
+
+    def put(self, text: str, model_name: str, vector: list[float]):
+        key = self._key(text, model_name)
+        with self._lock:
+            self._store(key, vector)
+        self._redis_set(key, vector)
+
+    def get_or_compute(self, text: str, model_name: str, compute: Callable[[str], list[float]]) -> list[float]:
+        vector = self.get(text, model_name)
+        if vector is None:
+            vector = compute(text)
+            self.put(text, model_name, vector)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+                "redis_enabled": self._redis is not None,
+            }
+
+    def _store(self, key: str, vector: list[float]):
+        # 调用方需持有锁
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _redis_get(self, key: str) -> list[float] | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(key)
+        except Exception as e:
+            # Redis 只是加速层，不可用时退化为仅使用本地缓存
+            print(f"Embedding cache: Redis get failed: {e}")
+            return None
+        return np.frombuffer(raw, dtype=np.float32).tolist() if raw else None
+
+    def _redis_set(self, key: str, vector: list[float]):
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(key, np.asarray(vector, dtype=np.float32).tobytes(), ex=int(self.ttl_seconds))
+        except Exception as e:
+            print(f"Embedding cache: Redis set failed: {e}")
+
+
+text_embedding_cache = EmbeddingCache(
+    max_size=settings.TEXT_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.TEXT_EMBEDDING_CACHE_TTL_SECONDS,
+    redis_url=settings.REDIS_URL if settings.TEXT_EMBEDDING_CACHE_REDIS else None,
+)
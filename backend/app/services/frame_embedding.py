@@ -0,0 +1,89 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.ai_models import models_loader
+from app.services.model_client import get_model_client
+
+T = TypeVar("T")
+
+
+class FrameEmbedder:
+    """
+    批量计算视频帧的 CLIP 向量。
+    当前批次在模型中推理时，下一批帧已在线程池中完成解码与预处理（预取）。
+    配置了模型服务 (MODEL_SERVER_ADDRESS) 时，预处理与推理都在模型服务中进行，本进程只负责解码。
+    """
+
+    def __init__(self, batch_size: int | None = None, prefetch_workers: int | None = None):
+        self.batch_size = max(1, batch_size or settings.CLIP_BATCH_SIZE)
+        self.prefetch_workers = max(1, prefetch_workers or settings.CLIP_PREFETCH_WORKERS)
+        # 累计统计，用于计算 frames/sec
+        self.frames = 0
+        self.seconds = 0.0
+
+    @property
+    def frames_per_second(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+    def iter_batches(
+        self, items: Iterable[T], load_image: Callable[[T], object]
+    ) -> Iterator[tuple[list[T], np.ndarray]]:
+        """
+        :param items: 帧的来源（文件路径或内存中的帧），按顺序迭代
+        :param load_image: 将单个 item 解码为 PIL.Image / ndarray 的函数，在线程池中执行
+        :return: 逐批产出 (成功解码的 items, 形状为 [n, dim] 的 float32 向量)
+        """
+        client = get_model_client()
+        clip_processor = None if client else models_loader.get_clip_model_and_processor()[1]
+        source = iter(items)
+
+        def safe_load(item):
+            try:
+                return load_image(item)
+            except Exception as e:
+                print(f"Could not load frame {item}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.prefetch_workers) as decode_pool, \
+                ThreadPoolExecutor(max_workers=1) as prepare_pool:
+
+            def prepare(batch: list):
+                # 解码在多个线程中并行；预处理器只在单个线程里调用
+                images = list(decode_pool.map(safe_load, batch))
+                kept = [(item, image) for item, image in zip(batch, images) if image is not None]
+                if not kept:
+                    return [], None
+                images = [image for _, image in kept]
+                if client is not None:
+                    # 原始帧直接发给模型服务，由服务端统一预处理
+                    return [item for item, _ in kept], [np.asarray(image) for image in images]
+                inputs = clip_processor(images=images, return_tensors="pt")
+                return [item for item, _ in kept], inputs["pixel_values"]
+
+            def submit_next():
+                batch = list(islice(source, self.batch_size))
+                return prepare_pool.submit(prepare, batch) if batch else None
+
+            started = time.perf_counter()
+            pending = submit_next()
+            while pending is not None:
+                batch_items, inputs = pending.result()
+                pending = submit_next()
+                if inputs is None:
+                    continue
+
+                if client is not None:
+                    embeddings = client.embed_images(inputs)
+                else:
+                    embeddings = models_loader.encode_pixel_values(inputs)
+
+                self.frames += len(batch_items)
+                self.seconds = time.perf_counter() - started
+                yield batch_items, embeddings
+
+            self.seconds = time.perf_counter() - started
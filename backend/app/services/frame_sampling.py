@@ -0,0 +1,67 @@
+import numpy as np
+from PIL import Image
+
+from app.services.video_processing import StreamedFrame
+
+# 灰度转换系数（ITU-R BT.601）
+_GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+_HIST_BINS = 32
+
+
+def _signature(image: np.ndarray) -> tuple[int, np.ndarray]:
+    """
+    计算一帧的廉价视觉签名：64 位差值哈希 (dHash) 与 32 档灰度直方图。
+    先按步长 4 下采样，开销与帧尺寸基本无关。
+    """
+    gray = (image[::4, ::4].astype(np.float32) @ _GRAY_WEIGHTS).astype(np.uint8)
+    small = np.asarray(Image.fromarray(gray).resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = np.packbits((small[:, 1:] > small[:, :-1]).reshape(-1))
+    dhash = int.from_bytes(bits.tobytes(), "big")
+    hist = np.bincount((gray >> 3).reshape(-1), minlength=_HIST_BINS).astype(np.float32)
+    return dhash, hist / hist.sum()
+
+
+class AdaptiveFrameSampler:
+    """
+    场景感知的抽帧筛选：ffmpeg 以较高的候选帧率解码，这里决定哪些帧值得送进 CLIP。
+
+    - 相邻候选帧的灰度直方图差异超过 scene_threshold 视为镜头切换，保留新镜头的第一帧；
+    - 同一镜头内，只有与上一张保留帧的 dHash 汉明距离不小于 dedup_hamming 时才再保留一帧，
+      近似重复的画面在进入 CLIP 之前就被丢弃；
+    - max_gap_seconds > 0 时，长时间静止的镜头每隔这么久仍保留一帧，保证检索覆盖。
+    保留下来的帧会标注所属镜头编号 (StreamedFrame.scene)。
+    """
+
+    def __init__(self, scene_threshold: float = 0.35, dedup_hamming: int = 10, max_gap_seconds: float = 60):
+        self.scene_threshold = scene_threshold
+        self.dedup_hamming = dedup_hamming
+        self.max_gap_seconds = max_gap_seconds
+        self.scene = -1
+        self.seen = 0
+        self.kept = 0
+        self._prev_hist: np.ndarray | None = None
+        self._kept_hash: int | None = None
+        self._kept_timestamp = 0.0
+
+    def accept(self, frame: StreamedFrame) -> bool:
+        self.seen += 1
+        dhash, hist = _signature(frame.image)
+
+        if self._prev_hist is None or 0.5 * np.abs(hist - self._prev_hist).sum() > self.scene_threshold:
+            self.scene += 1
+            keep = True
+        elif (dhash ^ self._kept_hash).bit_count() >= self.dedup_hamming:
+            keep = True
+        else:
+            keep = self.max_gap_seconds > 0 and frame.timestamp - self._kept_timestamp >= self.max_gap_seconds
+        self._prev_hist = hist
+
+        if keep:
+            self._kept_hash = dhash
+            self._kept_timestamp = frame.timestamp
+            self.kept += 1
+            frame.scene = self.scene
+        return keep
+
+    def stats(self) -> dict:
+        return {"candidates": self.seen, "kept": self.kept, "scenes": self.scene + 1}
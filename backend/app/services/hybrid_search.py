@@ -0,0 +1,61 @@
+import math
+
+
+def _window_key(video_id, seconds: float, window_seconds: float) -> tuple:
+    return video_id, int(math.floor((seconds or 0.0) / window_seconds))
+
+
+def fuse_results(
+    subtitle_hits: list[dict],
+    frame_hits: dict | None,
+    window_seconds: float = 10.0,
+    rrf_k: int = 60,
+    text_weight: float = 1.0,
+    visual_weight: float = 1.0,
+    size: int = 10,
+) -> list[dict]:
+    """
+    把字幕检索结果与帧检索结果按 (video_id, 时间窗口) 聚合，并用加权的倒数排名融合 (RRF) 打分：
+        score = Σ weight / (rrf_k + rank)
+    同一窗口内的多条命中只按其中排名最高的一条计分，避免单一后端的重复命中主导排序。
+    :param subtitle_hits: 字幕检索结果（按相关度排序，含 video_id / start_time / text）
+    :param frame_hits: 向量检索的原始结果（ChromaDB 结构，只取第一个查询）
+    """
+    buckets: dict[tuple, dict] = {}
+
+    def bucket_for(video_id, seconds):
+        key = _window_key(video_id, seconds, window_seconds)
+        if key not in buckets:
+            buckets[key] = {
+                "video_id": video_id,
+                "window_start": key[1] * window_seconds,
+                "window_end": (key[1] + 1) * window_seconds,
+                "score": 0.0,
+                "sources": {},
+                "subtitles": [],
+                "frames": [],
+            }
+        return buckets[key]
+
+    for rank, hit in enumerate(subtitle_hits, start=1):
+        bucket = bucket_for(hit.get("video_id"), hit.get("start_time"))
+        if "text" not in bucket["sources"]:
+            bucket["sources"]["text"] = rank
+            bucket["score"] += text_weight / (rrf_k + rank)
+        bucket["subtitles"].append(hit)
+
+    if frame_hits and frame_hits.get("ids"):
+        ids = frame_hits["ids"][0]
+        metadatas = frame_hits["metadatas"][0]
+        distances = frame_hits["distances"][0]
+        for rank, (frame_id, metadata, distance) in enumerate(zip(ids, metadatas, distances), start=1):
+            bucket = bucket_for(metadata.get("video_id"), metadata.get("timestamp_approx"))
+            if "visual" not in bucket["sources"]:
+                bucket["sources"]["visual"] = rank
+                bucket["score"] += visual_weight / (rrf_k + rank)
+            bucket["frames"].append({"id": frame_id, "distance": distance, **metadata})
+
+    fused = sorted(buckets.values(), key=lambda b: b["score"], reverse=True)[:size]
+    for bucket in fused:
+        bucket["score"] = round(bucket["score"], 6)
+    return fused
@@ -0,0 +1,250 @@
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.local_vector_index import LocalVectorIndex
+
+# 每个子空间的码本大小，编码后每个子向量占 1 字节
+_PQ_CENTROIDS = 256
+_ASSIGN_CHUNK_ROWS = 65536
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """把每一行分配给最近的中心（平方 L2），分块计算以限制内存。"""
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), _ASSIGN_CHUNK_ROWS):
+        chunk = x[start:start + _ASSIGN_CHUNK_ROWS]
+        out[start:start + len(chunk)] = (c_norms[None, :] - 2.0 * (chunk @ centroids.T)).argmin(axis=1)
+    return out
+
+
+def _kmeans(x: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignment = _assign(x, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        # 按簇排序后用 reduceat 求和，比 np.add.at 快得多
+        order = np.argsort(assignment, kind="stable")
+        clusters, starts = np.unique(assignment[order], return_index=True)
+        sums = np.add.reduceat(x[order], starts, axis=0)
+        centroids[clusters] = sums / counts[clusters, None]
+        empty = counts == 0
+        if empty.any():
+            # 空簇重新随机取点
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFPQIndex(LocalVectorIndex):
+    """
+    在本地内存映射索引之上的近似最近邻检索：IVF 倒排分区 + 乘积量化（PQ）编码。
+
+    查询时只扫描距离最近的 nprobe 个分区，用 PQ 查表（ADC）估算距离，
+    取前 rerank 个候选再用全精度向量精确重排序。
+    全精度向量、元数据与增删操作完全复用 LocalVectorIndex；
+    训练前（或训练数据不足时）自动退化为精确检索。
+
+    训练结果保存在 ivfpq.npz，已编码部分的快照保存在 ivfpq_codes.npy / ivfpq_lists.npy；
+    训练之后新增的向量在读取日志时增量编码，不需要重新训练。
+    其他进程（例如 build_vector_index.py train）重新训练后，读取日志时会发现 ivfpq.npz 的修改时间变化并重新加载，无需重启。
+    """
+
+    def __init__(self, path: Path, dim: int = 512, dtype: str = "float32",
+                 nlist: int = 1024, m: int = 64, nprobe: int = 16, rerank: int = 200):
+        if dim % m != 0:
+            raise ValueError(f"dim ({dim}) must be divisible by the number of PQ subspaces ({m})")
+        self.nlist = nlist
+        self.m = m
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self._model_path = Path(path) / "ivfpq.npz"
+        self._codes_path = Path(path) / "ivfpq_codes.npy"
+        self._lists_path = Path(path) / "ivfpq_lists.npy"
+        self._coarse: np.ndarray | None = None       # [nlist, dim]
+        self._codebooks: np.ndarray | None = None    # [m, 256, dim / m]
+        self._codes = np.empty((0, m), dtype=np.uint8)
+        self._lists = np.empty(0, dtype=np.int32)
+        self._encoded = 0
+        self._list_order: np.ndarray | None = None   # 按分区排序后的行号
+        self._list_offsets: np.ndarray | None = None # 每个分区在 _list_order 中的起止位置
+        self._model_mtime: int | None = None          # 已加载的 ivfpq.npz 的修改时间（纳秒）
+        self._load_model()
+        super().__init__(path, dim=dim, dtype=dtype)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._coarse is not None
+
+    # ---------- 训练与编码 ----------
+
+    @staticmethod
+    def _mtime(path: Path) -> int | None:
+        try:
+            return path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load_model(self):
+        """加载 ivfpq.npz；编码快照只有在模型之后写入时才可用，否则所有向量重新编码。"""
+        model_mtime = self._mtime(self._model_path)
+        if model_mtime is None:
+            return
+        model = np.load(self._model_path)
+        self._coarse, self._codebooks = model["coarse"], model["codebooks"]
+        self.nlist, self.m = len(self._coarse), len(self._codebooks)
+        self._model_mtime = model_mtime
+        self._codes = np.empty((0, self.m), dtype=np.uint8)
+        self._lists = np.empty(0, dtype=np.int32)
+        self._encoded = 0
+        self._list_order = None
+        codes_mtime = self._mtime(self._codes_path)
+        if codes_mtime is not None and codes_mtime >= model_mtime and self._lists_path.exists():
+            self._codes = np.load(self._codes_path)
+            self._lists = np.load(self._lists_path)
+            self._encoded = len(self._lists)
+
+    def train(self, sample_size: int = 100_000, iterations: int = 20, seed: int = 0) -> dict:
+        """在现有向量的随机样本上训练粗量化器与 PQ 码本，然后对全部向量编码并保存快照。"""
+        self._refresh()
+        started = time.perf_counter()
+        with self._lock:
+            alive_rows = np.flatnonzero(self._alive[:self._rows])
+            if len(alive_rows) < _PQ_CENTROIDS:
+                raise ValueError(f"Need at least {_PQ_CENTROIDS} vectors to train, got {len(alive_rows)}")
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(alive_rows, min(sample_size, len(alive_rows)), replace=False))
+            sample = np.asarray(self._vectors[sample_rows], dtype=np.float32)
+
+        coarse = _kmeans(sample, min(self.nlist, len(sample) // 4 or 1), iterations, seed)
+        residuals = sample - coarse[_assign(sample, coarse)]
+        dsub = self.dim // self.m
+        codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), _PQ_CENTROIDS, iterations, seed + j)
+            for j in range(self.m)
+        ])
+        train_seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._coarse, self._codebooks = coarse, codebooks
+            self.nlist = len(coarse)
+            self._encoded = 0
+            self._codes = np.empty((0, self.m), dtype=np.uint8)
+            self._lists = np.empty(0, dtype=np.int32)
+            self._encode_tail()
+            # 先写临时文件再替换，避免其他进程读到写了一半的模型
+            tmp_path = self._model_path.with_name(self._model_path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(f, coarse=coarse, codebooks=codebooks)
+            os.replace(tmp_path, self._model_path)
+            self._model_mtime = self._mtime(self._model_path)
+            self.save_codes()
+        return {
+            "vectors": int(self._rows),
+            "train_samples": len(sample),
+            "nlist": self.nlist,
+            "m": self.m,
+            "train_seconds": round(train_seconds, 1),
+            "total_seconds": round(time.perf_counter() - started, 1),
+        }
+
+    def save_codes(self):
+        """保存已编码部分的快照，下次启动时只需编码快照之后新增的向量。"""
+        with self._lock:
+            for path, array in ((self._codes_path, self._codes), (self._lists_path, self._lists)):
+                tmp_path = path.with_name(path.name + ".tmp")
+                with open(tmp_path, "wb") as f:
+                    np.save(f, array[:self._encoded])
+                os.replace(tmp_path, path)
+
+    def _encode(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        lists = _assign(vectors, self._coarse)
+        residuals = vectors - self._coarse[lists]
+        dsub = self.dim // self.m
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _assign(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), self._codebooks[j])
+        return lists.astype(np.int32), codes
+
+    def _encode_tail(self):
+        """对尚未编码的新增行做增量编码（调用方需持有锁）。"""
+        if not self.is_trained or self._encoded >= self._rows:
+            return
+        lists, codes = [self._lists[:self._encoded]], [self._codes[:self._encoded]]
+        for start in range(self._encoded, self._rows, _ASSIGN_CHUNK_ROWS):
+            end = min(self._rows, start + _ASSIGN_CHUNK_ROWS)
+            chunk_lists, chunk_codes = self._encode(np.asarray(self._vectors[start:end], dtype=np.float32))
+            lists.append(chunk_lists)
+            codes.append(chunk_codes)
+        self._lists = np.concatenate(lists)
+        self._codes = np.concatenate(codes)
+        self._encoded = self._rows
+        self._list_order = None
+
+    def _refresh(self):
+        with self._lock:
+            model_mtime = self._mtime(self._model_path)
+            if model_mtime is not None and model_mtime != self._model_mtime:
+                self._load_model()
+            super()._refresh()
+            self._encode_tail()
+
+    def _inverted_lists(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._list_order is None:
+            self._list_order = np.argsort(self._lists[:self._encoded], kind="stable")
+            counts = np.bincount(self._lists[:self._encoded], minlength=self.nlist)
+            self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._list_order, self._list_offsets
+
+    # ---------- 检索 ----------
+
+    def search(self, queries, k, where=None, candidate_rows=None):
+        if candidate_rows is not None or not self.is_trained:
+            return super().search(queries, k, where, candidate_rows)
+
+        allowed = None
+        if where is not None:
+            allowed = self._filter_rows(where)
+            # 过滤后剩下的行很少时（例如只在几个视频内检索），直接精确检索更快也更准
+            if len(allowed) <= 4 * self.rerank:
+                return super().search(queries, k, candidate_rows=allowed)
+
+        order, offsets = self._inverted_lists()
+        dsub = self.dim // self.m
+        subspaces = np.arange(self.m)[None, :]
+        rows_out, dists_out = [], []
+        for query in queries:
+            coarse_dists = ((self._coarse - query) ** 2).sum(axis=1)
+            probes = np.argsort(coarse_dists)[:self.nprobe]
+            candidates, approx = [], []
+            for probe in probes:
+                rows = order[offsets[probe]:offsets[probe + 1]]
+                if len(rows) == 0:
+                    continue
+                # ADC：查询残差与每个子空间码本的距离表 [m, 256]，按编码查表求和
+                residual = (query - self._coarse[probe]).reshape(self.m, dsub)
+                table = ((self._codebooks - residual[:, None, :]) ** 2).sum(axis=2)
+                candidates.append(rows)
+                approx.append(table[subspaces, self._codes[rows]].sum(axis=1))
+            if not candidates:
+                rows_out.append(np.empty(0, dtype=np.int64))
+                dists_out.append(np.empty(0, dtype=np.float32))
+                continue
+
+            candidates, approx = np.concatenate(candidates), np.concatenate(approx)
+            keep = self._alive[candidates]
+            if allowed is not None:
+                keep &= np.isin(candidates, allowed, assume_unique=True)
+            candidates, approx = candidates[keep], approx[keep]
+            if len(candidates) > self.rerank:
+                candidates = candidates[np.argpartition(approx, self.rerank - 1)[:self.rerank]]
+
+            # 用全精度向量对候选精确重排序
+            rows, dists = super().search(query[None, :], k, candidate_rows=candidates)
+            rows_out.append(rows[0])
+            dists_out.append(dists[0])
+        return rows_out, dists_out
@@ -0,0 +1,537 @@
+import asyncio
+import bisect
+import fcntl
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.services.search_engine_service import (
+    HIGHLIGHT_POST_TAG, HIGHLIGHT_PRE_TAG, TextSearchBackend, next_search_after,
+)
+
+# 与 Elasticsearch standard 分析器的切分基本一致：中日文字每个字一个词，其余按连续的字母数字切分，统一小写
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]|(?:(?![{_CJK}])\w)+(?:['’](?:(?![{_CJK}])\w)+)*")
+
+# BM25 参数，与 Elasticsearch 的默认值相同（得分公式同 Lucene 8 起的 BM25Similarity，不含 k1 + 1 因子）
+_K1, _B = 1.2, 0.75
+
+_ARRAYS = ("ids", "video_ids", "start_times", "lengths", "text_offsets", "texts",
+           "term_offsets", "post_docs", "post_tfs", "pos_offsets", "positions")
+
+
+def tokenize(text: str) -> list[tuple[str, int, int]]:
+    """:return: [(词, 起始字符位置, 结束字符位置)]"""
+    return [(m.group().lower(), m.start(), m.end()) for m in _TOKEN_PATTERN.finditer(text or "")]
+
+
+def _phrase_starts(positions: list, slop: int) -> list[tuple[int, int]]:
+    """
+    按顺序匹配短语：positions[i] 为第 i 个查询词在文档中出现的位置（升序）。
+    从每个首词位置出发，贪心地取下一个词之后最近的位置；跨度比紧邻时多出的位置数不超过 slop 即为命中。
+    :return: 每处命中的 (首词位置, 末词位置)
+    """
+    spans = []
+    for start in positions[0]:
+        last = start
+        for term_positions in positions[1:]:
+            i = bisect.bisect_right(term_positions, last)
+            if i == len(term_positions):
+                return spans  # 后面的首词位置更大，也不可能再命中
+            last = term_positions[i]
+        if last - start - (len(positions) - 1) <= slop:
+            spans.append((start, last))
+    return spans
+
+
+def _exact_phrase(segment: "_Segment", postings: np.ndarray, order: list[int]) -> np.ndarray:
+    """
+    slop 为 0 的短语匹配，整体向量化：第 i 个查询词的位置减去 i 后与文档编号组合成键，
+    各词的键集合求交后非空的文档即为命中。
+    :param postings: [查询词, 候选文档] 的倒排表下标
+    :return: 每个候选文档是否命中
+    """
+    keys = None
+    for offset, term in enumerate(order):
+        starts = np.asarray(segment.pos_offsets[postings[term]])
+        counts = np.asarray(segment.pos_offsets[postings[term] + 1]) - starts
+        owners = np.repeat(np.arange(postings.shape[1], dtype=np.int64), counts)
+        index = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        term_keys = (owners << 32) + np.asarray(segment.positions[index], dtype=np.int64) + (len(order) - offset)
+        keys = term_keys if keys is None else np.intersect1d(keys, term_keys)
+    matched = np.zeros(postings.shape[1], dtype=bool)
+    matched[keys >> 32] = True
+    return matched
+
+
+def highlight(text: str, terms: list[str], phrase: bool = False, slop: int = 0) -> str:
+    """用 <em> 包裹命中的词；短语查询只标记组成短语的词。相邻的命中（例如连续的汉字）合并为一段。"""
+    tokens = tokenize(text)
+    marked = [False] * len(tokens)
+    if phrase and len(terms) > 1:
+        by_term: dict[str, list[int]] = {}
+        for position, (token, _, _) in enumerate(tokens):
+            by_term.setdefault(token, []).append(position)
+        if all(term in by_term for term in terms):
+            for start, end in _phrase_starts([by_term[term] for term in terms], slop):
+                wanted = set(terms)
+                for position in range(start, end + 1):
+                    if tokens[position][0] in wanted:
+                        marked[position] = True
+    else:
+        wanted = set(terms)
+        marked = [token in wanted for token, _, _ in tokens]
+
+    parts, cursor, open_end = [], 0, None
+    for (_, start, end), hit in zip(tokens, marked):
+        if not hit:
+            continue
+        if open_end is not None and start == open_end:
+            parts.append(text[open_end:end])  # 与上一个命中紧邻，延长同一段
+        else:
+            if open_end is not None:
+                parts.append(HIGHLIGHT_POST_TAG)
+            parts.append(text[cursor:start])
+            parts.append(HIGHLIGHT_PRE_TAG)
+            parts.append(text[start:end])
+        open_end = cursor = end
+    if open_end is not None:
+        parts.append(HIGHLIGHT_POST_TAG)
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def _tier(live_docs: int, merge_factor: int) -> int:
+    tier = 0
+    while live_docs >= merge_factor:
+        live_docs //= merge_factor
+        tier += 1
+    return tier
+
+
+def _write_segment(path: Path, docs: list[dict]) -> int:
+    """
+    把一批字幕（已按 id 排序、去重）写成一个段目录：先写到临时目录再改名，读取方不会看到写了一半的段。
+    :return: 词总数
+    """
+    rows: dict[str, list] = {name: [] for name in _ARRAYS}
+    postings: dict[str, list[tuple[int, list[int]]]] = {}
+    texts = bytearray()
+    rows["text_offsets"].append(0)
+    for row, doc in enumerate(docs):
+        text = doc.get("text") or ""
+        tokens = tokenize(text)
+        by_term: dict[str, list[int]] = {}
+        for position, (token, _, _) in enumerate(tokens):
+            by_term.setdefault(token, []).append(position)
+        for token, token_positions in by_term.items():
+            postings.setdefault(token, []).append((row, token_positions))
+        rows["ids"].append(doc["id"])
+        rows["video_ids"].append(doc["video_id"])
+        rows["start_times"].append(doc.get("start_time") or 0.0)
+        rows["lengths"].append(len(tokens))
+        texts += text.encode("utf-8")
+        rows["text_offsets"].append(len(texts))
+
+    terms = sorted(postings)
+    rows["term_offsets"].append(0)
+    rows["pos_offsets"].append(0)
+    for term in terms:
+        for row, token_positions in postings[term]:
+            rows["post_docs"].append(row)
+            rows["post_tfs"].append(len(token_positions))
+            rows["positions"].extend(token_positions)
+            rows["pos_offsets"].append(len(rows["positions"]))
+        rows["term_offsets"].append(len(rows["post_docs"]))
+
+    dtypes = {"ids": np.int64, "video_ids": np.int64, "start_times": np.float64, "lengths": np.int32,
+              "text_offsets": np.int64, "term_offsets": np.int64, "post_docs": np.int32, "post_tfs": np.int32,
+              "pos_offsets": np.int64, "positions": np.int32}
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, dtype in dtypes.items():
+        np.save(tmp / f"{name}.npy", np.asarray(rows[name], dtype=dtype))
+    np.save(tmp / "texts.npy", np.frombuffer(bytes(texts), dtype=np.uint8))
+    with open(tmp / "terms.json", "w", encoding="utf-8") as f:
+        json.dump(terms, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return int(sum(rows["lengths"]))
+
+
+class _Segment:
+    """一个不可变的段：按字幕 id 排序的文档、词典与倒排表（含词位置），数组以只读方式内存映射。"""
+
+    def __init__(self, path: Path):
+        self.name = path.name
+        for name in _ARRAYS:
+            setattr(self, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        with open(path / "terms.json", encoding="utf-8") as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def postings(self, term: str) -> tuple[int, int] | None:
+        i = self.terms.get(term)
+        return None if i is None else (int(self.term_offsets[i]), int(self.term_offsets[i + 1]))
+
+    def positions_of(self, posting: int) -> list[int]:
+        return self.positions[self.pos_offsets[posting]:self.pos_offsets[posting + 1]].tolist()
+
+    def document(self, row: int) -> dict:
+        text = bytes(self.texts[self.text_offsets[row]:self.text_offsets[row + 1]]).decode("utf-8")
+        return {"id": int(self.ids[row]), "video_id": int(self.video_ids[row]),
+                "start_time": float(self.start_times[row]), "text": text}
+
+
+@dataclass
+class _Snapshot:
+    """某一代清单对应的只读视图；查询在快照上进行，不受并发写入影响。"""
+    segments: list[tuple[_Segment, np.ndarray]]   # (段, 已删除标记)
+    docs: int                                      # 文档总数（含已删除、尚未合并的）
+    tokens: int                                    # 词总数，用于平均文档长度
+
+
+class LocalTextIndex(TextSearchBackend):
+    """
+    进程内的字幕倒排索引，BM25 打分，支持短语查询与高亮，不需要 Elasticsearch。
+
+    磁盘布局（目录 path 下）：
+      - manifest.json        : 当前的段列表与每个段的删除标记文件，整体替换（写临时文件再改名）
+      - segments/seg_NNNNNN/ : 不可变的段，一次写入的一批字幕；数组为 .npy 文件，查询时内存映射
+                               （词典 terms.json 在打开段时读入内存）
+      - segments/<段>/deletes_<代>.npy : 该段的删除标记，删除或覆盖写入时生成新的一代
+      - .lock                : 文件锁，写入方独占，读取方在加载清单与段时共享
+
+    写入与 Lucene 相同：新字幕写成新的段，同 id 的旧文档只标记删除；同一大小级别的段达到 merge_factor 个时
+    合并为一个，合并时丢弃已删除的文档。与 Elasticsearch 一样，BM25 的文档频率与平均长度包含已删除但尚未合并的文档。
+    API 进程与 worker 进程共享同一目录：每次查询前检查清单是否被替换，其他进程写入的字幕无需重启即可被检索到。
+    """
+
+    def __init__(self, path: Path, merge_factor: int = 10, segment_docs: int = 50000):
+        self.path = Path(path)
+        self.merge_factor = max(2, merge_factor)
+        self.segment_docs = segment_docs
+        self._segments_path = self.path / "segments"
+        self._manifest_path = self.path / "manifest.json"
+        self._lock_path = self.path / ".lock"
+        self._lock = threading.RLock()
+        self._manifest = {"generation": 0, "next_segment": 0, "segments": []}
+        self._manifest_stat = None
+        self._loaded: dict[str, _Segment] = {}
+        self._snapshot = _Snapshot([], 0, 0)
+        self._opened = False
+
+    # ---------- 存储 ----------
+
+    def _open(self):
+        if not self._opened:
+            self._segments_path.mkdir(parents=True, exist_ok=True)
+            self._opened = True
+
+    @contextmanager
+    def _file_lock(self, mode: int):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self, locked: bool = False):
+        """清单被（本进程或其他进程）替换后重新加载；未变化的段沿用已有的内存映射。"""
+        with self._lock:
+            self._open()
+            try:
+                stat = self._manifest_path.stat()
+                stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                return
+            if stat == self._manifest_stat:
+                return
+            if locked:
+                self._load_manifest(stat)
+            else:
+                # 共享锁保证加载期间写入方不会清理仍被清单引用的文件
+                with self._file_lock(fcntl.LOCK_SH):
+                    self._load_manifest(stat)
+
+    def _load_manifest(self, stat):
+        with open(self._manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        loaded, segments, docs, tokens = {}, [], 0, 0
+        for entry in manifest["segments"]:
+            segment = self._loaded.get(entry["name"]) or _Segment(self._segments_path / entry["name"])
+            loaded[entry["name"]] = segment
+            deletes = np.zeros(len(segment), dtype=bool) if entry["deletes"] is None \
+                else np.load(self._segments_path / entry["name"] / entry["deletes"])
+            segments.append((segment, deletes))
+            docs += entry["docs"]
+            tokens += entry["tokens"]
+        self._manifest, self._manifest_stat, self._loaded = manifest, stat, loaded
+        self._snapshot = _Snapshot(segments, docs, tokens)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            self._open()
+            with self._file_lock(fcntl.LOCK_EX):
+                self._refresh(locked=True)
+                yield
+
+    def _commit(self, entries: list[dict]):
+        """写入新一代清单，然后删除不再被引用的段与删除标记文件。调用方持有写锁。"""
+        manifest = {
+            "generation": self._manifest["generation"] + 1,
+            "next_segment": self._manifest["next_segment"],
+            "segments": entries,
+        }
+        tmp = self._manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._manifest_path)
+        self._manifest = manifest
+        self._refresh(locked=True)
+
+        # 其他进程已经映射的文件在删除后仍然可读；新的读取方只会按新清单加载
+        referenced = {entry["name"]: entry["deletes"] for entry in entries}
+        for directory in self._segments_path.iterdir():
+            if directory.name not in referenced:
+                shutil.rmtree(directory, ignore_errors=True)
+                continue
+            for file in directory.glob("deletes_*.npy"):
+                if file.name != referenced[directory.name]:
+                    file.unlink(missing_ok=True)
+
+    def _new_segment(self, docs: list[dict]) -> dict:
+        name = f"seg_{self._manifest['next_segment']:06d}"
+        self._manifest["next_segment"] += 1
+        tokens = _write_segment(self._segments_path / name, docs)
+        return {"name": name, "docs": len(docs), "deleted": 0, "deletes": None, "tokens": tokens}
+
+    def _mark_deleted(self, select) -> tuple[list[dict], int]:
+        """
+        :param select: select(段) -> 要删除的行（布尔数组）
+        :return: (更新后的清单条目, 新删除的文档数)；有变化的段写出新一代的删除标记文件
+        """
+        generation = self._manifest["generation"] + 1
+        entries, deleted = [], 0
+        for entry, (segment, deletes) in zip(self._manifest["segments"], self._snapshot.segments):
+            newly = select(segment) & ~deletes
+            count = int(newly.sum())
+            entry = dict(entry)
+            if count:
+                deletes = deletes | newly
+                entry["deletes"] = f"deletes_{generation}.npy"
+                entry["deleted"] += count
+                np.save(self._segments_path / entry["name"] / entry["deletes"], deletes)
+                deleted += count
+            entries.append(entry)
+        return entries, deleted
+
+    def _merge(self, entries: list[dict]) -> list[dict]:
+        """
+        分级合并：按存活文档数的数量级（以 merge_factor 为底）分级，同一级的段达到 merge_factor 个时合并为一个；
+        每篇文档只在升级时被重写，总写入量为 O(N log N)。全部删除的段直接丢弃。
+        """
+        segments = {segment.name: (segment, deletes) for segment, deletes in self._snapshot.segments}
+        entries = [entry for entry in entries if entry["docs"] > entry["deleted"]]
+        while True:
+            tiers: dict[int, list[dict]] = {}
+            for entry in entries:
+                tiers.setdefault(_tier(entry["docs"] - entry["deleted"], self.merge_factor), []).append(entry)
+            full = next((tier for tier in tiers.values() if len(tier) >= self.merge_factor), None)
+            if full is None:
+                return entries
+            docs = []
+            for entry in full:
+                if entry["name"] in segments:
+                    segment, _ = segments[entry["name"]]
+                    deletes = np.zeros(len(segment), dtype=bool) if entry["deletes"] is None \
+                        else np.load(self._segments_path / entry["name"] / entry["deletes"])
+                else:
+                    # 本次刚写入、尚未出现在快照中的段
+                    segment, deletes = _Segment(self._segments_path / entry["name"]), np.zeros(entry["docs"], dtype=bool)
+                docs.extend(segment.document(row) for row in np.flatnonzero(~deletes))
+            docs.sort(key=lambda doc: doc["id"])
+            merged = self._new_segment(docs)
+            names = {entry["name"] for entry in full}
+            entries = [entry for entry in entries if entry["name"] not in names] + [merged]
+
+    # ---------- 写入 ----------
+
+    def add_documents(self, docs: list[dict]) -> int:
+        """按字幕 id 覆盖写入一批字幕：已有的同 id 文档标记删除，新文档写成一个新的段。"""
+        docs = sorted({doc["id"]: doc for doc in docs}.values(), key=lambda doc: doc["id"])
+        if not docs:
+            return 0
+        ids = np.array([doc["id"] for doc in docs], dtype=np.int64)
+
+        def same_ids(segment):
+            if not len(segment):
+                return np.zeros(0, dtype=bool)
+            rows = np.searchsorted(segment.ids, ids).clip(0, len(segment) - 1)
+            mask = np.zeros(len(segment), dtype=bool)
+            mask[rows[segment.ids[rows] == ids]] = True
+            return mask
+
+        with self._write_lock():
+            entries, _ = self._mark_deleted(same_ids)
+            entries.append(self._new_segment(docs))
+            self._commit(self._merge(entries))
+        return len(docs)
+
+    def delete_where(self, video_id: int, max_id: int | None = None) -> int:
+        """删除一个视频的字幕；给出 max_id 时只删除 id 小于它的。"""
+        def select(segment):
+            mask = np.asarray(segment.video_ids) == video_id
+            if max_id is not None:
+                mask &= np.asarray(segment.ids) < max_id
+            return mask
+
+        with self._write_lock():
+            entries, deleted = self._mark_deleted(select)
+            if deleted:
+                self._commit(self._merge(entries))
+        return deleted
+
+    # ---------- 查询 ----------
+
+    def current_snapshot(self) -> _Snapshot:
+        self._refresh()
+        return self._snapshot
+
+    def search_sync(self, query_text: str, size: int = 10, search_after: list | None = None,
+                    phrase: bool = False, slop: int = 0, video_id: int | None = None) -> dict:
+        terms = [token for token, _, _ in tokenize(query_text)]
+        unique = list(dict.fromkeys(terms))
+        snapshot = self.current_snapshot()
+        if not unique or not snapshot.docs:
+            return {"total": 0, "hits": [], "next_search_after": None}
+
+        # 1. 各段中查询词的倒排表范围与全局文档频率
+        ranges = [[segment.postings(term) for term in unique] for segment, _ in snapshot.segments]
+        df = [sum(r[i][1] - r[i][0] for r in ranges if r[i] is not None) for i in range(len(unique))]
+        idf = np.array([math.log(1 + (snapshot.docs - n + 0.5) / (n + 0.5)) for n in df])
+        avgdl = snapshot.tokens / snapshot.docs
+
+        scores, ids, locations = [], [], []
+        for segment_index, ((segment, deletes), term_ranges) in enumerate(zip(snapshot.segments, ranges)):
+            if any(r is None for r in term_ranges):
+                continue
+            # 2. 从最短的倒排表开始求交（每个倒排表内的行号升序）
+            rows = None
+            for start, end in sorted(term_ranges, key=lambda r: r[1] - r[0]):
+                docs = np.asarray(segment.post_docs[start:end])
+                rows = docs if rows is None else np.intersect1d(rows, docs, assume_unique=True)
+                if not len(rows):
+                    break
+            keep = ~deletes[rows]
+            if video_id is not None:
+                keep &= np.asarray(segment.video_ids[rows]) == video_id
+            rows = rows[keep]
+            if not len(rows):
+                continue
+            # 每个候选文档在各查询词倒排表中的下标
+            postings = np.stack([start + np.searchsorted(segment.post_docs[start:end], rows)
+                                 for start, end in term_ranges])
+
+            # 3. 短语查询：用词位置验证词序与间距
+            if phrase and len(terms) > 1:
+                term_index = {term: i for i, term in enumerate(unique)}
+                order = [term_index[term] for term in terms]
+                if slop == 0:
+                    matched = _exact_phrase(segment, postings, order)
+                else:
+                    matched = [bool(_phrase_starts([segment.positions_of(postings[i, j]) for i in order], slop))
+                               for j in range(len(rows))]
+                rows, postings = rows[matched], postings[:, matched]
+                if not len(rows):
+                    continue
+
+            # 4. BM25
+            tf = np.asarray(segment.post_tfs)[postings].astype(np.float64)
+            lengths = np.asarray(segment.lengths[rows], dtype=np.float64)
+            norm = _K1 * (1 - _B + _B * lengths / avgdl)
+            scores.append((idf[:, None] * tf / (tf + norm)).sum(axis=0))
+            ids.append(np.asarray(segment.ids[rows]))
+            locations.append(np.stack([np.full(len(rows), segment_index), rows], axis=1))
+
+        if not scores:
+            return {"total": 0, "hits": [], "next_search_after": None}
+        scores, ids, locations = np.concatenate(scores), np.concatenate(ids), np.concatenate(locations)
+        total = len(scores)
+
+        # 5. 按 (得分降序, id 升序) 取 search_after 之后的一页
+        if search_after is not None:
+            after_score, after_id = float(search_after[0]), int(search_after[1])
+            keep = (scores < after_score) | ((scores == after_score) & (ids > after_id))
+            scores, ids, locations = scores[keep], ids[keep], locations[keep]
+        if len(scores) > size:
+            # 先用 argpartition 取出得分不低于第 size 名的候选，再对这一小部分排序（保留同分的全部文档）
+            threshold = np.partition(scores, len(scores) - size)[len(scores) - size]
+            keep = scores >= threshold
+            scores, ids, locations = scores[keep], ids[keep], locations[keep]
+        order = np.lexsort((ids, -scores))[:size]
+
+        hits = []
+        for i in order:
+            segment = snapshot.segments[locations[i, 0]][0]
+            doc = segment.document(int(locations[i, 1]))
+            doc["score"] = float(scores[i])
+            doc["highlight"] = highlight(doc["text"], terms if phrase else unique, phrase, slop)
+            hits.append(doc)
+        return {"total": total, "hits": hits, "next_search_after": next_search_after(hits, size)}
+
+    def stats(self) -> dict:
+        snapshot = self.current_snapshot()
+        deleted = sum(entry["deleted"] for entry in self._manifest["segments"])
+        return {"segments": len(snapshot.segments), "docs": snapshot.docs - deleted, "deleted": deleted}
+
+    # ---------- TextSearchBackend 接口 ----------
+
+    async def create_index_if_not_exists(self):
+        await asyncio.to_thread(self._refresh)
+
+    async def index_subtitle_batches(self, batches, chunk_size=None, concurrency=None, max_retries=None):
+        """逐批读取字幕，每 segment_docs 条写成一个段；chunk_size 等 bulk 参数对本地索引没有意义。"""
+        indexed, buffer = 0, []
+
+        async def flush():
+            nonlocal indexed, buffer
+            if buffer:
+                indexed += await asyncio.to_thread(self.add_documents, buffer)
+                buffer = []
+
+        if hasattr(batches, "__aiter__"):
+            async for batch in batches:
+                buffer.extend(batch)
+                if len(buffer) >= self.segment_docs:
+                    await flush()
+        else:
+            for batch in batches:
+                buffer.extend(batch)
+                if len(buffer) >= self.segment_docs:
+                    await flush()
+        await flush()
+        return {"indexed": indexed, "failed": 0, "errors": []}
+
+    async def delete_stale_subtitles(self, video_id, min_current_id):
+        return await asyncio.to_thread(self.delete_where, video_id, min_current_id)
+
+    async def delete_video(self, video_id):
+        return await asyncio.to_thread(self.delete_where, video_id)
+
+    async def search(self, query_text, size=10, search_after=None, phrase=False, slop=0, video_id=None):
+        return await asyncio.to_thread(self.search_sync, query_text, size, search_after, phrase, slop, video_id)
@@ -0,0 +1,287 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from app.services.vector_db_service import VectorBackend
+
+# 每次矩阵乘法处理的行数，限制查询时临时内存的大小
+_QUERY_CHUNK_ROWS = 65536
+
+
+def _matches(metadata: dict, where: dict | None) -> bool:
+    """实现 ChromaDB where 过滤语法的常用子集：等值、$eq/$ne/$in/$nin 以及 $and/$or。"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand: return False
+                if op == "$ne" and value == operand: return False
+                if op == "$in" and value not in operand: return False
+                if op == "$nin" and value in operand: return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _video_id_filter(where: dict | None):
+    """where 只按 video_id 过滤时返回允许的 video_id 集合，可走向量化的快速路径；否则返回 None。"""
+    if not where or list(where) != ["video_id"]:
+        return None
+    condition = where["video_id"]
+    if isinstance(condition, int):
+        return [condition]
+    if isinstance(condition, dict) and list(condition) == ["$eq"]:
+        return [condition["$eq"]]
+    if isinstance(condition, dict) and list(condition) == ["$in"]:
+        return list(condition["$in"])
+    return None
+
+
+class LocalVectorIndex(VectorBackend):
+    """
+    进程内的帧向量索引，精确 top-k 检索（一次矩阵乘法 + argpartition）。
+
+    磁盘布局（目录 path 下）：
+      - vectors.bin     : [capacity, dim] 的 float32/float16 内存映射数组，按需倍增扩容
+      - metadata.jsonl  : 只追加的操作日志（add / delete），记录 id 与元数据，启动时重放
+      - .lock           : 多进程写入时的文件锁
+
+    API 进程与 worker 进程共享同一目录：每次读写前都会读取日志中新增的部分，
+    因此其他进程追加的向量无需重启即可被检索到。删除只做标记，不回收空间。
+    """
+
+    def __init__(self, path: Path, dim: int = 512, dtype: str = "float32"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._vectors_path = self.path / "vectors.bin"
+        self._log_path = self.path / "metadata.jsonl"
+        self._lock_path = self.path / ".lock"
+        self._lock = threading.RLock()
+
+        self._vectors: np.memmap | None = None
+        self._capacity = 0
+        self._rows = 0                      # 已分配的行数（含已删除）
+        self._norms = np.empty(0, dtype=np.float32)        # 每行的平方范数
+        self._alive = np.empty(0, dtype=bool)
+        self._video_ids = np.empty(0, dtype=np.int64)      # 每行的 video_id，用于快速过滤
+        self._ids: list[str] = []
+        self._metadatas: list[dict] = []
+        self._row_by_id: dict[str, int] = {}
+        self._log_offset = 0
+        self._refresh()
+
+    # ---------- 存储 ----------
+
+    def _map_vectors(self, min_rows: int):
+        """保证内存映射至少覆盖 min_rows 行；文件不够大时按倍增扩容。"""
+        row_bytes = self.dim * self.dtype.itemsize
+        file_rows = self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+        if file_rows < min_rows:
+            new_capacity = max(1024, file_rows)
+            while new_capacity < min_rows:
+                new_capacity *= 2
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(new_capacity * row_bytes)
+            file_rows = new_capacity
+        if self._vectors is None or file_rows != self._capacity:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(file_rows, self.dim))
+            self._capacity = file_rows
+
+    def _grow_row_arrays(self, rows: int):
+        if len(self._alive) >= rows:
+            return
+        size = max(rows, 2 * len(self._alive), 1024)
+        self._norms = np.resize(self._norms, size)
+        self._alive = np.concatenate([self._alive, np.zeros(size - len(self._alive), dtype=bool)])
+        self._video_ids = np.concatenate([self._video_ids, np.full(size - len(self._video_ids), -1, dtype=np.int64)])
+
+    def _apply(self, entry: dict):
+        if entry["op"] == "add":
+            row = entry["row"]
+            self._grow_row_arrays(row + 1)
+            old_row = self._row_by_id.get(entry["id"])
+            if old_row is not None:
+                self._alive[old_row] = False
+            while len(self._ids) <= row:
+                self._ids.append("")
+                self._metadatas.append({})
+            self._ids[row] = entry["id"]
+            self._metadatas[row] = entry["metadata"]
+            self._row_by_id[entry["id"]] = row
+            self._alive[row] = True
+            video_id = entry["metadata"].get("video_id")
+            self._video_ids[row] = video_id if isinstance(video_id, int) else -1
+            self._rows = max(self._rows, row + 1)
+        elif entry["op"] == "delete":
+            row = self._row_by_id.pop(entry["id"], None)
+            if row is not None:
+                self._alive[row] = False
+
+    def _refresh(self):
+        """读取日志中其他进程（或本进程）新追加的条目。"""
+        with self._lock:
+            if not self._log_path.exists():
+                return
+            first_new_row = self._rows
+            with open(self._log_path, "rb") as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # 另一个进程正在写入的半行，下次再读
+                    self._apply(json.loads(line))
+                    self._log_offset += len(line)
+            if self._rows > first_new_row:
+                self._map_vectors(self._rows)
+                self._compute_norms(first_new_row, self._rows)
+
+    def _compute_norms(self, start: int, end: int):
+        for chunk_start in range(start, end, _QUERY_CHUNK_ROWS):
+            chunk = np.asarray(self._vectors[chunk_start:min(end, chunk_start + _QUERY_CHUNK_ROWS)], dtype=np.float32)
+            self._norms[chunk_start:chunk_start + len(chunk)] = np.einsum("ij,ij->i", chunk, chunk)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append_log(self, entries: list[dict]):
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        with open(self._log_path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ---------- VectorBackend 接口 ----------
+
+    def add(self, embeddings, metadatas, ids):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(ids) or len(metadatas) != len(ids):
+            raise ValueError("embeddings, metadatas and ids must have the same length")
+        with self._write_lock():
+            start = self._rows
+            end = start + len(ids)
+            self._map_vectors(end)
+            # 先落盘向量，再追加日志：读者看到日志条目时，对应的向量一定已经写好
+            self._vectors[start:end] = vectors.astype(self.dtype, copy=False)
+            self._vectors.flush()
+            entries = [
+                {"op": "add", "row": start + i, "id": id_, "metadata": metadata}
+                for i, (id_, metadata) in enumerate(zip(ids, metadatas))
+            ]
+            self._append_log(entries)
+        self._refresh()
+
+    def delete(self, ids=None, where=None):
+        with self._write_lock():
+            if ids is None:
+                rows = self._filter_rows(where)
+                ids = [self._ids[row] for row in rows]
+            ids = [id_ for id_ in ids if id_ in self._row_by_id]
+            if ids:
+                self._append_log([{"op": "delete", "id": id_} for id_ in ids])
+        self._refresh()
+
+    def count(self):
+        self._refresh()
+        with self._lock:
+            return int(self._alive[:self._rows].sum())
+
+    def _filter_rows(self, where: dict | None) -> np.ndarray:
+        """返回满足 where 条件且未删除的行号（升序）。"""
+        alive = self._alive[:self._rows]
+        video_ids = _video_id_filter(where)
+        if where is None:
+            mask = alive
+        elif video_ids is not None:
+            mask = alive & np.isin(self._video_ids[:self._rows], video_ids)
+        else:
+            mask = alive.copy()
+            for row in np.flatnonzero(mask):
+                mask[row] = _matches(self._metadatas[row], where)
+        return np.flatnonzero(mask)
+
+    def get(self, where=None, limit=None, offset=0, include_embeddings=False):
+        self._refresh()
+        with self._lock:
+            rows = self._filter_rows(where)[offset:]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {
+                "ids": [self._ids[row] for row in rows],
+                "metadatas": [self._metadatas[row] for row in rows],
+            }
+            if include_embeddings:
+                result["embeddings"] = np.asarray(self._vectors[rows], dtype=np.float32).tolist()
+            return result
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        self._refresh()
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        result = {"ids": [], "distances": [], "metadatas": []}
+        with self._lock:
+            rows, distances = self.search(queries, n_results, where)
+            for q_rows, q_distances in zip(rows, distances):
+                result["ids"].append([self._ids[row] for row in q_rows])
+                result["distances"].append([float(d) for d in q_distances])
+                result["metadatas"].append([self._metadatas[row] for row in q_rows])
+        return result
+
+    def search(self, queries: np.ndarray, k: int, where: dict | None = None,
+               candidate_rows: np.ndarray | None = None) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        """
+        精确检索：平方 L2 距离 = |x|^2 - 2 x·q + |q|^2，按块做矩阵乘法，每块用 argpartition 取 top-k 后合并。
+        :param candidate_rows: 只在这些行中检索（供上层索引做重排序使用）
+        :return: 每个查询的 (行号数组, 距离数组)，按距离升序
+        """
+        if candidate_rows is None:
+            allowed = None if where is None else self._filter_rows(where)
+            ranges = [np.arange(s, min(self._rows, s + _QUERY_CHUNK_ROWS)) for s in range(0, self._rows, _QUERY_CHUNK_ROWS)] \
+                if allowed is None else [allowed[s:s + _QUERY_CHUNK_ROWS] for s in range(0, len(allowed), _QUERY_CHUNK_ROWS)]
+        else:
+            ranges = [np.sort(candidate_rows)]
+
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+        best_dists = [np.empty(0, dtype=np.float32) for _ in queries]
+        for rows in ranges:
+            if len(rows) == 0:
+                continue
+            contiguous = rows[-1] - rows[0] + 1 == len(rows)
+            block = self._vectors[rows[0]:rows[-1] + 1] if contiguous else self._vectors[rows]
+            block = np.asarray(block, dtype=np.float32)
+            distances = self._norms[rows][None, :] - 2.0 * (queries @ block.T) + q_norms[:, None]
+            distances[:, ~self._alive[rows]] = np.inf
+            for qi in range(len(queries)):
+                d = distances[qi]
+                top = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+                best_rows[qi] = np.concatenate([best_rows[qi], rows[top]])
+                best_dists[qi] = np.concatenate([best_dists[qi], d[top]])
+
+        results_rows, results_dists = [], []
+        for rows, dists in zip(best_rows, best_dists):
+            keep = np.isfinite(dists)
+            rows, dists = rows[keep], dists[keep]
+            order = np.argsort(dists, kind="stable")[:k]
+            results_rows.append(rows[order])
+            results_dists.append(np.maximum(dists[order], 0.0))
+        return results_rows, results_dists
@@ -0,0 +1,97 @@
+"""
+Prometheus 指标：视频处理各阶段的耗时与产出、检索各后端的延迟。
+
+API 在 /metrics 暴露；Celery worker 在主进程中启动 WORKER_METRICS_PORT 端口的 HTTP 服务。
+prefork 的子进程各自记录指标，需要设置环境变量 PROMETHEUS_MULTIPROC_DIR（每个进程把数值写到该目录下的文件，
+导出时汇总），否则导出的只有主进程自己的指标。
+"""
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, start_http_server,
+)
+
+# 单个阶段从不到一秒（短视频的抽帧）到一小时以上（长视频转写）
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 2400, 3600, 7200)
+SEARCH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 1.5, 2.5, 5)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "video_pipeline_stage_seconds", "Wall-clock seconds spent in each video processing stage",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+PIPELINE_STAGE_ITEMS = Counter(
+    "video_pipeline_stage_items", "Frames or subtitle segments handled by each stage", ["stage"],
+)
+PIPELINE_VIDEOS = Counter(
+    "video_pipeline_videos", "Videos finished by the worker, by outcome", ["outcome"],
+)
+SEARCH_BACKEND_SECONDS = Histogram(
+    "search_backend_seconds", "Latency of each search backend call",
+    ["endpoint", "backend", "status"], buckets=SEARCH_BUCKETS,
+)
+
+
+def _multiprocess_dir() -> str | None:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def _registry():
+    if _multiprocess_dir() is None:
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def observe_stages(stages: list[dict]):
+    """把 StageTimings.records() 的结果计入直方图。"""
+    for record in stages:
+        PIPELINE_STAGE_SECONDS.labels(record["stage"]).observe(record["seconds"])
+        if record.get("items"):
+            PIPELINE_STAGE_ITEMS.labels(record["stage"]).inc(record["items"])
+
+
+@contextmanager
+def time_search_backend(endpoint: str, backend: str):
+    """记录一次检索后端调用的耗时，出错时 status 为 error 并继续抛出异常。"""
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        SEARCH_BACKEND_SECONDS.labels(endpoint, backend, status).observe(time.perf_counter() - started)
+
+
+def render_latest() -> tuple[bytes, str]:
+    """Prometheus 文本格式的全部指标及其 Content-Type。"""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int):
+    """
+    在当前进程中启动独立的 HTTP 服务导出指标（Celery worker 使用）。
+    多进程模式下先清空上次运行留下的指标文件，已退出进程的计数不应计入本次运行。
+    """
+    if port <= 0:
+        return
+    multiprocess_dir = _multiprocess_dir()
+    if multiprocess_dir is not None:
+        shutil.rmtree(multiprocess_dir, ignore_errors=True)
+        Path(multiprocess_dir).mkdir(parents=True, exist_ok=True)
+    start_http_server(port, registry=_registry())
+    print(f"Metrics server listening on :{port}")
+
+
+def mark_process_dead(pid: int):
+    """多进程模式下，子进程退出后清理它的实时（gauge）指标文件。"""
+    if _multiprocess_dir() is not None:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,134 @@
+import threading
+from multiprocessing.connection import Client
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def parse_address(address: str):
+    """以 / 开头的地址视为 Unix socket 路径，否则为 host:port。"""
+    if address.startswith("/"):
+        return address, "AF_UNIX"
+    host, _, port = address.rpartition(":")
+    return (host or "127.0.0.1", int(port)), "AF_INET"
+
+
+def process_memory() -> dict:
+    """
+    当前进程的内存占用（MB）：rss 包含与其他进程共享的页，
+    pss 把共享页按共享进程数均摊，更能反映 fork 后写时复制共享的效果（仅 Linux）。
+    """
+    memory = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+def authkey_bytes(authkey: str) -> bytes:
+    """
+    multiprocessing.connection 会反序列化收到的任何对象，通过认证的对端可以在本进程执行任意代码，
+    因此不提供默认密钥：服务端与客户端都拒绝在没有配置 MODEL_SERVER_AUTHKEY 时启动。
+    """
+    if not authkey:
+        raise ValueError("MODEL_SERVER_AUTHKEY must be set to a secret shared by the model server and its clients")
+    return authkey.encode()
+
+
+class ModelServerError(Exception):
+    """模型服务端执行请求时出错"""
+    pass
+
+
+class ModelServerTimeout(ModelServerError, TimeoutError):
+    """模型服务在超时时间内没有返回结果（服务卡住、过载或已退出）"""
+    pass
+
+
+class ModelClient:
+    """
+    模型服务 (app.services.model_server) 的轻量客户端，本进程不加载任何模型。
+    每个线程持有自己的连接，断线后下一次调用自动重连。
+    等待结果超过超时时间时断开连接并抛出 ModelServerTimeout，调用方（Celery 任务、API 请求）不会无限期挂起。
+    """
+
+    def __init__(self, address: str, authkey: str, timeout: float | None = None,
+                 transcribe_timeout: float | None = None):
+        self.address, self.family = parse_address(address)
+        self.authkey = authkey_bytes(authkey)
+        self.timeout = settings.MODEL_SERVER_TIMEOUT_SECONDS if timeout is None else timeout
+        self.transcribe_timeout = (
+            settings.MODEL_SERVER_TRANSCRIBE_TIMEOUT_SECONDS if transcribe_timeout is None else transcribe_timeout
+        )
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, family=self.family, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _drop_connection(self, conn):
+        conn.close()
+        self._local.conn = None
+
+    def _call(self, method: str, *args, timeout: float | None = None):
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send((method, args))
+                if not conn.poll(timeout):
+                    # 迟到的结果不能被下一次调用读到：丢弃这条连接；请求可能仍在执行，不重试
+                    self._drop_connection(conn)
+                    raise ModelServerTimeout(f"Model server did not answer {method} within {timeout:.0f}s")
+                status, result = conn.recv()
+                break
+            except (EOFError, ConnectionError, BrokenPipeError):
+                # 服务重启过：丢弃旧连接，重试一次
+                self._drop_connection(conn)
+                if attempt:
+                    raise
+        if status != "ok":
+            raise ModelServerError(result)
+        return result
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        return self._call("embed_texts", list(texts))
+
+    def embed_images(self, images: list[np.ndarray]) -> np.ndarray:
+        """images 为 HxWx3 的 uint8 数组（尺寸可以不同），预处理在服务端完成。"""
+        return self._call("embed_images", images)
+
+    def transcribe(self, audio_path: Path) -> dict:
+        """音频按路径传递，服务端需要能访问同一文件（共享的 /media 卷）。"""
+        return self._call("transcribe", str(audio_path), timeout=self.transcribe_timeout)
+
+    def stats(self) -> dict:
+        return self._call("stats")
+
+
+_client: ModelClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_model_client() -> ModelClient | None:
+    """配置了 MODEL_SERVER_ADDRESS 时返回共享的客户端，否则返回 None（在本进程内加载模型）。"""
+    global _client
+    if not settings.MODEL_SERVER_ADDRESS:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = ModelClient(settings.MODEL_SERVER_ADDRESS, settings.MODEL_SERVER_AUTHKEY)
+    return _client
@@ -0,0 +1,223 @@
+"""
+本地模型服务：一个长驻进程持有唯一一份 Whisper 与 CLIP，API 与 Celery worker 通过
+multiprocessing.connection（Unix socket 或 TCP，带 authkey 认证）以轻量客户端的方式调用。
+连接上传输的是 pickle，服务端与客户端必须配置同一个 MODEL_SERVER_AUTHKEY 密钥，未配置时拒绝启动。
+
+多个客户端同时发来的 embed_texts / embed_images 请求在服务端合并成一批推理；
+transcribe 最多同时执行 MODEL_SERVER_TRANSCRIBE_CONCURRENCY 个，超出的请求排队，一个长音频不会挡住其他所有转写
+（长音频仍按 WHISPER_CHUNK_* 配置分块并行）。客户端按 MODEL_SERVER_*TIMEOUT_SECONDS 等待结果，超时即报错。
+
+启动（在 backend 目录下）:
+    MODEL_SERVER_AUTHKEY=<密钥> python -m app.services.model_server --address /media/.model_server.sock
+客户端设置同一地址的 MODEL_SERVER_ADDRESS 与同一个 MODEL_SERVER_AUTHKEY 即可。
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Listener
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.model_client import authkey_bytes, parse_address, process_memory
+
+
+class _BatchingQueue:
+    """
+    把多个请求的输入拼成一批交给 compute：取到第一个请求后最多再等待 max_wait_ms 凑批，
+    凑够 max_batch_size 条立即执行；结果按各请求的输入条数切分返回。
+    """
+
+    def __init__(self, name: str, compute: Callable[[list], np.ndarray], max_batch_size: int, max_wait_ms: float):
+        self.compute = compute
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, name=f"model-server-{name}", daemon=True).start()
+
+    def submit(self, inputs: list) -> np.ndarray:
+        if not inputs:
+            return np.empty((0, settings.VECTOR_DIM), dtype=np.float32)
+        future: Future = Future()
+        self._queue.put((inputs, future))
+        return future.result()
+
+    def _compute_all(self, inputs: list) -> np.ndarray:
+        # 单个请求本身可能超过批大小（例如一批帧），按批大小切开推理
+        return np.concatenate([
+            self.compute(inputs[start:start + self.max_batch_size])
+            for start in range(0, len(inputs), self.max_batch_size)
+        ])
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            inputs = [x for request_inputs, _ in pending for x in request_inputs]
+            try:
+                outputs = self._compute_all(inputs)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for request_inputs, future in pending:
+                future.set_result(outputs[offset:offset + len(request_inputs)])
+                offset += len(request_inputs)
+            self.requests += len(pending)
+            self.items += size
+            self.batches += 1
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "items": self.items,
+            "batches": self.batches,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+class ModelServer:
+    def __init__(self, address: str, authkey: str):
+        self.address, self.family = parse_address(address)
+        self.authkey = authkey_bytes(authkey)
+        self.load_seconds: dict[str, float] = {}
+        self.started_at = time.time()
+        # 同一个 Whisper 模型可以被多个线程同时用于推理，信号量只限制并发数
+        self.transcribe_concurrency = max(1, settings.MODEL_SERVER_TRANSCRIBE_CONCURRENCY)
+        self._transcribe_slots = threading.BoundedSemaphore(self.transcribe_concurrency)
+        self._counter_lock = threading.Lock()
+        self._transcriptions = 0
+        self._active_transcriptions = 0
+        self._connections = 0
+        self._text_queue: _BatchingQueue | None = None
+        self._image_queue: _BatchingQueue | None = None
+
+    def load_models(self):
+        """启动时加载全部模型，第一个请求不必承担加载耗时。"""
+        from app.services.ai_models import models_loader
+
+        started = time.perf_counter()
+        models_loader.get_clip_model_and_processor()
+        self.load_seconds["clip"] = round(time.perf_counter() - started, 2)
+        started = time.perf_counter()
+        models_loader.get_whisper_model()
+        self.load_seconds["whisper"] = round(time.perf_counter() - started, 2)
+
+        self._text_queue = _BatchingQueue(
+            "text", models_loader.encode_texts,
+            settings.MODEL_SERVER_TEXT_BATCH_SIZE, settings.MODEL_SERVER_BATCH_WAIT_MS,
+        )
+        self._image_queue = _BatchingQueue(
+            "image", models_loader.encode_images,
+            settings.MODEL_SERVER_IMAGE_BATCH_SIZE, settings.MODEL_SERVER_BATCH_WAIT_MS,
+        )
+        print(f"Model server: models loaded in {self.load_seconds} s, memory {process_memory()}")
+
+    # ---------- 请求处理 ----------
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        return self._text_queue.submit(texts)
+
+    def embed_images(self, images: list[np.ndarray]) -> np.ndarray:
+        return self._image_queue.submit(images)
+
+    def transcribe(self, audio_path: str) -> dict:
+        from app.services.transcription import transcribe_audio
+
+        with self._transcribe_slots:
+            with self._counter_lock:
+                self._transcriptions += 1
+                self._active_transcriptions += 1
+            try:
+                return transcribe_audio(Path(audio_path))
+            finally:
+                with self._counter_lock:
+                    self._active_transcriptions -= 1
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "load_seconds": self.load_seconds,
+            "memory": process_memory(),
+            "connections": self._connections,
+            "embed_texts": self._text_queue.stats(),
+            "embed_images": self._image_queue.stats(),
+            "transcriptions": self._transcriptions,
+            "active_transcriptions": self._active_transcriptions,
+            "transcribe_concurrency": self.transcribe_concurrency,
+        }
+
+    _METHODS = {"embed_texts", "embed_images", "transcribe", "stats"}
+
+    def _handle(self, conn):
+        self._connections += 1
+        try:
+            while True:
+                try:
+                    method, args = conn.recv()
+                except EOFError:
+                    return
+                if method not in self._METHODS:
+                    conn.send(("error", f"Unknown method: {method}"))
+                    continue
+                try:
+                    conn.send(("ok", getattr(self, method)(*args)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            self._connections -= 1
+            conn.close()
+
+    def serve_forever(self):
+        if self.family == "AF_UNIX":
+            Path(self.address).unlink(missing_ok=True)  # 上次异常退出留下的 socket 文件
+        with Listener(self.address, family=self.family, authkey=self.authkey) as listener:
+            print(f"Model server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # 认证失败等只影响这一个连接
+                    print(f"Model server: rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=settings.MODEL_SERVER_ADDRESS or "/media/.model_server.sock")
+    args = parser.parse_args()
+
+    # 服务进程自己就是模型的持有者，不能再把请求转发给模型服务
+    settings.MODEL_SERVER_ADDRESS = ""
+    os.environ["MODEL_SERVER_ADDRESS"] = ""
+
+    server = ModelServer(args.address, settings.MODEL_SERVER_AUTHKEY)
+    server.load_models()
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,81 @@
-from elasticsearch import AsyncElasticsearch, BadRequestError
-from elasticsearch.helpers import async_bulk
+import asyncio
+from abc import ABC, abstractmethod
+from typing import AsyncIterable, Iterable
+
 from app.core.config import settings
 
-class SearchEngineService:
-    def __init__(self):
-        self.client = AsyncElasticsearch(
-            hosts=settings.ELASTICSEARCH_HOSTS,
-            request_timeout=30,
-            max_retries=5,
-            retry_on_timeout=True
-        )
-        self.index_name = "subtitles"
+def _is_retryable(status: int) -> bool:
+    # bulk 响应中 429 与 5xx 表示暂时性失败，值得重试；4xx（如 400 映射错误）重试也不会成功
+    return status == 429 or status >= 500
+
+# 高亮返回整条字幕（字幕本身很短，不需要截取片段），命中的词用 <em> 包裹
+HIGHLIGHT_PRE_TAG, HIGHLIGHT_POST_TAG = "<em>", "</em>"
+
+
+class TextSearchBackend(ABC):
+    """
+    字幕全文检索后端的统一接口。文档为 iter_subtitle_documents 产出的字幕（id / video_id / start_time / text），
+    按字幕 id 覆盖写入。
+
+    search 的结果按 (得分降序, 字幕 id 升序) 排序，返回
+        {"total": 命中总数, "hits": [{...字幕, "score", "highlight"}], "next_search_after": 下一页的游标或 None}
+    翻页时把 next_search_after 原样作为 search_after 传回，各后端的语义相同。
+    """
+
+    @abstractmethod
+    async def create_index_if_not_exists(self):
+        ...
+
+    @abstractmethod
+    async def index_subtitle_batches(
+        self,
+        batches: AsyncIterable[list[dict]] | Iterable[list[dict]],
+        chunk_size: int | None = None,
+        concurrency: int | None = None,
+        max_retries: int | None = None,
+    ) -> dict:
+        ...
+
+    @abstractmethod
+    async def delete_stale_subtitles(self, video_id: int, min_current_id: int) -> int:
+        ...
+
+    @abstractmethod
+    async def delete_video(self, video_id: int) -> int:
+        ...
+
+    @abstractmethod
+    async def search(
+        self,
+        query_text: str,
+        size: int = 10,
+        search_after: list | None = None,
+        phrase: bool = False,
+        slop: int = 0,
+        video_id: int | None = None,
+    ) -> dict:
+        """
+        :param phrase: 按短语匹配（词序一致且相邻）；否则要求所有词都出现（AND）
+        :param slop: 短语匹配时允许词之间相隔的位置数
+        :param video_id: 只在这个视频的字幕中检索
+        """
+        ...
+
+    async def close(self):
+        pass
+
+
+def next_search_after(hits: list[dict], size: int) -> list | None:
+    # 不足一页说明已经是最后一页
+    if len(hits) < size or not hits:
+        return None
+    return [hits[-1]["score"], hits[-1]["id"]]
+
+
+class ElasticsearchTextBackend(TextSearchBackend):
+    def __init__(self, index_name: str = "subtitles"):
+        self._client = None
+        self.index_name = index_name
         self.index_mapping = {
             "properties": {
                 "id": {"type": "integer"},
@@ -19,17 +84,43 @@ class SearchEngineService:
                 "text": {"type": "text", "analyzer": "standard"}
             }
         }
+        self.index_settings = {
+            "number_of_shards": settings.ES_INDEX_SHARDS,
+            "number_of_replicas": settings.ES_INDEX_REPLICAS,
+            "refresh_interval": settings.ES_INDEX_REFRESH_INTERVAL,
+        }
+
+    @property
+    def client(self):
+        """客户端在第一次使用时才创建，导入本模块不需要 Elasticsearch 在线。"""
+        if self._client is None:
+            from elasticsearch import AsyncElasticsearch
+            self._client = AsyncElasticsearch(
+                hosts=settings.ELASTICSEARCH_HOSTS,
+                request_timeout=30,
+                max_retries=5,
+                retry_on_timeout=True
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
 
     # ---  绕过有问题的 exists() 检查
     async def create_index_if_not_exists(self):
         """
         直接尝试创建索引，如果已存在则捕获并忽略异常。
         这避免了调用有兼容性问题的 .indices.exists() 方法。
+        应在进程启动时调用一次，而不是每次写入前调用。
         """
+        from elasticsearch import BadRequestError
         try:
             await self.client.indices.create(
                 index=self.index_name,
-                mappings=self.index_mapping
+                mappings=self.index_mapping,
+                settings=self.index_settings,
             )
             print(f"Created Elasticsearch index: '{self.index_name}' with mapping.")
         except BadRequestError as e:
@@ -46,30 +137,212 @@ class SearchEngineService:
             print(f"An unexpected error occurred during index creation: {e}")
             raise e
 
-    # --- 使用 async_bulk 的正确 index_subtitles 方法 ---
-    async def index_subtitles(self, subtitles: list[dict]):
-        if not subtitles:
-            return
-        def generate_actions():
-            for sub in subtitles:
-                yield {
-                    "_op_type": "index",
-                    "_index": self.index_name,
-                    "_id": sub["id"],
-                    "_source": sub
-                }
-        try:
-            success, failed = await async_bulk(self.client, generate_actions())
-            print(f"Successfully indexed {success} subtitles. Failed items: {len(failed)}")
-        except Exception as e:
-            print(f"An error occurred during bulk indexing: {e}")
+    async def _bulk_with_retries(self, docs: list[dict], max_retries: int, backoff: float) -> tuple[int, list[dict]]:
+        """
+        发送一个 bulk 请求；只把可重试的失败文档（429 / 5xx）重新发送，按指数退避等待。
+        :return: (成功数, 最终失败的条目)
+        """
+        indexed, failed, pending = 0, [], docs
+        for attempt in range(max_retries + 1):
+            if attempt:
+                await asyncio.sleep(backoff * 2 ** (attempt - 1))
+            operations = []
+            for doc in pending:
+                operations.append({"index": {"_index": self.index_name, "_id": doc["id"]}})
+                operations.append(doc)
+            response = await self.client.bulk(operations=operations)
 
-    async def search_subtitles_by_text(self, query_text: str, size: int = 10) -> list:
+            retry = []
+            for doc, item in zip(pending, response["items"]):
+                result = item["index"]
+                status = result.get("status", 500)
+                if status < 300:
+                    indexed += 1
+                elif _is_retryable(status):
+                    retry.append(doc)
+                else:
+                    failed.append({"id": doc["id"], "status": status, "error": result.get("error")})
+            if not retry:
+                return indexed, failed
+            pending = retry
+        failed.extend({"id": doc["id"], "status": None, "error": "retries exhausted"} for doc in pending)
+        return indexed, failed
+
+    async def index_subtitle_batches(
+        self,
+        batches: AsyncIterable[list[dict]] | Iterable[list[dict]],
+        chunk_size: int | None = None,
+        concurrency: int | None = None,
+        max_retries: int | None = None,
+    ) -> dict:
+        """
+        流式地把字幕写入 Elasticsearch。输入是按块产出的字幕（例如从数据库分块读取），
+        按 chunk_size 切成 bulk 请求，最多 concurrency 个请求同时在途；
+        在途请求达到上限时不再读取输入，内存占用与字幕总数无关。
+        :return: {"indexed": 成功数, "failed": 失败数, "errors": 前几条失败详情}
+        """
+        chunk_size = chunk_size or settings.ES_BULK_CHUNK_SIZE
+        concurrency = concurrency or settings.ES_BULK_CONCURRENCY
+        max_retries = settings.ES_BULK_MAX_RETRIES if max_retries is None else max_retries
+        backoff = settings.ES_BULK_RETRY_BACKOFF_SECONDS
+
+        slots = asyncio.Semaphore(concurrency)
+        in_flight: set[asyncio.Task] = set()
+        totals = {"indexed": 0, "failed": 0, "errors": []}
+
+        async def send(chunk: list[dict]):
+            try:
+                indexed, failed = await self._bulk_with_retries(chunk, max_retries, backoff)
+            except Exception as e:
+                # 整个请求失败（例如连接中断且客户端自身的重试已用尽）
+                indexed, failed = 0, [{"id": doc["id"], "status": None, "error": str(e)} for doc in chunk]
+            finally:
+                slots.release()
+            totals["indexed"] += indexed
+            totals["failed"] += len(failed)
+            totals["errors"].extend(failed[:10 - len(totals["errors"])])
+
+        async def submit(chunk: list[dict]):
+            await slots.acquire()
+            task = asyncio.create_task(send(chunk))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        buffer: list[dict] = []
+
+        async def consume(batch: list[dict]):
+            nonlocal buffer
+            buffer.extend(batch)
+            while len(buffer) >= chunk_size:
+                chunk, buffer = buffer[:chunk_size], buffer[chunk_size:]
+                await submit(chunk)
+
+        if hasattr(batches, "__aiter__"):
+            async for batch in batches:
+                await consume(batch)
+        else:
+            for batch in batches:
+                await consume(batch)
+        if buffer:
+            await submit(buffer)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+        if totals["failed"]:
+            print(f"Failed to index {totals['failed']} subtitles, e.g. {totals['errors'][:3]}")
+        return totals
+
+    async def delete_stale_subtitles(self, video_id: int, min_current_id: int) -> int:
+        """
+        删除一个视频中 id 小于 min_current_id 的字幕文档：视频被重新处理时字幕以新的 id 写入，
+        旧文档不会被覆盖。新视频没有匹配的文档，这次查询几乎没有开销。
+        :return: 删除的文档数
+        """
+        response = await self.client.delete_by_query(
+            index=self.index_name,
+            query={"bool": {"filter": [
+                {"term": {"video_id": video_id}},
+                {"range": {"id": {"lt": min_current_id}}},
+            ]}},
+            conflicts="proceed",
+        )
+        return response.get("deleted", 0)
+
+    async def delete_video(self, video_id: int) -> int:
+        response = await self.client.delete_by_query(
+            index=self.index_name,
+            query={"term": {"video_id": video_id}},
+            conflicts="proceed",
+        )
+        return response.get("deleted", 0)
+
+    async def search(self, query_text, size=10, search_after=None, phrase=False, slop=0, video_id=None):
+        if phrase:
+            query = {"match_phrase": {"text": {"query": query_text, "slop": slop}}}
+        else:
+            query = {"match": {"text": {"query": query_text, "operator": "and"}}}
+        if video_id is not None:
+            query = {"bool": {"must": [query], "filter": [{"term": {"video_id": video_id}}]}}
         response = await self.client.search(
             index=self.index_name,
             size=size,
-            query={"match": {"text": {"query": query_text, "operator": "and"}}}
+            query=query,
+            # 以字幕 id 作为得分相同时的次序，search_after 翻页才是确定的
+            sort=[{"_score": "desc"}, {"id": "asc"}],
+            search_after=search_after,
+            highlight={
+                "fields": {"text": {"number_of_fragments": 0}},
+                "pre_tags": [HIGHLIGHT_PRE_TAG],
+                "post_tags": [HIGHLIGHT_POST_TAG],
+            },
         )
-        return [hit["_source"] for hit in response["hits"]["hits"]]
+        hits = []
+        for hit in response["hits"]["hits"]:
+            source = hit["_source"]
+            hits.append({
+                **source,
+                "score": hit["sort"][0],
+                "highlight": hit.get("highlight", {}).get("text", [source.get("text")])[0],
+            })
+        # 命中数超过 10000 时 Elasticsearch 只给出下限
+        return {"total": response["hits"]["total"]["value"], "hits": hits,
+                "next_search_after": next_search_after(hits, size)}
+
+
+def create_text_search_backend(name: str | None = None) -> TextSearchBackend:
+    """根据 settings.TEXT_SEARCH_BACKEND 创建后端：elasticsearch（默认）或 local（进程内倒排索引，不需要 Elasticsearch）。"""
+    name = (name or settings.TEXT_SEARCH_BACKEND).lower()
+    if name == "elasticsearch":
+        return ElasticsearchTextBackend()
+    if name == "local":
+        from pathlib import Path
+        from app.services.local_text_index import LocalTextIndex
+        return LocalTextIndex(
+            Path(settings.LOCAL_TEXT_INDEX_PATH),
+            merge_factor=settings.LOCAL_TEXT_MERGE_FACTOR,
+            segment_docs=settings.LOCAL_TEXT_SEGMENT_DOCS,
+        )
+    raise ValueError(f"Unknown text search backend: {name}")
+
+
+class SearchEngineService:
+    def __init__(self, backend: TextSearchBackend | None = None):
+        self._backend = backend
+
+    @property
+    def backend(self) -> TextSearchBackend:
+        # 后端在第一次使用时才创建：导入本模块不会连接 Elasticsearch 或打开索引文件
+        if self._backend is None:
+            self._backend = create_text_search_backend()
+        return self._backend
+
+    async def create_index_if_not_exists(self):
+        await self.backend.create_index_if_not_exists()
+
+    async def index_subtitle_batches(self, batches, **kwargs) -> dict:
+        return await self.backend.index_subtitle_batches(batches, **kwargs)
+
+    async def index_subtitles(self, subtitles: list[dict]) -> dict:
+        if not subtitles:
+            return {"indexed": 0, "failed": 0, "errors": []}
+        return await self.backend.index_subtitle_batches([subtitles])
+
+    async def delete_stale_subtitles(self, video_id: int, min_current_id: int) -> int:
+        return await self.backend.delete_stale_subtitles(video_id, min_current_id)
+
+    async def delete_video(self, video_id: int) -> int:
+        return await self.backend.delete_video(video_id)
+
+    async def search(self, query_text: str, size: int = 10, search_after: list | None = None,
+                     phrase: bool = False, slop: int = 0, video_id: int | None = None) -> dict:
+        return await self.backend.search(query_text, size=size, search_after=search_after,
+                                         phrase=phrase, slop=slop, video_id=video_id)
+
+    async def search_subtitles_by_text(self, query_text: str, size: int = 10) -> list:
+        return (await self.search(query_text, size=size))["hits"]
+
+    async def close(self):
+        if self._backend is not None:
+            await self._backend.close()
 
-search_engine_service = SearchEngineService()
\ No newline at end of file
+search_engine_service = SearchEngineService()
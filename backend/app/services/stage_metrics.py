@@ -0,0 +1,26 @@
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.stage_metric import VideoStageMetric
+from app.services.metrics import observe_stages
+
+
+def record_stage_metrics(db: Session, video_id: int, records: list[dict]):
+    """
+    记录一个视频的各阶段耗时：写入 video_stage_metrics 表（按视频查询），同时计入 Prometheus 直方图（看整体分布）。
+    调用方负责提交。
+    :param records: StageTimings.records() 的结果，每项含 stage / start / seconds / items
+    """
+    if not records:
+        return
+    db.execute(insert(VideoStageMetric), [
+        {
+            "video_id": video_id,
+            "stage": record["stage"],
+            "started_offset": record.get("start"),
+            "seconds": record["seconds"],
+            "items": record.get("items"),
+        }
+        for record in records
+    ])
+    observe_stages(records)
@@ -0,0 +1,66 @@
+from typing import Iterable, Iterator
+
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.subtitle import Subtitle
+
+
+def bulk_insert_subtitles(db: Session, video_id: int, segments: Iterable[dict], chunk_size: int | None = None) -> list[int]:
+    """
+    批量写入一个视频的字幕，不构造 ORM 对象。
+    每块是一条 executemany 形式的 INSERT ... RETURNING id：SQLAlchemy 会把它改写成多行 VALUES
+    （PostgreSQL / SQLite 均支持），一次往返写入上千行并拿回主键。调用方负责提交。
+    :param segments: Whisper 的分段结果（含 start / end / text）
+    :return: 新字幕的 id，顺序与输入一致
+    """
+    chunk_size = chunk_size or settings.SUBTITLE_DB_CHUNK_SIZE
+    statement = insert(Subtitle).returning(Subtitle.id, sort_by_parameter_order=True)
+    ids: list[int] = []
+    rows: list[dict] = []
+
+    def flush():
+        ids.extend(db.scalars(statement, rows).all())
+        rows.clear()
+
+    for segment in segments:
+        rows.append({"video_id": video_id, "start_time": segment["start"], "end_time": segment["end"], "text": segment["text"]})
+        if len(rows) >= chunk_size:
+            flush()
+    if rows:
+        flush()
+    return ids
+
+
+def iter_subtitle_documents(db: Session, video_id: int, chunk_size: int | None = None) -> Iterator[list[dict]]:
+    """按主键做键集分页，分块读取一个视频的字幕，产出可直接写入 Elasticsearch 的文档。"""
+    chunk_size = chunk_size or settings.SUBTITLE_DB_CHUNK_SIZE
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Subtitle.id, Subtitle.video_id, Subtitle.start_time, Subtitle.text)
+            .where(Subtitle.video_id == video_id, Subtitle.id > last_id)
+            .order_by(Subtitle.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield [row._asdict() for row in rows]
+        last_id = rows[-1].id
+
+
+def clone_subtitles(db: Session, source_video_id: int, target_video_id: int):
+    """
+    在数据库内用 INSERT ... SELECT 把一个视频的字幕复制给另一个视频，不经过 Python 对象。
+    先删除目标视频已有的字幕（与插入在同一事务中），任务被重新投递时不会产生重复的字幕。调用方负责提交。
+    """
+    db.execute(delete(Subtitle).where(Subtitle.video_id == target_video_id))
+    db.execute(
+        insert(Subtitle).from_select(
+            ["video_id", "start_time", "end_time", "text"],
+            select(literal(target_video_id), Subtitle.start_time, Subtitle.end_time, Subtitle.text)
+            .where(Subtitle.video_id == source_video_id)
+            .order_by(Subtitle.start_time),
+        )
+    )
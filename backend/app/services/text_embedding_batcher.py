@@ -0,0 +1,99 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.core.config import settings
+
+
+class TextEmbeddingBatcher:
+    """
+    请求合并的文本向量化服务：并发到达的查询进入队列，
+    凑满 max_batch_size 条或等待超过 max_wait_ms 时合并成一个 padded batch 做一次前向推理，
+    再把结果分发给各自等待的协程。模型只在一个专用线程中调用，避免多个线程争抢同一组核心。
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[list[str]], list[list[float]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5,
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="text-embedding")
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # 统计信息
+        self.requests = 0
+        self.batches = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 队列与后台协程绑定在当前事件循环上
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # 后台协程意外退出时重新启动；沿用原队列，已排队的请求不会丢失
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str) -> list[float]:
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect_batch(self) -> list[tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _encode(self, batch: list[tuple[str, asyncio.Future]]):
+        # 同一批中的重复查询只计算一次
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        vectors = await asyncio.get_running_loop().run_in_executor(self._executor, self.encode_batch, texts)
+        if len(vectors) != len(texts):
+            raise ValueError(f"encode_batch returned {len(vectors)} vectors for {len(texts)} texts")
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+        self.requests += len(batch)
+        self.batches += 1
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._encode(batch)
+            except Exception as e:
+                # 任何异常只让这一批请求失败，后台协程继续处理后续请求
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            except BaseException:
+                # 后台协程被取消（例如事件循环关闭）：取消这一批请求，等待方不会一直挂起
+                for _, future in batch:
+                    future.cancel()
+                raise
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
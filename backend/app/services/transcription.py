@@ -0,0 +1,173 @@
+import multiprocessing
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.ai_models import models_loader, configure_torch_threads
+from app.services.model_client import get_model_client
+
+# Whisper 期望的采样率，与 extract_media 输出的 WAV 一致
+SAMPLE_RATE = 16000
+
+
+def read_wav(audio_path: Path, start_sample: int = 0, end_sample: int | None = None) -> np.ndarray:
+    """读取 16-bit 单声道 WAV 的一段，返回 [-1, 1] 区间的 float32 数组（Whisper 的输入格式）。"""
+    with wave.open(str(audio_path), "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"Expected 16-bit mono WAV, got {audio_path}")
+        total = wav.getnframes()
+        end_sample = total if end_sample is None else min(end_sample, total)
+        wav.setpos(max(0, start_sample))
+        raw = wav.readframes(max(0, end_sample - start_sample))
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def find_split_points(
+    audio: np.ndarray,
+    chunk_seconds: float,
+    search_seconds: float = 10.0,
+    frame_ms: int = 30,
+) -> list[int]:
+    """
+    在每个目标切分点（chunk_seconds 的整数倍）前后 search_seconds 范围内，
+    选择短时能量最低的位置（静音处）作为切分点，避免把一句话切成两半。
+    :return: 切分点的采样下标，不含首尾
+    """
+    frame_len = SAMPLE_RATE * frame_ms // 1000
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return []
+    energy = np.square(audio[: n_frames * frame_len].reshape(n_frames, frame_len)).mean(axis=1)
+
+    frames_per_chunk = int(chunk_seconds * 1000 / frame_ms)
+    # 搜索范围不超过半个分块，保证每个切分点都在上一个之后推进
+    search = min(int(search_seconds * 1000 / frame_ms), frames_per_chunk // 2)
+    points = []
+    target = frames_per_chunk
+    while target < n_frames - search:
+        lo, hi = max(0, target - search), min(n_frames, target + search)
+        best = lo + int(np.argmin(energy[lo:hi]))
+        points.append(best * frame_len + frame_len // 2)
+        target = best + frames_per_chunk
+    return points
+
+
+def _init_chunk_worker(num_threads: int):
+    # 每个进程持有自己的 Whisper 模型实例，并限制 intra-op 线程数避免超额订阅
+    import torch
+    configure_torch_threads()
+    torch.set_num_threads(num_threads)
+    models_loader.get_whisper_model()
+
+
+def _transcribe_chunk(audio_path: str, start_sample: int, end_sample: int) -> list[dict]:
+    audio = read_wav(Path(audio_path), start_sample, end_sample)
+    return models_loader.transcribe(audio)["segments"]
+
+
+def _merge_chunk_segments(chunk_results: list[tuple[float, float, float, list[dict]]]) -> list[dict]:
+    """
+    把各分块的片段平移到全局时间轴，并去除重叠区域中的重复片段：
+    每个片段只保留在其中点所属的那个分块中（即该分块"拥有"的 [own_start, own_end) 区间）。
+    """
+    merged = []
+    for offset, own_start, own_end, segments in chunk_results:
+        for segment in segments:
+            start, end = segment["start"] + offset, segment["end"] + offset
+            if not own_start <= (start + end) / 2 < own_end:
+                continue
+            merged.append({**segment, "start": start, "end": end})
+
+    merged.sort(key=lambda s: s["start"])
+    deduped = []
+    for segment in merged:
+        # 边界附近两个分块各自识别出同一句话时，只保留一份
+        if deduped and segment["text"].strip() == deduped[-1]["text"].strip() \
+                and segment["start"] < deduped[-1]["end"]:
+            continue
+        deduped.append(segment)
+    for i, segment in enumerate(deduped):
+        segment["id"] = i
+    return deduped
+
+
+def _thread_budget() -> int:
+    """
+    分块转写可使用的 torch 线程总数，取本进程当前的推理配置：
+    TORCH_NUM_THREADS，或 fused 流水线中分给转写阶段的 PIPELINE_TORCH_THREADS（与帧向量化并发时各占一份）。
+    各子进程平分这些线程，不会与同时进行的 CLIP 推理争抢核心。
+    """
+    import torch
+    configure_torch_threads()
+    return max(1, torch.get_num_threads())
+
+
+def transcribe_chunked(audio_path: Path, workers: int | None = None) -> dict:
+    """
+    长音频模式：在静音处把 WAV 切成若干块，在进程池中并行转写，再拼接为全局时间轴上的片段。
+    返回值与 whisper 的 transcribe() 结构一致（包含 text 与 segments）。
+    """
+    budget = _thread_budget()
+    workers = min(workers or settings.WHISPER_CHUNK_WORKERS or max(1, budget // 2), budget)
+    threads_per_worker = max(1, budget // workers)
+    overlap = int(settings.WHISPER_CHUNK_OVERLAP_SECONDS * SAMPLE_RATE)
+
+    audio = read_wav(audio_path)
+    total = len(audio)
+    bounds = [0, *find_split_points(audio, settings.WHISPER_CHUNK_SECONDS), total]
+    del audio  # 子进程按区间自行读取 WAV，避免通过管道传输大数组
+
+    # 每块在两侧各多读 overlap 的音频，作为上下文
+    chunks = [
+        (max(0, own_start - overlap), min(total, own_end + overlap), own_start, own_end)
+        for own_start, own_end in zip(bounds[:-1], bounds[1:])
+    ]
+    print(f"Transcribing {total / SAMPLE_RATE:.0f}s of audio in {len(chunks)} chunks with {workers} processes.")
+
+    # 使用 spawn：父进程中已有推理线程，fork 后的 torch/OpenMP 状态不安全
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=context,
+        initializer=_init_chunk_worker,
+        initargs=(threads_per_worker,),
+    ) as pool:
+        futures = [
+            pool.submit(_transcribe_chunk, str(audio_path), start, end)
+            for start, end, _, _ in chunks
+        ]
+        chunk_results = [
+            (start / SAMPLE_RATE, own_start / SAMPLE_RATE, own_end / SAMPLE_RATE, future.result())
+            for (start, _, own_start, own_end), future in zip(chunks, futures)
+        ]
+
+    segments = _merge_chunk_segments(chunk_results)
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments}
+
+
+def transcribe_audio(audio_path: Path) -> dict:
+    """
+    转写入口：短音频直接单次调用 Whisper，超过 WHISPER_LONG_AUDIO_SECONDS 的音频走分块并行模式
+    （分块模式需要创建子进程，在 daemon 进程中——例如 Celery prefork 的 worker 子进程——退回单次调用；
+    长音频在 worker 中要并行转写，可以交给模型服务处理，见 MODEL_SERVER_ADDRESS）。
+    配置了模型服务时交给模型服务转写。
+    """
+    client = get_model_client()
+    if client is not None:
+        # 模型服务中运行同样的逻辑（包括长音频的分块并行）
+        return client.transcribe(audio_path)
+
+    with wave.open(str(audio_path), "rb") as wav:
+        duration = wav.getnframes() / wav.getframerate()
+
+    if duration >= settings.WHISPER_LONG_AUDIO_SECONDS and settings.WHISPER_CHUNK_WORKERS != 1:
+        # Celery prefork 的子进程是 daemon 进程，不能再创建子进程，此时退回单次调用
+        if not multiprocessing.current_process().daemon:
+            return transcribe_chunked(audio_path)
+        print("Chunked transcription is unavailable in a daemonic process; transcribing in a single pass.")
+
+    return models_loader.transcribe(str(audio_path))
+
@@ -0,0 +1,341 @@
+import fcntl
+import hashlib
+import json
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Mapping
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    from python_multipart.exceptions import MultipartParseError
+except ModuleNotFoundError:  # python-multipart < 0.0.13 的包名
+    from multipart.multipart import MultipartParser, parse_options_header
+    from multipart.exceptions import MultipartParseError
+
+from app.core.config import settings
+from app.services.video_processing import probe_video, VideoProcessingError
+
+_UNSAFE_CHARS = re.compile(r"[^\w.\-]+")
+_UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """上传失败，status_code 为应返回给客户端的 HTTP 状态码"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def media_root() -> Path:
+    return Path(settings.MEDIA_PATH)
+
+
+def unique_media_path(filename: str) -> Path:
+    """
+    为上传的文件生成不会冲突的存储路径：<安全化的文件名>_<随机后缀><扩展名>。
+    同名文件并发上传时各自落到不同的文件（以及不同的帧目录）中。
+    """
+    name = Path(filename).name
+    stem = _UNSAFE_CHARS.sub("_", Path(name).stem).strip("._") or "video"
+    suffix = _UNSAFE_CHARS.sub("", Path(name).suffix)[:16]
+    return media_root() / f"{stem[:100]}_{uuid.uuid4().hex[:8]}{suffix}"
+
+
+def _temp_path_for(target: Path) -> Path:
+    # 以 . 开头的临时文件不会被当作媒体文件访问到
+    return target.with_name(f".{target.name}.part")
+
+
+def _probe(path: Path) -> dict:
+    try:
+        return probe_video(path)
+    except VideoProcessingError as e:
+        raise UploadError(f"Uploaded file is not a readable video: {e}", status_code=415)
+
+
+def _finalize(temp_path: Path, target: Path) -> dict:
+    """探测视频信息并原子地把临时文件改名为最终文件；探测失败时删除临时文件。"""
+    try:
+        info = _probe(temp_path)
+    except Exception:
+        temp_path.unlink(missing_ok=True)
+        raise
+    temp_path.replace(target)
+    return info
+
+
+class StreamedUpload:
+    """
+    一次流式上传的结果：最终文件路径、SHA-256、字节数以及 ffprobe 得到的视频信息。
+    文件在确认是可读视频之后才出现在最终路径上。
+    """
+
+    def __init__(self, filename: str, path: Path, content_hash: str, size: int, info: dict):
+        self.filename = filename
+        self.path = path
+        self.content_hash = content_hash
+        self.size = size
+        self.info = info
+
+    def discard(self):
+        """内容与已有视频重复时删除这份文件。"""
+        self.path.unlink(missing_ok=True)
+
+
+# multipart 中除文件内容以外的部分（分隔符、各部分的头、其它表单字段）允许的字节数
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class _MultipartFileReader:
+    """
+    增量解析 multipart/form-data 请求体，只取出表单字段 file_field 中的文件内容。
+    每次 feed() 一块请求体，返回其中属于该文件的数据；解析器不缓冲整个文件。
+    """
+
+    def __init__(self, content_type: str, file_field: str = "file"):
+        mime, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if mime != b"multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data body with a boundary", status_code=415)
+        self.file_field = file_field.encode()
+        self.filename: str | None = None
+        self._data: list[bytes] = []
+        self._headers: dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._in_file = False
+        self._done_file = False
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._field = self._value = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # 同名字段出现多次时只取第一个文件
+        if options.get(b"name") == self.file_field and b"filename" in options and not self._done_file:
+            self.filename = options[b"filename"].decode("utf-8", errors="replace")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._data.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._done_file = True
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"Malformed multipart body: {e}")
+        data, self._data = self._data, []
+        return data
+
+    def finish(self):
+        self._parser.finalize()
+        if not self._done_file:
+            raise UploadError("Multipart body ended before the file was complete" if self.filename
+                              else "No file found in the upload")
+
+
+async def save_upload(headers: Mapping[str, str], body: AsyncIterator[bytes], max_bytes: int | None = None) -> StreamedUpload:
+    """
+    直接解析请求体流（multipart/form-data，文件字段名为 file），把文件内容写入唯一命名的临时文件，
+    请求体不经过框架的临时文件，数据只落盘一次。
+    Content-Length 已超过 max_bytes 时不读取请求体直接拒绝；没有 Content-Length（分块传输）时
+    读到的字节数一超过上限即中止。哈希与写盘放在线程池中，事件循环只负责调度。
+    """
+    max_bytes = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    max_body = max_bytes + _MULTIPART_OVERHEAD_BYTES
+    content_length = headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+        raise UploadError(f"File exceeds the upload limit of {max_bytes} bytes", status_code=413)
+
+    reader = _MultipartFileReader(headers.get("content-type", ""))
+    hasher = hashlib.sha256()
+    received = size = 0
+    target = temp_path = buffer = None
+
+    def write_chunks(chunks: list[bytes]):
+        nonlocal buffer
+        if buffer is None:
+            buffer = open(temp_path, "wb")
+        for chunk in chunks:
+            hasher.update(chunk)
+            buffer.write(chunk)
+
+    try:
+        async for chunk in body:
+            received += len(chunk)
+            if received > max_body:
+                raise UploadError(f"File exceeds the upload limit of {max_bytes} bytes", status_code=413)
+            data = reader.feed(chunk)
+            if not data:
+                continue
+            size += sum(len(part) for part in data)
+            if size > max_bytes:
+                raise UploadError(f"File exceeds the upload limit of {max_bytes} bytes", status_code=413)
+            if target is None:
+                target = unique_media_path(reader.filename)
+                temp_path = _temp_path_for(target)
+            await run_in_threadpool(write_chunks, data)
+        reader.finish()
+        if not reader.filename:
+            raise UploadError("No filename found")
+        if target is None:
+            # 空文件：仍然交给 ffprobe 判定（会以 415 拒绝）
+            target = unique_media_path(reader.filename)
+            temp_path = _temp_path_for(target)
+            await run_in_threadpool(write_chunks, [])
+    except BaseException:
+        if buffer is not None:
+            await run_in_threadpool(buffer.close)
+        if temp_path is not None:
+            temp_path.unlink(missing_ok=True)
+        raise
+    await run_in_threadpool(buffer.close)
+
+    info = await run_in_threadpool(_finalize, temp_path, target)
+    return StreamedUpload(reader.filename, target, hasher.hexdigest(), size, info)
+
+
+class ResumableUploadStore:
+    """
+    可断点续传的分块上传。每个上传会话在 <media>/.uploads 下对应两个文件：
+      - <upload_id>.json : 原始文件名与声明的总大小
+      - <upload_id>.part : 已收到的数据，文件长度即当前偏移量
+    状态全部在磁盘上，多个 API 进程之间共享；同一会话的写入用文件锁串行化。
+    """
+
+    def __init__(self, root: Path | None = None):
+        self.root = root or media_root() / ".uploads"
+
+    def _paths(self, upload_id: str) -> tuple[Path, Path]:
+        if not _UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadError("Upload not found", status_code=404)
+        return self.root / f"{upload_id}.json", self.root / f"{upload_id}.part"
+
+    def _load(self, upload_id: str) -> tuple[dict, Path]:
+        meta_path, part_path = self._paths(upload_id)
+        if not meta_path.exists() or not part_path.exists():
+            raise UploadError("Upload not found", status_code=404)
+        return json.loads(meta_path.read_text()), part_path
+
+    def create(self, filename: str, size: int) -> dict:
+        if not filename:
+            raise UploadError("No filename found")
+        if size <= 0:
+            raise UploadError("Upload size must be positive")
+        if size > settings.MAX_UPLOAD_BYTES:
+            raise UploadError(f"File exceeds the upload limit of {settings.MAX_UPLOAD_BYTES} bytes", status_code=413)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.cleanup_expired()
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        part_path.touch()
+        meta_path.write_text(json.dumps({"filename": filename, "size": size, "created_at": time.time()}))
+        return self.status(upload_id)
+
+    def status(self, upload_id: str) -> dict:
+        meta, part_path = self._load(upload_id)
+        return {
+            "upload_id": upload_id,
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "offset": part_path.stat().st_size,
+            "chunk_size": settings.UPLOAD_CHUNK_BYTES,
+        }
+
+    def write_chunk(self, upload_id: str, offset: int, data: bytes) -> dict:
+        """
+        在 offset 处追加一块数据。offset 必须等于服务端已收到的字节数，否则返回 409，
+        客户端应先查询状态再从正确的位置续传；重复发送已确认的块不会破坏文件。
+        """
+        meta, part_path = self._load(upload_id)
+        with open(part_path, "r+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                current = f.seek(0, 2)
+                if offset != current:
+                    raise UploadError(f"Offset mismatch: expected {current}, got {offset}", status_code=409)
+                if current + len(data) > meta["size"]:
+                    raise UploadError("Chunk exceeds the declared upload size", status_code=413)
+                f.write(data)
+                f.flush()
+                current += len(data)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return {"upload_id": upload_id, "offset": current, "size": meta["size"]}
+
+    def complete(self, upload_id: str) -> StreamedUpload:
+        """校验数据已全部到达，计算哈希、探测视频信息并移动到最终路径。"""
+        meta, part_path = self._load(upload_id)
+        meta_path, _ = self._paths(upload_id)
+        size = part_path.stat().st_size
+        if size != meta["size"]:
+            raise UploadError(f"Upload incomplete: received {size} of {meta['size']} bytes", status_code=409)
+
+        hasher = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            while chunk := f.read(settings.UPLOAD_CHUNK_BYTES):
+                hasher.update(chunk)
+
+        target = unique_media_path(meta["filename"])
+        try:
+            info = _finalize(part_path, target)
+        finally:
+            meta_path.unlink(missing_ok=True)
+        return StreamedUpload(meta["filename"], target, hasher.hexdigest(), size, info)
+
+    def abort(self, upload_id: str):
+        meta_path, part_path = self._paths(upload_id)
+        meta_path.unlink(missing_ok=True)
+        part_path.unlink(missing_ok=True)
+
+    def cleanup_expired(self) -> int:
+        """删除超过 UPLOAD_SESSION_TTL_HOURS 仍未完成的会话。"""
+        if not self.root.exists():
+            return 0
+        deadline = time.time() - settings.UPLOAD_SESSION_TTL_HOURS * 3600
+        removed = 0
+        for meta_path in self.root.glob("*.json"):
+            part_path = meta_path.with_suffix(".part")
+            try:
+                last_activity = max(meta_path.stat().st_mtime, part_path.stat().st_mtime if part_path.exists() else 0)
+            except FileNotFoundError:
+                continue  # 另一个进程刚刚完成或删除了这个会话
+            if last_activity < deadline:
+                meta_path.unlink(missing_ok=True)
+                part_path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+resumable_uploads = ResumableUploadStore()
@@ -1,18 +1,176 @@
-import chromadb
+from abc import ABC, abstractmethod
+
 from app.core.config import settings
 
-class VectorDBService:
-    def __init__(self):
-        self.client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
-        
-        # 不再指定任何默认的 embedding_function
-        # 避免了 ChromaDB 客户端在初始化时去下载任何模型。
-        self.collection = self.client.get_or_create_collection(
-            name="video_frames"
+
+class VectorBackend(ABC):
+    """
+    帧向量存储后端的统一接口。查询结果沿用 ChromaDB 的返回结构
+    （ids / distances / metadatas 均为"每个查询一个列表"），距离为平方 L2 距离。
+    """
+
+    @abstractmethod
+    def add(self, embeddings, metadatas: list[dict], ids: list[str]):
+        ...
+
+    @abstractmethod
+    def query(self, query_embeddings, n_results: int = 10, where: dict | None = None) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, where: dict | None = None, limit: int | None = None, offset: int = 0,
+            include_embeddings: bool = False) -> dict:
+        ...
+
+    @abstractmethod
+    def delete(self, ids: list[str] | None = None, where: dict | None = None):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class ChromaVectorBackend(VectorBackend):
+    """基于 ChromaDB HTTP 服务的后端。客户端在第一次使用时才创建，构造时不需要 Chroma 在线。"""
+
+    def __init__(self, collection_name: str = "video_frames"):
+        self.collection_name = collection_name
+        self._collection = None
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            import chromadb
+            client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+            # 不再指定任何默认的 embedding_function
+            # 避免了 ChromaDB 客户端在初始化时去下载任何模型。
+            self._collection = client.get_or_create_collection(name=self.collection_name)
+        return self._collection
+
+    @staticmethod
+    def _as_lists(embeddings) -> list:
+        return embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings
+
+    def add(self, embeddings, metadatas, ids):
+        self.collection.add(embeddings=self._as_lists(embeddings), metadatas=metadatas, ids=ids)
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        return self.collection.query(
+            query_embeddings=self._as_lists(query_embeddings), n_results=n_results, where=where,
+            include=["metadatas", "distances"],
         )
 
-    def add_embeddings(self, embeddings: list, metadatas: list, ids: list):
+    def get(self, where=None, limit=None, offset=0, include_embeddings=False):
+        include = ["metadatas", "embeddings"] if include_embeddings else ["metadatas"]
+        return self.collection.get(where=where, limit=limit, offset=offset, include=include)
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def count(self):
+        return self.collection.count()
+
+
+def create_vector_backend(name: str | None = None, collection_name: str = "video_frames") -> VectorBackend:
+    """根据 settings.VECTOR_BACKEND 创建后端：chroma（默认）、local（进程内内存映射索引）或 ivfpq。"""
+    name = (name or settings.VECTOR_BACKEND).lower()
+    if name == "chroma":
+        return ChromaVectorBackend(collection_name)
+    if name in ("local", "ivfpq"):
+        from pathlib import Path
+        path = Path(settings.LOCAL_VECTOR_INDEX_PATH) / collection_name
+        if name == "ivfpq":
+            from app.services.ivfpq_index import IVFPQIndex
+            return IVFPQIndex(
+                path,
+                dim=settings.VECTOR_DIM,
+                dtype=settings.LOCAL_VECTOR_DTYPE,
+                nlist=settings.IVF_NLIST,
+                m=settings.PQ_SUBSPACES,
+                nprobe=settings.IVF_NPROBE,
+                rerank=settings.IVF_RERANK,
+            )
+        from app.services.local_vector_index import LocalVectorIndex
+        return LocalVectorIndex(path, dim=settings.VECTOR_DIM, dtype=settings.LOCAL_VECTOR_DTYPE)
+    raise ValueError(f"Unknown vector backend: {name}")
+
+
+SUMMARY_COLLECTION = "video_summaries"
+
+
+class VectorDBService:
+    def __init__(self, backend: VectorBackend | None = None, summary_backend: VectorBackend | None = None):
+        self._backend = backend
+        self._summary_backend = summary_backend
+
+    @property
+    def backend(self) -> VectorBackend:
+        # 后端在第一次使用时才创建：导入本模块不会打开索引文件或连接 Chroma
+        if self._backend is None:
+            self._backend = create_vector_backend()
+        return self._backend
+
+    @property
+    def summary_backend(self) -> VectorBackend:
+        """视频摘要向量（见 video_summaries.py）的集合。条数很少，VECTOR_BACKEND=ivfpq 时也用精确检索。"""
+        if self._summary_backend is None:
+            name = "local" if settings.VECTOR_BACKEND.lower() == "ivfpq" else None
+            self._summary_backend = create_vector_backend(name, collection_name=SUMMARY_COLLECTION)
+        return self._summary_backend
+
+    def add_embeddings(self, embeddings, metadatas: list, ids: list):
         if not ids: return
-        self.collection.add(embeddings=embeddings, metadatas=metadatas, ids=ids)
+        self.backend.add(embeddings, metadatas, ids)
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict | None = None) -> dict:
+        return self.backend.query(query_embeddings, n_results=n_results, where=where)
+
+    def query_summaries(self, query_embeddings, n_results: int = 10, where: dict | None = None) -> dict:
+        return self.summary_backend.query(query_embeddings, n_results=n_results, where=where)
+
+    def replace_video_summaries(self, video_id: int, embeddings, metadatas: list, ids: list):
+        """写入一个视频的摘要向量，先删除该视频已有的摘要（重新处理时段数可能变化）。"""
+        self.summary_backend.delete(where={"video_id": video_id})
+        if ids:
+            self.summary_backend.add(embeddings, metadatas, ids)
+
+    def delete_video(self, video_id: int):
+        self.backend.delete(where={"video_id": video_id})
+        self.summary_backend.delete(where={"video_id": video_id})
+
+    def copy_video_embeddings(self, source_video_id: int, target_video_id: int, batch_size: int = 1000) -> int:
+        """
+        把一个视频的全部帧向量与摘要向量复制给另一个视频（用于内容相同的重复上传），无需重新计算 CLIP。
+        先删除目标视频已有的向量，任务被重新投递时重复执行的结果一致。
+        :return: 复制的帧向量数量
+        """
+        copied = self._copy_video(self.backend, source_video_id, target_video_id, batch_size)
+        self._copy_video(self.summary_backend, source_video_id, target_video_id, batch_size)
+        return copied
+
+    @staticmethod
+    def _copy_video(backend: VectorBackend, source_video_id: int, target_video_id: int, batch_size: int) -> int:
+        backend.delete(where={"video_id": target_video_id})
+        source_prefix, target_prefix = f"video_{source_video_id}_", f"video_{target_video_id}_"
+        copied, offset = 0, 0
+        while True:
+            page = backend.get(
+                where={"video_id": source_video_id},
+                limit=batch_size,
+                offset=offset,
+                include_embeddings=True,
+            )
+            ids = page["ids"]
+            if not ids:
+                break
+            new_ids = [target_prefix + id_[len(source_prefix):] if id_.startswith(source_prefix) else f"{target_prefix}{id_}"
+                       for id_ in ids]
+            new_metadatas = [{**metadata, "video_id": target_video_id} for metadata in page["metadatas"]]
+            embeddings = [list(embedding) for embedding in page["embeddings"]]
+            backend.add(embeddings, new_metadatas, new_ids)
+            copied += len(ids)
+            offset += len(ids)
+        return copied
 
 vector_db_service = VectorDBService()
@@ -1,5 +1,15 @@
+import json
+import queue
+import re
 import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterator
+
+import numpy as np
 
 # 定义媒体文件的根目录，与 docker-compose.yml 中挂载的路径一致
 MEDIA_ROOT = Path("/media")
@@ -8,6 +18,10 @@ class VideoProcessingError(Exception):
     """自定义异常，用于视频处理失败时抛出"""
     pass
 
+def _stderr_tail(stderr: str, lines: int = 20) -> str:
+    # ffmpeg 的 stderr 以版本与配置信息开头，出错原因在最后几行
+    return "\n".join(stderr.strip().splitlines()[-lines:])
+
 def extract_audio(video_path: Path) -> Path:
     """
     从视频文件中提取音频。
@@ -35,16 +49,12 @@ def extract_audio(video_path: Path) -> Path:
     
     try:
         # 执行命令
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        print("FFmpeg audio extraction successful.")
-        print("FFmpeg stdout:", result.stdout)
-        print("FFmpeg stderr:", result.stderr)
+        subprocess.run(command, check=True, capture_output=True, text=True)
         return audio_path
     except subprocess.CalledProcessError as e:
         # 如果 FFmpeg 返回非 0 退出码，说明出错了
         print(f"FFmpeg audio extraction failed. Return code: {e.returncode}")
-        print("FFmpeg stderr:", e.stderr)
-        raise VideoProcessingError(f"Audio extraction failed: {e.stderr}")
+        raise VideoProcessingError(f"Audio extraction failed: {_stderr_tail(e.stderr)}")
 
 def extract_frames(video_path: Path, interval_seconds: int = 5) -> Path:
     """
@@ -70,15 +80,11 @@ def extract_frames(video_path: Path, interval_seconds: int = 5) -> Path:
     print(f"Running FFmpeg command to extract frames: {' '.join(command)}")
     
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-        print("FFmpeg frame extraction successful.")
-        print("FFmpeg stdout:", result.stdout)
-        print("FFmpeg stderr:", result.stderr)
+        subprocess.run(command, check=True, capture_output=True, text=True)
         return frames_dir
     except subprocess.CalledProcessError as e:
         print(f"FFmpeg frame extraction failed. Return code: {e.returncode}")
-        print("FFmpeg stderr:", e.stderr)
-        raise VideoProcessingError(f"Frame extraction failed: {e.stderr}")
+        raise VideoProcessingError(f"Frame extraction failed: {_stderr_tail(e.stderr)}")
     
 # 提取单张指定帧的函数
 def extract_specific_frame(video_path: Path, frame_time: float) -> Path:
@@ -96,5 +102,274 @@ def extract_specific_frame(video_path: Path, frame_time: float) -> Path:
         return cover_path
     except subprocess.CalledProcessError as e:
         # 如果出错，我们会看到这个日志
-        print(f"Cover frame extraction failed: {e.stderr}")
-        raise VideoProcessingError(f"Cover frame extraction failed: {e.stderr}")
\ No newline at end of file
+        print(f"Cover frame extraction failed. Return code: {e.returncode}")
+        raise VideoProcessingError(f"Cover frame extraction failed: {_stderr_tail(e.stderr)}")
+
+
+def probe_video(video_path: Path) -> dict:
+    """
+    使用 ffprobe 读取视频的基本信息。
+    :return: 包含 duration、width、height、codec、has_audio 的字典
+    """
+    command = [
+        "ffprobe", "-v", "error",
+        "-show_format", "-show_streams",
+        "-of", "json",
+        str(video_path)
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+    except subprocess.CalledProcessError as e:
+        raise VideoProcessingError(f"Video probe failed: {e.stderr}")
+
+    info = json.loads(result.stdout or "{}")
+    streams = info.get("streams", [])
+    video_stream = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video_stream is None:
+        raise VideoProcessingError(f"No video stream found in {video_path}")
+
+    width, height = int(video_stream["width"]), int(video_stream["height"])
+    # 竖拍视频带有旋转元数据，ffmpeg 解码时会自动旋转，宽高需要对调
+    rotation = video_stream.get("tags", {}).get("rotate")
+    for side_data in video_stream.get("side_data_list", []):
+        rotation = side_data.get("rotation", rotation)
+    if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+
+    return {
+        "duration": float(info.get("format", {}).get("duration") or 0.0),
+        "width": width,
+        "height": height,
+        "codec": video_stream.get("codec_name"),
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+
+@dataclass
+class StreamedFrame:
+    """流式抽帧产出的一帧。image 指向可复用的缓冲区，只在随后 buffer_count 帧内有效。"""
+    index: int
+    timestamp: float
+    image: np.ndarray
+    scene: int | None = None  # 所属镜头编号，只由自适应抽帧标注；固定间隔抽帧时为 None
+
+
+def _scaled_size(width: int, height: int, short_side: int) -> tuple[int, int]:
+    # 按短边等比缩放，并保证宽高为偶数（部分像素格式要求）
+    scale = short_side / min(width, height)
+    return max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2)
+
+
+_PTS_TIME_PATTERN = re.compile(r"pts_time:\s*(-?[\d.]+)")
+
+
+def _iter_piped_frames(
+    command: list[str],
+    width: int,
+    height: int,
+    interval_seconds: float,
+    buffer_count: int,
+    error_label: str,
+) -> Iterator[StreamedFrame]:
+    """
+    启动 ffmpeg，从 stdout 逐帧读取 rgb24 原始数据到环形缓冲区，并从 stderr 的 showinfo 输出中解析时间戳。
+    """
+    frame_bytes = width * height * 3
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    timestamps: queue.Queue = queue.Queue()
+    stderr_tail: deque = deque(maxlen=20)
+
+    def drain_stderr():
+        # 必须持续读取 stderr，否则管道写满后 ffmpeg 会阻塞
+        for raw_line in process.stderr:
+            line = raw_line.decode("utf-8", errors="replace").rstrip()
+            match = _PTS_TIME_PATTERN.search(line) if "Parsed_showinfo" in line else None
+            if match:
+                timestamps.put(float(match.group(1)))
+            else:
+                stderr_tail.append(line)
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    buffers = np.empty((max(1, buffer_count), height, width, 3), dtype=np.uint8)
+    index = 0
+    try:
+        while True:
+            slot = buffers[index % len(buffers)]
+            view = memoryview(slot.reshape(-1))
+            filled = 0
+            while filled < frame_bytes:
+                n = process.stdout.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            if filled < frame_bytes:
+                break
+
+            try:
+                timestamp = timestamps.get(timeout=5)
+            except queue.Empty:
+                timestamp = index * interval_seconds
+            yield StreamedFrame(index=index, timestamp=timestamp, image=slot)
+            index += 1
+
+        process.wait()
+        stderr_thread.join(timeout=5)
+        if process.returncode != 0:
+            stderr_text = "\n".join(stderr_tail)
+            print(f"FFmpeg {error_label} failed. Return code: {process.returncode}")
+            raise VideoProcessingError(f"{error_label.capitalize()} failed: {stderr_text}")
+        print(f"FFmpeg {error_label} finished: {index} frames of {width}x{height}.")
+    finally:
+        # 消费方提前停止迭代时，确保 ffmpeg 进程被回收
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def stream_frames(
+    video_path: Path,
+    interval_seconds: float = 5,
+    short_side: int = 224,
+    buffer_count: int = 64,
+) -> Iterator[StreamedFrame]:
+    """
+    按固定时间间隔抽帧，通过 ffmpeg 的 stdout 管道直接读取 RGB 原始帧，不在磁盘上写 JPEG。
+    每帧的时间戳来自 showinfo 滤镜输出的 pts_time，是精确值。
+    :param video_path: 原始视频文件的绝对路径
+    :param interval_seconds: 抽帧间隔（秒）
+    :param short_side: 输出帧短边的像素数
+    :param buffer_count: 环形缓冲区的帧数；消费方若需要持有帧超过这个数量，必须自行拷贝
+    """
+    info = probe_video(video_path)
+    width, height = _scaled_size(info["width"], info["height"], short_side)
+
+    command = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-i", str(video_path),
+        "-vf", f"fps=1/{interval_seconds},showinfo,scale={width}:{height}",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "pipe:1"
+    ]
+    print(f"Running FFmpeg command to stream frames: {' '.join(command)}")
+    yield from _iter_piped_frames(command, width, height, interval_seconds, buffer_count, "frame streaming")
+
+
+class MediaExtraction:
+    """
+    单次解码同时产出三路输出：16kHz 单声道 WAV（include_audio=False 时不输出）、封面 JPEG，以及通过管道流出的抽帧。
+    迭代 frames() 即驱动整个 ffmpeg 进程；迭代结束后 audio_path / cover_path 可用，
+    timings 中记录各路输出完成的时刻（相对于进程启动，单位秒）。
+
+    传入 frame_filter 时按 candidate_fps 解码候选帧，只产出 frame_filter 返回 True 的帧
+    （自适应抽帧）；此时环形缓冲区的有效期按读取的候选帧数计算。
+    """
+
+    def __init__(
+        self,
+        video_path: Path,
+        interval_seconds: float = 5,
+        cover_time: float = 1.0,
+        short_side: int = 224,
+        buffer_count: int = 64,
+        frame_filter: Callable[[StreamedFrame], bool] | None = None,
+        candidate_fps: float = 1.0,
+        include_audio: bool = True,
+    ):
+        self.video_path = video_path
+        self.frame_filter = frame_filter
+        # 自适应模式下 ffmpeg 只负责按候选帧率均匀解码，挑选由 frame_filter 完成
+        self.interval_seconds = 1 / candidate_fps if frame_filter is not None else interval_seconds
+        self.short_side = short_side
+        self.buffer_count = buffer_count
+
+        self.info = probe_video(video_path)
+        # 视频比封面时间点还短时，退回到视频中间位置
+        duration = self.info["duration"]
+        self.cover_time = min(cover_time, duration / 2) if duration > 0 else 0.0
+
+        self.frames_dir = video_path.parent / video_path.stem
+        # include_audio=False 时只输出帧与封面，音频由调用方另行提取（extract_audio）
+        self.audio_path: Path | None = (
+            video_path.with_suffix(".wav") if self.info["has_audio"] and include_audio else None
+        )
+        self.cover_path: Path | None = self.frames_dir / "cover.jpg"
+        self.frame_count = 0
+        self.candidate_count = 0
+        self.timings: dict[str, float] = {}
+
+    def _build_command(self, width: int, height: int) -> list[str]:
+        filter_graph = (
+            "[0:v]split=2[sample][cover];"
+            f"[sample]fps=1/{self.interval_seconds},showinfo,scale={width}:{height}[frames];"
+            f"[cover]trim=start={self.cover_time}:duration=1,setpts=PTS-STARTPTS[coverout]"
+        )
+        command = [
+            "ffmpeg", "-hide_banner", "-nostats", "-y",
+            "-i", str(self.video_path),
+            "-filter_complex", filter_graph,
+            "-map", "[frames]", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+            "-map", "[coverout]", "-frames:v", "1", "-q:v", "2", str(self.cover_path),
+        ]
+        if self.audio_path is not None:
+            command += [
+                "-map", "0:a:0", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
+                str(self.audio_path)
+            ]
+        return command
+
+    def frames(self) -> Iterator[StreamedFrame]:
+        width, height = _scaled_size(self.info["width"], self.info["height"], self.short_side)
+        self.frames_dir.mkdir(exist_ok=True)
+        self.cover_path.unlink(missing_ok=True)
+        command = self._build_command(width, height)
+        print(f"Running FFmpeg command for single-pass media extraction: {' '.join(command)}")
+
+        started = time.perf_counter()
+        for frame in _iter_piped_frames(
+            command, width, height, self.interval_seconds, self.buffer_count, "media extraction"
+        ):
+            elapsed = time.perf_counter() - started
+            # 抽帧间隔较大，逐帧检查一次封面文件的代价可以忽略
+            if "cover" not in self.timings and self.cover_path.exists():
+                self.timings["cover"] = elapsed
+            self.candidate_count += 1
+            if self.frame_filter is not None and not self.frame_filter(frame):
+                continue
+            self.timings.setdefault("first_frame", elapsed)
+            self.timings["frames"] = elapsed
+            self.frame_count += 1
+            yield frame
+
+        # 计时以进程启动为零点；管道有背压，消费方的处理时间也会计入
+        total = time.perf_counter() - started
+        self.timings.setdefault("frames", total)
+        self.timings.setdefault("cover", total)
+        # WAV 头在进程退出时才写完，音频与整个进程同时完成
+        if self.audio_path is not None:
+            self.timings["audio"] = total
+        self.timings["total"] = total
+        if not self.cover_path.exists():
+            self.cover_path = None
+        print(f"Single-pass media extraction timings (s): {self.timings}")
+
+
+def extract_media(
+    video_path: Path,
+    interval_seconds: float = 5,
+    cover_time: float = 1.0,
+    short_side: int = 224,
+    buffer_count: int = 64,
+    frame_filter: Callable[[StreamedFrame], bool] | None = None,
+    candidate_fps: float = 1.0,
+    include_audio: bool = True,
+) -> MediaExtraction:
+    """
+    替代分别调用 extract_audio / extract_frames / extract_specific_frame：
+    三路输出共享同一次解码，预处理开销只随一次解码增长。
+    """
+    return MediaExtraction(
+        video_path, interval_seconds, cover_time, short_side, buffer_count, frame_filter, candidate_fps, include_audio
+    )
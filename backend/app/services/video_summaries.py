@@ -0,0 +1,133 @@
+"""
+视频级的向量摘要：入库时聚合一个视频的帧向量，写入单独的 video_summaries 集合（每个视频十几条，远小于帧集合），
+以文搜图时先在摘要中选出候选视频，再只检索这些视频的帧（见 visual_search.py）。
+
+每个视频的摘要：
+  - video   : 全部帧向量的均值
+  - scene   : VIDEO_SUMMARY_METHOD=mean 时，每个镜头（自适应抽帧给出的镜头编号；没有时按每分钟一段）的均值，
+              段数超过 VIDEO_SUMMARY_MAX_SEGMENTS 时相邻的段合并
+  - cluster : VIDEO_SUMMARY_METHOD=kmeans 时代替 scene，帧向量的 k-means 中心
+每条摘要记录覆盖的时间范围与帧数。摘要向量做 L2 归一化，摘要之间按余弦相似度排序。
+"""
+import numpy as np
+
+from app.core.config import settings
+from app.services.ivfpq_index import _assign, _kmeans
+from app.services.vector_db_service import vector_db_service
+
+# 没有镜头编号时（未启用自适应抽帧）按这个时长分段
+_WINDOW_SECONDS = 60.0
+_KMEANS_ITERATIONS = 10
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VideoSummaryBuilder:
+    """
+    随帧向量逐批写入累加：mean 模式只保存每段的向量和（内存与帧数无关），kmeans 模式保存全部帧向量。
+    """
+
+    def __init__(self, method: str | None = None, max_segments: int | None = None):
+        self.method = (method or settings.VIDEO_SUMMARY_METHOD).lower()
+        self.max_segments = max_segments or settings.VIDEO_SUMMARY_MAX_SEGMENTS
+        self._segments: dict = {}     # 段的键 -> [向量和, 帧数, 开始时间, 结束时间]
+        self._vectors: list[np.ndarray] = []
+        self._timestamps: list[float] = []
+        self.frames = 0
+
+    def add(self, embeddings, timestamps: list[float], scenes: list[int | None]):
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32))
+        for vector, timestamp, scene in zip(embeddings, timestamps, scenes):
+            timestamp = float(timestamp)
+            key = ("scene", scene) if scene is not None else ("window", int(timestamp // _WINDOW_SECONDS))
+            segment = self._segments.get(key)
+            if segment is None:
+                self._segments[key] = [vector.astype(np.float64), 1, timestamp, timestamp]
+            else:
+                segment[0] += vector
+                segment[1] += 1
+                segment[2] = min(segment[2], timestamp)
+                segment[3] = max(segment[3], timestamp)
+        if self.method == "kmeans":
+            self._vectors.append(embeddings)
+            self._timestamps.extend(float(timestamp) for timestamp in timestamps)
+        self.frames += len(embeddings)
+
+    def _merged_segments(self) -> list[list]:
+        """按开始时间排序后，把相邻的段按帧数均匀地合并为不超过 max_segments 组。"""
+        segments = sorted(self._segments.items(), key=lambda item: item[1][2])
+        groups: list[list] = []
+        seen = 0
+        for key, (total, count, start, end) in segments:
+            group = seen * self.max_segments // self.frames
+            if len(groups) <= group:
+                groups.append([np.zeros_like(total), 0, start, end, key[1] if key[0] == "scene" else None])
+            merged = groups[-1]
+            merged[0] += total
+            merged[1] += count
+            merged[3] = max(merged[3], end)
+            seen += count
+        return groups
+
+    def _clusters(self) -> list[list]:
+        vectors = np.concatenate(self._vectors)
+        timestamps = np.asarray(self._timestamps)
+        centroids = _kmeans(vectors, self.max_segments, iterations=_KMEANS_ITERATIONS)
+        assignment = _assign(vectors, centroids)
+        clusters = []
+        for cluster in np.unique(assignment):
+            members = assignment == cluster
+            clusters.append([centroids[cluster], int(members.sum()),
+                             float(timestamps[members].min()), float(timestamps[members].max()), None])
+        return sorted(clusters, key=lambda cluster: cluster[2])
+
+    def build(self, video_id: int, video_filename: str) -> tuple[np.ndarray, list[dict], list[str]]:
+        """:return: (摘要向量, 元数据, id)；没有帧时三者均为空"""
+        if not self.frames:
+            return np.empty((0, 0), dtype=np.float32), [], []
+        base = {"video_id": video_id, "video_filename": video_filename}
+        segments = list(self._segments.values())
+        vectors = [sum(segment[0] for segment in segments)]
+        metadatas = [{**base, "kind": "video", "start": round(min(segment[2] for segment in segments), 3),
+                      "end": round(max(segment[3] for segment in segments), 3), "frames": self.frames}]
+        ids = [f"video_{video_id}_summary"]
+
+        kind = "cluster" if self.method == "kmeans" else "scene"
+        parts = self._clusters() if self.method == "kmeans" else self._merged_segments()
+        for i, (vector, count, start, end, scene) in enumerate(parts):
+            metadata = {**base, "kind": kind, "start": round(start, 3), "end": round(end, 3), "frames": count}
+            if scene is not None:
+                metadata["scene"] = scene
+            vectors.append(vector)
+            metadatas.append(metadata)
+            ids.append(f"video_{video_id}_{kind}_{i:04d}")
+        return _normalize(np.asarray(vectors, dtype=np.float32)), metadatas, ids
+
+
+def summaries_enabled() -> bool:
+    return settings.VIDEO_SUMMARY_METHOD.lower() != "none"
+
+
+def rebuild_video_summary(video_id: int, video_filename: str, batch_size: int = 1000) -> int:
+    """
+    从向量库中已有的帧向量重新生成一个视频的摘要（为启用摘要之前处理的视频补建）。
+    :return: 参与聚合的帧数
+    """
+    builder, offset = VideoSummaryBuilder(), 0
+    while True:
+        page = vector_db_service.backend.get(
+            where={"video_id": video_id}, limit=batch_size, offset=offset, include_embeddings=True,
+        )
+        if not page["ids"]:
+            break
+        builder.add(
+            page["embeddings"],
+            [metadata.get("timestamp_approx") or 0.0 for metadata in page["metadatas"]],
+            [metadata.get("scene") for metadata in page["metadatas"]],
+        )
+        offset += len(page["ids"])
+    vector_db_service.replace_video_summaries(video_id, *builder.build(video_id, video_filename))
+    return builder.frames
@@ -0,0 +1,113 @@
+"""
+以文搜图的帧检索：粗排 → 精排，以及按视频分组、去重的结果。
+
+  coarse : 先在 video_summaries 集合（每个视频十几条摘要向量）中选出 VISUAL_SEARCH_CANDIDATE_VIDEOS 个候选视频，
+           再用 video_id $in 过滤只检索这些视频的帧，检索代价取决于候选视频的帧数而不是全部帧数；
+           摘要集合为空（尚未生成摘要）时退回 flat
+  flat   : 直接在全部帧中检索
+
+同一镜头内的帧几乎相同，直接取最近的帧常常整页都来自同一视频的同一段；分组时每个视频最多保留几帧，
+且同一镜头只取一帧、保留的帧之间至少相隔 VISUAL_SEARCH_MIN_GAP_SECONDS。
+"""
+from app.core.config import settings
+from app.services.vector_db_service import VectorDBService, vector_db_service
+
+# 精排时多取的帧数倍数，去重后仍能填满每个视频的名额
+_OVERFETCH = 4
+
+
+def candidate_videos(query_vector, n_videos: int, service: VectorDBService | None = None) -> list[int]:
+    """:return: 摘要与查询最接近的视频，按最接近的一条摘要排序"""
+    service = service or vector_db_service
+    # 每个视频有多条摘要，多取一些才能凑够 n_videos 个不同的视频
+    hits = service.query_summaries([query_vector], n_results=n_videos * (settings.VIDEO_SUMMARY_MAX_SEGMENTS + 1))
+    videos: list[int] = []
+    for metadata in hits["metadatas"][0] if hits.get("metadatas") else []:
+        if metadata["video_id"] not in videos:
+            videos.append(metadata["video_id"])
+            if len(videos) == n_videos:
+                break
+    return videos
+
+
+def search_frames(query_vector, n_results: int, mode: str | None = None,
+                  n_videos: int | None = None, service: VectorDBService | None = None) -> dict:
+    """
+    检索与查询最接近的帧，返回 ChromaDB 结构的结果（只有一个查询）。
+    :param mode: coarse / flat，默认取 VISUAL_SEARCH_MODE
+    """
+    service = service or vector_db_service
+    mode = (mode or settings.VISUAL_SEARCH_MODE).lower()
+    videos = candidate_videos(query_vector, n_videos or settings.VISUAL_SEARCH_CANDIDATE_VIDEOS, service) \
+        if mode == "coarse" else []
+    where = {"video_id": {"$in": videos}} if videos else None
+    return service.query([query_vector], n_results=n_results, where=where)
+
+
+def group_frame_hits(frame_hits: dict, size: int = 10, frames_per_video: int | None = None,
+                     min_gap_seconds: float | None = None) -> list[dict]:
+    """
+    把帧检索结果按视频分组并去重：组按其中最近的一帧排序，组内按距离排序。
+    :param frame_hits: ChromaDB 结构的检索结果，只取第一个查询
+    :return: [{"video_id", "video_filename", "distance", "frames": [{"id", "distance", **元数据}]}]
+    """
+    frames_per_video = frames_per_video or settings.VISUAL_SEARCH_FRAMES_PER_VIDEO
+    min_gap = settings.VISUAL_SEARCH_MIN_GAP_SECONDS if min_gap_seconds is None else min_gap_seconds
+    groups: dict[int, dict] = {}
+    if not frame_hits or not frame_hits.get("ids"):
+        return []
+    for frame_id, metadata, distance in zip(frame_hits["ids"][0], frame_hits["metadatas"][0], frame_hits["distances"][0]):
+        video_id = metadata.get("video_id")
+        group = groups.get(video_id)
+        if group is None:
+            if len(groups) == size:
+                continue
+            group = groups[video_id] = {
+                "video_id": video_id, "video_filename": metadata.get("video_filename"),
+                "distance": distance, "frames": [],
+            }
+        frames = group["frames"]
+        if len(frames) == frames_per_video:
+            continue
+        timestamp, scene = metadata.get("timestamp_approx") or 0.0, metadata.get("scene")
+        if any((scene is not None and kept.get("scene") == scene)
+               or abs((kept.get("timestamp_approx") or 0.0) - timestamp) < min_gap for kept in frames):
+            continue
+        frames.append({"id": frame_id, "distance": distance, **metadata})
+    # 结果本身按距离升序，组的插入顺序即为按最近一帧排序
+    return list(groups.values())
+
+
+def search_grouped(query_vector, size: int = 10, frames_per_video: int | None = None, mode: str | None = None,
+                   service: VectorDBService | None = None) -> list[dict]:
+    """
+    检索并按视频分组：多取 _OVERFETCH 倍的帧，去重后每个视频仍能留下 frames_per_video 帧。
+    coarse 模式下最接近的帧可能全部来自一两个视频（大量近重复帧），不足 size 组时按粗排顺序逐个查询其余候选视频补齐。
+    """
+    service = service or vector_db_service
+    frames_per_video = frames_per_video or settings.VISUAL_SEARCH_FRAMES_PER_VIDEO
+    mode = (mode or settings.VISUAL_SEARCH_MODE).lower()
+    videos = candidate_videos(query_vector, settings.VISUAL_SEARCH_CANDIDATE_VIDEOS, service) if mode == "coarse" else []
+    where = {"video_id": {"$in": videos}} if videos else None
+    frame_hits = service.query([query_vector], n_results=size * frames_per_video * _OVERFETCH, where=where)
+    groups = group_frame_hits(frame_hits, size=size, frames_per_video=frames_per_video)
+
+    present = {group["video_id"] for group in groups}
+    for video_id in videos:
+        if len(groups) >= size:
+            break
+        if video_id in present:
+            continue
+        hits = service.query([query_vector], n_results=frames_per_video * _OVERFETCH, where={"video_id": video_id})
+        groups.extend(group_frame_hits(hits, size=1, frames_per_video=frames_per_video))
+    return sorted(groups, key=lambda group: group["distance"])
+
+
+def flatten_groups(groups: list[dict]) -> dict:
+    """把分组结果还原为 ChromaDB 结构（一个查询），兼容按原始结构解析结果的调用方。"""
+    frames = [frame for group in groups for frame in group["frames"]]
+    return {
+        "ids": [[frame["id"] for frame in frames]],
+        "distances": [[frame["distance"] for frame in frames]],
+        "metadatas": [[{key: value for key, value in frame.items() if key not in ("id", "distance")} for frame in frames]],
+    }
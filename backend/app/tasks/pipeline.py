@@ -0,0 +1,382 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.database.base import SessionLocal
+from app.models.subtitle import Subtitle
+from app.services.ai_models import configure_torch_threads
+from app.services.frame_embedding import FrameEmbedder
+from app.services.frame_sampling import AdaptiveFrameSampler
+from app.services.model_client import get_model_client
+from app.services.subtitle_store import bulk_insert_subtitles
+from app.services.transcription import transcribe_audio
+from app.services.vector_db_service import vector_db_service
+from app.services.video_summaries import VideoSummaryBuilder, summaries_enabled
+from app.services.video_processing import extract_audio, extract_media, MediaExtraction, StreamedFrame
+
+
+class StageTimings:
+    """线程安全地记录各阶段的墙钟耗时；同名阶段多次进入时耗时累加。"""
+
+    def __init__(self, offset: float = 0.0):
+        """
+        :param offset: 本对象创建时距离整个处理开始已过去的秒数；split 模式下各阶段在不同的任务中计时，
+                       据此把各自的开始时刻换算到同一条时间轴上
+        """
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter() - offset
+        self.stages: dict[str, dict[str, float]] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                record = self.stages.setdefault(name, {"start": started - self._origin, "seconds": 0.0})
+                record["seconds"] += elapsed
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def add_items(self, name: str, count: int):
+        """累计某个阶段处理的帧数 / 字幕条数。"""
+        with self._lock:
+            record = self.stages.setdefault(name, {"start": self.elapsed(), "seconds": 0.0})
+            record["items"] = record.get("items", 0) + count
+
+    def record(self, name: str, start: float, seconds: float, items: int | None = None):
+        """直接写入在别处计时的阶段（例如单次 ffmpeg 解码中各路输出的完成时刻）。"""
+        with self._lock:
+            self.stages[name] = {"start": start, "seconds": seconds}
+            if items is not None:
+                self.stages[name]["items"] = items
+
+    def records(self, include_total: bool = True) -> list[dict]:
+        """每个阶段一项（含 stage / start / seconds / items），最后一项为从开始到现在的总耗时。"""
+        with self._lock:
+            result = [
+                {"stage": name, "start": round(record["start"], 3), "seconds": round(record["seconds"], 3),
+                 "items": record.get("items")}
+                for name, record in self.stages.items()
+            ]
+        if include_total:
+            result.append({"stage": "total", "start": 0.0, "seconds": round(self.elapsed(), 3), "items": None})
+        return result
+
+    def summary(self) -> dict[str, float]:
+        with self._lock:
+            result = {name: round(record["seconds"], 3) for name, record in self.stages.items()}
+        result["total"] = round(self.elapsed(), 3)
+        return result
+
+
+def _frame_filename(frame: StreamedFrame) -> str:
+    # 与旧版 ffmpeg 输出的 frame_%04d.jpg 命名保持一致（从 1 开始编号）
+    return f"frame_{frame.index + 1:04d}.jpg"
+
+
+def _frame_metadata(frame: StreamedFrame, video_id: int, video_filename: str, with_thumbnail: bool) -> dict:
+    metadata = {
+        "video_id": video_id, "video_filename": video_filename,
+        "timestamp_approx": round(frame.timestamp, 3),
+    }
+    # 只有自适应抽帧给出镜头编号；固定间隔抽帧不写 scene，分组去重与摘要改按时间处理
+    if frame.scene is not None:
+        metadata["scene"] = frame.scene
+    if with_thumbnail:
+        metadata["frame_filename"] = _frame_filename(frame)
+    return metadata
+
+
+def _make_frame_loader(thumbnails_dir: Path | None):
+    """返回在预取线程中执行的帧加载函数；需要时顺带写出供前端展示的 JPEG 缩略图。"""
+    def load(frame: StreamedFrame):
+        if thumbnails_dir is not None:
+            Image.fromarray(frame.image).save(thumbnails_dir / _frame_filename(frame), quality=85)
+        return frame.image
+    return load
+
+
+def _configure_torch_threads():
+    # 转写与帧向量化并发执行，各自使用 torch 的 intra-op 线程；
+    # 默认把本进程可用的线程数（TORCH_NUM_THREADS 或核心数）平分给两个阶段，避免线程超额订阅
+    if get_model_client() is not None:
+        return  # 推理在模型服务中进行，本进程不使用 torch
+    import torch
+    configure_torch_threads()
+    threads = settings.PIPELINE_TORCH_THREADS or max(1, (settings.TORCH_NUM_THREADS or os.cpu_count() or 2) // 2)
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
+_FRAMES_DONE = object()
+
+# split 模式下解码阶段写出的帧文件（rgb24 原始数据，逐帧拼接）及其清单，向量化阶段读完即删除
+FRAME_STORE_NAME = ".frames.rgb"
+FRAME_MANIFEST_NAME = ".frames.json"
+
+
+def _create_sampler() -> AdaptiveFrameSampler | None:
+    if settings.FRAME_SAMPLING_MODE != "adaptive":
+        return None
+    return AdaptiveFrameSampler(
+        scene_threshold=settings.SCENE_CHANGE_THRESHOLD,
+        dedup_hamming=settings.FRAME_DEDUP_HAMMING,
+        max_gap_seconds=settings.FRAME_MAX_GAP_SECONDS,
+    )
+
+
+def _create_extraction(video_path: Path, sampler: AdaptiveFrameSampler | None, include_audio: bool = True) -> MediaExtraction:
+    return extract_media(
+        video_path,
+        interval_seconds=settings.FRAME_INTERVAL_SECONDS,
+        cover_time=1.0, # 提取第1秒的画面作为封面
+        short_side=settings.FRAME_STREAM_SHORT_SIDE,
+        # 帧在交给下游之前会被拷贝或写盘，不需要更大的环形缓冲区
+        buffer_count=2,
+        frame_filter=sampler.accept if sampler is not None else None,
+        candidate_fps=settings.FRAME_CANDIDATE_FPS,
+        include_audio=include_audio,
+    )
+
+
+def _record_extraction(timings: StageTimings, extraction: MediaExtraction, offset: float):
+    # 单次解码同时产出帧与音频，两路各自的完成时刻来自 MediaExtraction.timings
+    timings.record("extract_frames", offset, extraction.timings["frames"], items=extraction.frame_count)
+    if "audio" in extraction.timings:
+        timings.record("extract_audio", offset, extraction.timings["audio"])
+
+
+def _embed_frames(
+    frames: Iterable[StreamedFrame],
+    video_id: int,
+    video_filename: str,
+    thumbnails_dir: Path | None,
+    timings: StageTimings,
+) -> int:
+    """帧向量化并逐批写入向量数据库，不在内存中累积整段视频的结果；全部写完后写入视频摘要。:return: 帧数"""
+    embedder = FrameEmbedder()
+    summary = VideoSummaryBuilder() if summaries_enabled() else None
+    with timings.stage("embed"):
+        batches = embedder.iter_batches(frames, load_image=_make_frame_loader(thumbnails_dir))
+        for batch_frames, embeddings in batches:
+            metadatas_batch = [_frame_metadata(frame, video_id, video_filename, thumbnails_dir is not None)
+                               for frame in batch_frames]
+            ids_batch = [f"video_{video_id}_frame_{frame.index + 1:04d}" for frame in batch_frames]
+            with timings.stage("vector_insert"):
+                vector_db_service.add_embeddings(embeddings, metadatas_batch, ids_batch)
+            timings.add_items("embed", len(batch_frames))
+            timings.add_items("vector_insert", len(batch_frames))
+            if summary is not None:
+                summary.add(embeddings, [frame.timestamp for frame in batch_frames], [frame.scene for frame in batch_frames])
+    if summary is not None:
+        with timings.stage("video_summary"):
+            vector_db_service.replace_video_summaries(video_id, *summary.build(video_id, video_filename))
+    print(
+        f"Embedded {embedder.frames} frames for video {video_id} "
+        f"in {embedder.seconds:.2f}s ({embedder.frames_per_second:.1f} frames/sec)."
+    )
+    return embedder.frames
+
+
+def _transcribe_and_persist(
+    video_id: int,
+    audio_path: Path | None,
+    timings: StageTimings,
+    index_subtitles: Callable[[int], None],
+) -> int:
+    """转写、写入字幕并投递索引任务。:return: 字幕条数"""
+    if audio_path is None:
+        print(f"Video {video_id} has no audio stream, skipping transcription.")
+        return 0
+
+    with timings.stage("transcribe"):
+        transcription_result = transcribe_audio(audio_path)
+    timings.add_items("transcribe", len(transcription_result["segments"]))
+
+    with timings.stage("persist_subtitles"):
+        # Session 不是线程安全的，本阶段使用独立的会话
+        db = SessionLocal()
+        try:
+            # 任务被重新投递（worker 中途退出）时，先清掉上一次写入的字幕，保证重复执行的结果一致
+            db.execute(delete(Subtitle).where(Subtitle.video_id == video_id))
+            subtitle_ids = bulk_insert_subtitles(db, video_id, transcription_result["segments"])
+            db.commit()
+        finally:
+            db.close()
+    timings.add_items("persist_subtitles", len(subtitle_ids))
+    print(f"{len(subtitle_ids)} subtitles for video {video_id} saved to database.")
+
+    # 只投递 video_id，索引任务自己从数据库分块读取字幕，消息大小与字幕条数无关
+    with timings.stage("index_enqueue"):
+        index_subtitles(video_id)
+    return len(subtitle_ids)
+
+
+def run_video_pipeline(
+    video_id: int,
+    video_path: Path,
+    video_filename: str,
+    index_subtitles: Callable[[int], None],
+    offset: float = 0.0,
+) -> dict:
+    """
+    以小型阶段图的方式处理单个视频（PIPELINE_MODE=fused）：
+
+        extract ──(frames)──> embed ──> vector insert (逐批)
+        extract_audio ──────> transcribe ──> persist subtitles ──> index
+
+    抽帧解码、音频提取、帧向量化、语音转写分别在独立线程中运行：解码出的帧经有界队列进入向量化阶段，
+    向量化跟不上时解码随之阻塞，内存中最多只有 2 * CLIP_BATCH_SIZE 帧在排队。
+    音频由单独的 ffmpeg 进程提取（只解码音轨，代价很小），不受帧管道背压的影响，写完即开始转写。
+    :param offset: 任务开始前已经过去的秒数（例如排队时间），各阶段的开始时刻据此平移
+    :return: 各阶段耗时（timings 为汇总，stages 为逐阶段记录，供写入 video_stage_metrics）及帧数、字幕条数
+    """
+    _configure_torch_threads()
+    timings = StageTimings(offset)
+    sampler = _create_sampler()
+    extraction = _create_extraction(video_path, sampler, include_audio=False)
+    thumbnails_dir = extraction.frames_dir if settings.SAVE_FRAME_THUMBNAILS else None
+    frame_queue: queue.Queue = queue.Queue(maxsize=2 * settings.CLIP_BATCH_SIZE)
+    # 向量化阶段退出（包括出错）后置位，阻塞在队列上的解码线程据此停止，不会永远等待
+    embed_done = threading.Event()
+
+    def put(item) -> bool:
+        while not embed_done.is_set():
+            try:
+                frame_queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def extract() -> MediaExtraction:
+        started = timings.elapsed()
+        with timings.stage("extract"):
+            try:
+                for frame in extraction.frames():
+                    # 解码使用可复用的环形缓冲区，排队的帧需要各自的拷贝
+                    if not put(StreamedFrame(frame.index, frame.timestamp, frame.image.copy(), frame.scene)):
+                        break
+            finally:
+                put(_FRAMES_DONE)
+        _record_extraction(timings, extraction, started)
+        return extraction
+
+    def extract_audio_track() -> Path | None:
+        if not extraction.info["has_audio"]:
+            return None
+        with timings.stage("extract_audio"):
+            return extract_audio(video_path)
+
+    def queued_frames() -> Iterator[StreamedFrame]:
+        while (frame := frame_queue.get()) is not _FRAMES_DONE:
+            yield frame
+
+    def embed() -> int:
+        try:
+            return _embed_frames(queued_frames(), video_id, video_filename, thumbnails_dir, timings)
+        finally:
+            embed_done.set()
+
+    def transcribe(audio_future: Future) -> int:
+        # 只依赖音频：WAV 写完即可开始，不等待抽帧与帧向量化
+        return _transcribe_and_persist(video_id, audio_future.result(), timings, index_subtitles)
+
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"video-{video_id}") as pool:
+        extract_future = pool.submit(extract)
+        audio_future = pool.submit(extract_audio_track)
+        embed_future = pool.submit(embed)
+        transcribe_future = pool.submit(transcribe, audio_future)
+        # 依次取结果，任一阶段的异常都会在这里抛出
+        extract_future.result()
+        frame_count = embed_future.result()
+        subtitle_count = transcribe_future.result()
+
+    summary = timings.summary()
+    print(f"Pipeline timings for video {video_id} (s): {summary}")
+    result = {"timings": summary, "stages": timings.records(), "frames": frame_count, "subtitles": subtitle_count}
+    if sampler is not None:
+        result["sampling"] = sampler.stats()
+        print(f"Adaptive frame sampling for video {video_id}: {result['sampling']}")
+    return result
+
+
+# ---------- PIPELINE_MODE=split：各阶段作为独立的任务，分别路由到各自的队列 ----------
+# 阶段之间通过共享的媒体目录交接（帧文件、WAV），只在消息中传递 video_id 与少量元数据。
+
+def run_extract_stage(video_id: int, video_path: Path, offset: float = 0.0) -> dict:
+    """
+    单次解码：音频写入 WAV，抽出的帧按顺序写入帧文件，清单记录每帧的序号、时间戳与镜头编号。
+    :return: 本阶段的记录，以及后续阶段需要的 audio_path / frames_dir / 时长
+    """
+    timings = StageTimings(offset)
+    sampler = _create_sampler()
+    extraction = _create_extraction(video_path, sampler)
+    frames_dir = extraction.frames_dir
+    manifest = {"width": None, "height": None, "frames": []}
+
+    started = timings.elapsed()
+    with timings.stage("extract"):
+        frames = extraction.frames()
+        frames_dir.mkdir(exist_ok=True)
+        with open(frames_dir / FRAME_STORE_NAME, "wb") as store:
+            for frame in frames:
+                manifest["height"], manifest["width"] = frame.image.shape[:2]
+                store.write(frame.image.tobytes())
+                manifest["frames"].append([frame.index, frame.timestamp, frame.scene])
+    _record_extraction(timings, extraction, started)
+    (frames_dir / FRAME_MANIFEST_NAME).write_text(json.dumps(manifest))
+
+    result = {
+        "stages": timings.records(include_total=False),
+        "audio_path": str(extraction.audio_path) if extraction.audio_path is not None else None,
+        "frames_dir": str(frames_dir),
+        "duration": extraction.info["duration"],
+    }
+    if sampler is not None:
+        result["sampling"] = sampler.stats()
+    return result
+
+
+def _stored_frames(frames_dir: Path) -> Iterator[StreamedFrame]:
+    manifest = json.loads((frames_dir / FRAME_MANIFEST_NAME).read_text())
+    if not manifest["frames"]:
+        return
+    shape = (len(manifest["frames"]), manifest["height"], manifest["width"], 3)
+    # 内存映射读取，帧文件再大也只按需换入
+    images = np.memmap(frames_dir / FRAME_STORE_NAME, dtype=np.uint8, mode="r", shape=shape)
+    for (index, timestamp, scene), image in zip(manifest["frames"], images):
+        yield StreamedFrame(index, timestamp, np.asarray(image), scene)
+
+
+def run_embed_stage(video_id: int, video_filename: str, frames_dir: Path, offset: float = 0.0) -> dict:
+    # 与 fused 模式不同，本阶段独占所在的 worker 进程，torch 线程数按 TORCH_NUM_THREADS 设置（加载模型时生效）
+    timings = StageTimings(offset)
+    thumbnails_dir = frames_dir if settings.SAVE_FRAME_THUMBNAILS else None
+    frame_count = _embed_frames(_stored_frames(frames_dir), video_id, video_filename, thumbnails_dir, timings)
+    (frames_dir / FRAME_STORE_NAME).unlink(missing_ok=True)
+    (frames_dir / FRAME_MANIFEST_NAME).unlink(missing_ok=True)
+    return {"stages": timings.records(include_total=False), "frames": frame_count}
+
+
+def run_transcribe_stage(
+    video_id: int, audio_path: Path | None, index_subtitles: Callable[[int], None], offset: float = 0.0,
+) -> dict:
+    timings = StageTimings(offset)
+    subtitle_count = _transcribe_and_persist(video_id, audio_path, timings, index_subtitles)
+    return {"stages": timings.records(include_total=False), "subtitles": subtitle_count}
@@ -0,0 +1,58 @@
+"""
+任务队列的划分与按视频时长的路由。
+
+    video-fast  时长不超过 FAST_LANE_MAX_SECONDS 的短视频（所有阶段），几分钟的视频不会排在数小时的视频后面
+    video       长视频的整体处理任务（PIPELINE_MODE=fused）
+    extract     长视频的解码抽帧（PIPELINE_MODE=split，下同）
+    transcribe  长视频的语音转写
+    embed       长视频的帧向量化
+    index       字幕索引、收尾、重复上传的结果复用等轻量任务，不与重型任务排队
+
+每个队列由单独的 worker 消费（celery worker -Q <队列> -c <并发数>），并发数按该阶段的资源需求设置；
+长视频的 worker 在自己的队列为空时也消费 video-fast（-Q transcribe,video-fast），短视频集中到达时不会只排在快速通道上。
+同一队列内按时长设置优先级（Redis broker 按优先级分桶模拟），时长越短越先执行。
+"""
+import math
+
+from app.core.config import settings
+
+QUEUE_FAST = "video-fast"
+QUEUE_VIDEO = "video"
+QUEUE_EXTRACT = "extract"
+QUEUE_TRANSCRIBE = "transcribe"
+QUEUE_EMBED = "embed"
+QUEUE_INDEX = "index"
+
+ALL_QUEUES = [QUEUE_FAST, QUEUE_VIDEO, QUEUE_EXTRACT, QUEUE_TRANSCRIBE, QUEUE_EMBED, QUEUE_INDEX]
+
+_STAGE_QUEUES = {
+    "process": QUEUE_VIDEO,
+    "extract": QUEUE_EXTRACT,
+    "transcribe": QUEUE_TRANSCRIBE,
+    "embed": QUEUE_EMBED,
+}
+
+# Redis broker 的优先级桶，0 最先被消费
+PRIORITY_STEPS = list(range(10))
+
+
+def is_short(duration: float | None) -> bool:
+    return duration is not None and duration <= settings.FAST_LANE_MAX_SECONDS
+
+
+def queue_for(stage: str, duration: float | None) -> str:
+    """
+    :param stage: process（fused 模式的整体任务）/ extract / transcribe / embed，其余阶段都走 index 队列
+    :param duration: 视频时长（秒），未知时按长视频处理
+    """
+    if stage not in _STAGE_QUEUES:
+        return QUEUE_INDEX
+    return QUEUE_FAST if is_short(duration) else _STAGE_QUEUES[stage]
+
+
+def priority_for(duration: float | None) -> int:
+    """时长每翻一倍优先级降一档：1 分钟以内为 0，约 8 小时以上为 9；时长未知时取中间值。"""
+    if duration is None:
+        return PRIORITY_STEPS[len(PRIORITY_STEPS) // 2]
+    step = math.ceil(math.log2(max(duration, 60) / 60))
+    return min(max(step, PRIORITY_STEPS[0]), PRIORITY_STEPS[-1])
@@ -1,50 +1,187 @@
-from celery import Celery, states
+import asyncio
+import time
+from celery import Celery, chord, states
 from celery.exceptions import Ignore
-from asgiref.sync import async_to_sync
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from kombu import Queue
 from app.core.config import settings
 from app.database.base import SessionLocal
 from app.models.video import Video, TaskStatus
 from app.models.subtitle import Subtitle
-from app.services.video_processing import ( #导入新函数
-    extract_audio,
-    extract_frames,
-    extract_specific_frame, 
-    VideoProcessingError
-)
-from app.services.ai_models import models_loader, DEVICE
-from app.services.vector_db_service import vector_db_service
+from app.services.metrics import PIPELINE_VIDEOS, mark_process_dead, start_metrics_server
+from app.services.model_client import get_model_client, process_memory
 from app.services.search_engine_service import search_engine_service
+from app.services.stage_metrics import record_stage_metrics
+from app.services.subtitle_store import clone_subtitles, iter_subtitle_documents
+from app.services.vector_db_service import vector_db_service
+from app.tasks.pipeline import run_video_pipeline, run_extract_stage, run_embed_stage, run_transcribe_stage
+from app.tasks.routing import ALL_QUEUES, PRIORITY_STEPS, QUEUE_INDEX, QUEUE_VIDEO, priority_for, queue_for
 from pathlib import Path
-from PIL import Image
-import torch
+from sqlalchemy import func
 
 # 初始化 Celery 应用
 celery_app = Celery("worker", broker=settings.REDIS_URL, backend=settings.REDIS_URL)
-celery_app.conf.task_routes = {"app.tasks.worker.*": "main-queue"}
+celery_app.conf.update(
+    # 队列划分见 app/tasks/routing.py；视频处理任务在投递时按时长选择队列，轻量任务固定走 index 队列
+    task_default_queue=QUEUE_VIDEO,
+    task_routes={
+        "index_video_subtitles": {"queue": QUEUE_INDEX},
+        "finalize_video": {"queue": QUEUE_INDEX},
+        "clone_video_results": {"queue": QUEUE_INDEX},
+    },
+    # 不带 -Q 启动的 worker 消费全部队列，单机部署不需要额外配置
+    task_queues=[Queue(name) for name in ALL_QUEUES],
+    # 处理任务动辄几十分钟：每个进程只预取一个任务，短视频不会被提前分配给一个正忙于长视频的进程
+    worker_prefetch_multiplier=1,
+    # 任务执行完才确认；worker 进程中途退出时任务回到队列重新执行（各阶段按视频幂等）
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    broker_transport_options={
+        # Redis 会重新投递超过可见性超时仍未确认的消息，这个值必须大于最长任务的执行时间
+        "visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT_SECONDS,
+        # 同一队列内按优先级消费（priority_for：时长越短优先级越高）
+        "queue_order_strategy": "priority",
+        "priority_steps": PRIORITY_STEPS,
+        "sep": ":",
+    },
+)
 
 
-# 索引任务
-@celery_app.task(name="index_subtitles")
-def index_subtitles_task(subtitles: list[dict]):
+@worker_init.connect
+def _preload_models(**_):
     """
-    一个异步任务，用于将字幕索引到 Elasticsearch 中。
+    在 prefork 主进程中、fork 子进程之前加载模型：权重所在的内存页由各子进程写时复制共享，
+    子进程也不必各自承担加载耗时。使用模型服务时 worker 不持有模型，无需预加载。
     """
-    print(f"收到索引 {len(subtitles)} 条字幕的任务。")
-    @async_to_sync
-    async def main():
-        await search_engine_service.create_index_if_not_exists()
-        await search_engine_service.index_subtitles(subtitles)
+    if not settings.WORKER_PRELOAD_MODELS or get_model_client() is not None:
+        return
+    from app.services.ai_models import models_loader
+    started = time.perf_counter()
+    models_loader.get_clip_model_and_processor()
+    models_loader.get_whisper_model()
+    print(f"Preloaded models in {time.perf_counter() - started:.1f}s before forking, memory {process_memory()}")
+
+@worker_init.connect
+def _start_metrics_server(**_):
+    # 主进程导出所有子进程的指标（需要设置 PROMETHEUS_MULTIPROC_DIR，见 app/services/metrics.py）
+    start_metrics_server(settings.WORKER_METRICS_PORT)
+
+@worker_process_shutdown.connect
+def _cleanup_process_metrics(pid=None, **_):
+    mark_process_dead(pid)
+
+@worker_process_init.connect
+def _report_worker_memory(**_):
+    if get_model_client() is None:
+        # 每个 worker 子进程按 TORCH_NUM_THREADS / TORCH_INTEROP_THREADS 设置自己的线程数
+        from app.services.ai_models import configure_torch_threads
+        configure_torch_threads()
+    print(f"Worker process started, memory {process_memory()}")
+
+# 每个 worker 进程复用同一个事件循环：AsyncElasticsearch 的连接池绑定在事件循环上，
+# 每次任务都新建事件循环会让连接无法复用
+_event_loop: asyncio.AbstractEventLoop | None = None
+_search_index_ready = False
+
+def _run_async(coro):
+    global _event_loop
+    if _event_loop is None or _event_loop.is_closed():
+        _event_loop = asyncio.new_event_loop()
+    return _event_loop.run_until_complete(coro)
+
+def _ensure_search_index():
+    """每个 worker 进程只在第一次写入前创建（或确认）一次索引。"""
+    global _search_index_ready
+    if not _search_index_ready:
+        _run_async(search_engine_service.create_index_if_not_exists())
+        _search_index_ready = True
+
+async def _subtitle_batches(video_id: int):
+    """在线程中分块读取字幕，读取数据库时不阻塞正在进行的 bulk 请求。"""
+    db = SessionLocal()
     try:
-        main()
-        print("字幕成功索引。")
+        chunks = iter_subtitle_documents(db, video_id)
+        while batch := await asyncio.to_thread(next, chunks, None):
+            yield batch
+    finally:
+        db.close()
+
+def _delete_stale_subtitle_documents(video_id: int):
+    """视频被重新处理（例如 worker 中途退出后任务重新投递）时，清理上一次写入、id 已失效的字幕文档。"""
+    db = SessionLocal()
+    try:
+        min_id = db.query(func.min(Subtitle.id)).filter(Subtitle.video_id == video_id).scalar()
+    finally:
+        db.close()
+    if min_id is not None:
+        deleted = _run_async(search_engine_service.delete_stale_subtitles(video_id, min_id))
+        if deleted:
+            print(f"视频 {video_id}: 删除 {deleted} 条过期的字幕文档。")
+
+def _record_index_metrics(video_id: int, seconds: float, indexed: int):
+    # 指标只用于观测，写入失败不影响索引任务本身
+    db = SessionLocal()
+    try:
+        record_stage_metrics(db, video_id, [{"stage": "es_index", "start": None, "seconds": round(seconds, 3), "items": indexed}])
+        db.commit()
     except Exception as e:
-        print(f"索引字幕时发生错误: {e}")
+        print(f"Could not record indexing metrics for video {video_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+def _seconds_since(timestamp: float | None) -> float:
+    return max(0.0, time.time() - timestamp) if timestamp else 0.0
 
+def _queue_wait_records(enqueued_at: float | None) -> list[dict]:
+    # 从上传完成到 worker 开始处理的等待时间，衡量队列调度的效果
+    if not enqueued_at:
+        return []
+    return [{"stage": "queue_wait", "start": 0.0, "seconds": round(_seconds_since(enqueued_at), 3), "items": None}]
+
+def enqueue_video_processing(video_id: int, duration: float | None):
+    """
+    按 PIPELINE_MODE 与视频时长投递处理任务：短视频进入快速通道，同一队列内时长越短越先处理。
+    :param duration: 上传时探测到的时长（秒），未知时按长视频处理
+    """
+    priority = priority_for(duration)
+    if settings.PIPELINE_MODE == "split":
+        extract_video_task.apply_async(
+            (video_id, time.time()), queue=queue_for("extract", duration), priority=priority,
+        )
+    else:
+        process_video.apply_async(
+            (video_id, time.time()), queue=queue_for("process", duration), priority=priority,
+        )
+
+# 索引任务
+@celery_app.task(bind=True, name="index_video_subtitles", max_retries=3, default_retry_delay=30)
+def index_subtitles_task(self, video_id: int):
+    """
+    将一个视频的全部字幕写入全文索引（TEXT_SEARCH_BACKEND）：从数据库分块读取并流式写入；
+    Elasticsearch 后端以有限并发的 bulk 请求写入，暂时性失败的文档会单独重试。
+    整批失败（例如 Elasticsearch 不可用）时稍后重试整个任务；写入按字幕 id 覆盖，重试是幂等的。
+    """
+    started = time.perf_counter()
+    try:
+        _ensure_search_index()
+        result = _run_async(search_engine_service.index_subtitle_batches(_subtitle_batches(video_id)))
+        _delete_stale_subtitle_documents(video_id)
+    except Exception as e:
+        print(f"索引视频 {video_id} 的字幕时发生错误: {e}")
+        raise self.retry(exc=e)
+    elapsed = time.perf_counter() - started
+    print(f"视频 {video_id}: 索引 {result['indexed']} 条字幕，失败 {result['failed']} 条，耗时 {elapsed:.2f}s。")
+    _record_index_metrics(video_id, elapsed, result["indexed"])
+    if result["failed"] and not result["indexed"]:
+        raise self.retry(exc=RuntimeError(f"All {result['failed']} subtitles failed to index"))
+    return {"indexed": result["indexed"], "failed": result["failed"], "seconds": round(elapsed, 3)}
 
 @celery_app.task(bind=True, name="process_video", max_retries=3)
-def process_video(self, video_id: int):
+def process_video(self, video_id: int, enqueued_at: float | None = None):
     """
-    Celery 任务：完整处理单个视频文件。
+    Celery 任务：完整处理单个视频文件（PIPELINE_MODE=fused）。
+    :param enqueued_at: 投递时刻（time.time()），用于记录排队等待时间
     """
     db = SessionLocal()
     video = db.query(Video).filter(Video.id == video_id).first()
@@ -59,67 +196,24 @@ def process_video(self, video_id: int):
         video.status = TaskStatus.PROCESSING
         db.commit()
 
-        video_path = Path(video.filepath)
-        audio_path = extract_audio(video_path)
-        frames_dir = extract_frames(video_path, interval_seconds=5)
-        print(f"Media pre-processing successful. Audio: {audio_path}, Frames dir: {frames_dir}")
-
-        whisper_model = models_loader.get_whisper_model()
-        transcription_result = whisper_model.transcribe(str(audio_path), fp16=torch.cuda.is_available())
-
-        subtitles_to_add = []
-        for segment in transcription_result["segments"]:
-            new_subtitle = Subtitle(
-                video_id=video_id, start_time=segment["start"],
-                end_time=segment["end"], text=segment["text"]
-            )
-            subtitles_to_add.append(new_subtitle)
-        
-        db.add_all(subtitles_to_add)
-        db.commit()
-        print(f"Subtitles for video {video_id} saved to database.")
-
-        subtitles_for_es = [
-            {"id": sub.id, "video_id": sub.video_id, "start_time": sub.start_time, "text": sub.text}
-            for sub in subtitles_to_add
-        ]
-        index_subtitles_task.delay(subtitles_for_es)
-
-        clip_model, clip_processor = models_loader.get_clip_model_and_processor()
-        embeddings_batch, metadatas_batch, ids_batch = [], [], []
-        frame_files = sorted(list(frames_dir.glob("*.jpg")))
-        for frame_path in frame_files:
-            try:
-                image = Image.open(frame_path)
-                inputs = clip_processor(images=image, return_tensors="pt").to(DEVICE)
-                with torch.no_grad():
-                    image_features = clip_model.get_image_features(**inputs)
-                
-                embeddings_batch.append(image_features[0].cpu().numpy().tolist())
-                metadatas_batch.append({
-                    "video_id": video_id, "video_filename": video.filename,
-                    "frame_filename": frame_path.name,
-                    "timestamp_approx": int(frame_path.stem.split("_")[-1]) * 5
-                })
-                ids_batch.append(f"video_{video_id}_frame_{frame_path.stem}")
-            except Exception as frame_exc:
-                print(f"Could not process frame {frame_path}: {frame_exc}")
-                continue
-
-        vector_db_service.add_embeddings(embeddings_batch, metadatas_batch, ids_batch)
-        print(f"Frame embeddings for video {video_id} saved to vector database.")
-        
-        # --- 新增生成封面的步骤 ---
-        print(f"Generating cover frame for video {video_id}...")
-        extract_specific_frame(video_path, frame_time=1.0) # 提取第1秒的画面作为封面
+        # 帧元数据中记录存储的文件名：前端据此拼出缩略图目录 /media/<存储文件名>/
+        queue_wait = _queue_wait_records(enqueued_at)
+        result = run_video_pipeline(
+            video_id, Path(video.filepath), Path(video.filepath).name,
+            index_subtitles=index_subtitles_task.delay,
+            offset=_seconds_since(enqueued_at),
+        )
 
-        # --- 最终状态更新 ---
+        # --- 最终状态更新（各阶段耗时与状态在同一个事务中写入）---
+        record_stage_metrics(db, video_id, queue_wait + result["stages"])
         video.status = TaskStatus.COMPLETED
         db.commit()
-        return {"status": "Completed"}
+        PIPELINE_VIDEOS.labels("completed").inc()
+        return {"status": "Completed", **result}
 
     except Exception as e:
         print(f"Task for video {video_id} failed with error: {e}")
+        PIPELINE_VIDEOS.labels("failed").inc()
         db.rollback()
         video_to_fail = db.query(Video).filter(Video.id == video_id).first()
         if video_to_fail:
@@ -130,4 +224,154 @@ def process_video(self, video_id: int):
         raise Ignore()
 
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@celery_app.task(bind=True, name="clone_video_results")
+def clone_video_results(self, source_video_id: int, target_video_id: int):
+    """
+    Celery 任务：内容相同的视频已处理过时，直接复用其结果（字幕、帧向量、封面），
+    完全跳过 Whisper 与 CLIP。
+    """
+    db = SessionLocal()
+    source = db.query(Video).filter(Video.id == source_video_id).first()
+    target = db.query(Video).filter(Video.id == target_video_id).first()
+
+    if not source or not target:
+        print(f"Video {source_video_id} or {target_video_id} not found in database. Ignoring task.")
+        raise Ignore()
+
+    print(f"Reusing results of video {source_video_id} for duplicate upload {target_video_id}")
+
+    try:
+        target.status = TaskStatus.PROCESSING
+        db.commit()
+
+        # 1. 在数据库内克隆字幕（先清掉上一次执行写入的字幕，任务被重新投递时结果一致）
+        clone_subtitles(db, source_video_id, target_video_id)
+        db.commit()
+        subtitle_count = db.query(func.count(Subtitle.id)).filter(Subtitle.video_id == target_video_id).scalar()
+        index_subtitles_task.delay(target_video_id)
+
+        # 2. 复制帧向量（元数据中的 video_filename 保持不变，缩略图仍指向原视频的目录）
+        copied = vector_db_service.copy_video_embeddings(source_video_id, target_video_id)
+
+        # 封面与缩略图按存储路径定位，重复上传与原视频共用同一个文件，无需复制
+        target.status = TaskStatus.COMPLETED
+        db.commit()
+        PIPELINE_VIDEOS.labels("cloned").inc()
+        print(f"Cloned {subtitle_count} subtitles and {copied} frame embeddings into video {target_video_id}.")
+        return {"status": "Completed", "cache_hit": True, "subtitles": subtitle_count, "frames": copied}
+
+    except Exception as e:
+        print(f"Clone task for video {target_video_id} failed with error: {e}")
+        PIPELINE_VIDEOS.labels("failed").inc()
+        db.rollback()
+        video_to_fail = db.query(Video).filter(Video.id == target_video_id).first()
+        if video_to_fail:
+            video_to_fail.status = TaskStatus.FAILED
+            db.commit()
+
+        self.update_state(state=states.FAILURE, meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
+        raise Ignore()
+
+    finally:
+        db.close()
+
+
+# ---------- PIPELINE_MODE=split：解码、转写、向量化各自是独立路由的任务 ----------
+#
+#   extract_video ──> chord(transcribe_video, embed_video) ──> finalize_video
+#
+# 转写与向量化在各自的队列中由不同并发数的 worker 执行，阶段之间通过共享的 /media 目录交接。
+
+def _mark_failed(video_id: int, stage: str, e: Exception):
+    print(f"{stage} for video {video_id} failed with error: {e}")
+    PIPELINE_VIDEOS.labels("failed").inc()
+    db = SessionLocal()
+    try:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video:
+            video.status = TaskStatus.FAILED
+            db.commit()
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="extract_video")
+def extract_video_task(self, video_id: int, enqueued_at: float | None = None):
+    """解码抽帧与音频，然后把转写与向量化分别投递到各自的队列。"""
+    db = SessionLocal()
+    try:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            print(f"Video with id {video_id} not found in database. Ignoring task.")
+            raise Ignore()
+        video.status = TaskStatus.PROCESSING
+        db.commit()
+        video_path = Path(video.filepath)
+    finally:
+        db.close()
+
+    run_started = enqueued_at or time.time()
+    try:
+        result = run_extract_stage(video_id, video_path, offset=_seconds_since(run_started))
+        duration = result["duration"]
+        priority = priority_for(duration)
+        context = {
+            "run_started": run_started,
+            "stages": _queue_wait_records(enqueued_at) + result["stages"],
+            "sampling": result.get("sampling"),
+        }
+        chord([
+            transcribe_video_task.si(video_id, result["audio_path"], run_started)
+            .set(queue=queue_for("transcribe", duration), priority=priority),
+            embed_video_task.si(video_id, video_path.name, result["frames_dir"], run_started)
+            .set(queue=queue_for("embed", duration), priority=priority),
+        ])(finalize_video_task.s(video_id, context))
+    except Exception as e:
+        _mark_failed(video_id, "Extraction", e)
+        self.update_state(state=states.FAILURE, meta={'exc_type': type(e).__name__, 'exc_message': str(e)})
+        raise Ignore()
+    return {"status": "Extracted", "duration": duration}
+
+@celery_app.task(bind=True, name="transcribe_video")
+def transcribe_video_task(self, video_id: int, audio_path: str | None, run_started: float):
+    try:
+        return run_transcribe_stage(
+            video_id, Path(audio_path) if audio_path else None,
+            index_subtitles=index_subtitles_task.delay, offset=_seconds_since(run_started),
+        )
+    except Exception as e:
+        # 异常继续抛出：chord 不会执行 finalize_video
+        _mark_failed(video_id, "Transcription", e)
+        raise
+
+@celery_app.task(bind=True, name="embed_video")
+def embed_video_task(self, video_id: int, video_filename: str, frames_dir: str, run_started: float):
+    try:
+        return run_embed_stage(video_id, video_filename, Path(frames_dir), offset=_seconds_since(run_started))
+    except Exception as e:
+        _mark_failed(video_id, "Frame embedding", e)
+        raise
+
+@celery_app.task(bind=True, name="finalize_video")
+def finalize_video_task(self, stage_results: list[dict], video_id: int, context: dict):
+    """转写与向量化都完成后：写入各阶段耗时，视频标记为完成。"""
+    records = context["stages"] + [record for result in stage_results for record in result["stages"]]
+    records.append({"stage": "total", "start": 0.0, "seconds": round(_seconds_since(context["run_started"]), 3), "items": None})
+    frames = sum(result.get("frames", 0) for result in stage_results)
+    subtitles = sum(result.get("subtitles", 0) for result in stage_results)
+
+    db = SessionLocal()
+    try:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if not video:
+            raise Ignore()
+        record_stage_metrics(db, video_id, records)
+        video.status = TaskStatus.COMPLETED
+        db.commit()
+    finally:
+        db.close()
+    PIPELINE_VIDEOS.labels("completed").inc()
+    print(f"Video {video_id} completed: {frames} frames, {subtitles} subtitles, sampling {context.get('sampling')}")
+    return {"status": "Completed", "frames": frames, "subtitles": subtitles, "stages": records}
@@ -0,0 +1,83 @@
+"""
+IVF-PQ 近似检索与精确检索的对比：不同 nprobe 下的 recall@k 与查询延迟。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.ann_benchmark --frames 2000000 --nprobe 4 8 16 32 64
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.ivfpq_index import IVFPQIndex
+from benchmarks.vector_index_benchmark import fill, synthetic_vectors
+
+
+def timed_search(index: IVFPQIndex, queries: np.ndarray, k: int, exact: bool) -> tuple[list[np.ndarray], dict]:
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        with index._lock:
+            if exact:
+                rows, _ = super(IVFPQIndex, index).search(query[None, :], k)
+            else:
+                rows, _ = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(rows[0])
+    latencies = np.array(latencies)
+    return results, {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=settings.IVF_NLIST)
+    parser.add_argument("--m", type=int, default=settings.PQ_SUBSPACES)
+    parser.add_argument("--rerank", type=int, default=settings.IVF_RERANK)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--train-samples", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dim = settings.VECTOR_DIM
+    index_dir = Path(tempfile.mkdtemp(prefix="ann_bench_"))
+    try:
+        index = IVFPQIndex(index_dir, dim=dim, nlist=args.nlist, m=args.m, rerank=args.rerank)
+        fill(index, rng, args.frames, dim)
+        train_report = index.train(sample_size=args.train_samples)
+        # 查询取自库中向量附近，模拟"库里确实有相近画面"的情形
+        sample_rows = np.sort(rng.choice(args.frames, args.queries, replace=False))
+        queries = np.asarray(index._vectors[sample_rows], dtype=np.float32)
+        queries = queries + 0.1 * synthetic_vectors(rng, args.queries, dim)
+
+        truth, exact_latency = timed_search(index, queries, args.k, exact=True)
+        sweep = []
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            approx, latency = timed_search(index, queries, args.k, exact=False)
+            recall = np.mean([len(np.intersect1d(a, t)) / len(t) for a, t in zip(approx, truth) if len(t)])
+            sweep.append({"nprobe": nprobe, f"recall@{args.k}": round(float(recall), 4), **latency})
+
+        print(json.dumps({
+            "frames": args.frames,
+            "train": train_report,
+            "pq_code_mb": round(index._codes.nbytes / 2**20, 1),
+            "exact": exact_latency,
+            "ivfpq": sweep,
+        }, indent=2))
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+视频列表与详情接口的并发压测：统计每个接口的吞吐量 (req/s) 与 p50/p99 延迟。
+
+在同一份数据上分别对改动前（同步 Session + 线程池）和改动后（异步引擎）的部署各跑一次，
+用 --label 标记结果，对比 throughput_rps 即可。
+
+用法（API 服务运行中，库里已有视频）:
+    python -m benchmarks.api_load_benchmark --label async --concurrency 16 64 256 --requests 5000
+    python -m benchmarks.api_load_benchmark --endpoints detail --video-ids 1 2 3
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+import numpy as np
+
+
+async def discover_video_ids(session: aiohttp.ClientSession, url: str, limit: int = 200) -> list[int]:
+    async with session.get(f"{url}/api/videos/", params={"limit": limit}) as resp:
+        resp.raise_for_status()
+        page = await resp.json()
+    items = page["items"] if isinstance(page, dict) else page
+    return [item["id"] for item in items]
+
+
+def endpoint_path(endpoint: str, i: int, video_ids: list[int]) -> tuple[str, dict]:
+    if endpoint == "list":
+        return "/api/videos/", {"limit": 50}
+    video_id = video_ids[i % len(video_ids)]
+    if endpoint == "detail":
+        return f"/api/videos/{video_id}", {}
+    # 播放器按 60 秒窗口增量读取字幕
+    return f"/api/videos/{video_id}/subtitles", {"start": (i % 10) * 60, "end": (i % 10 + 1) * 60}
+
+
+async def run(url: str, endpoint: str, concurrency: int, total: int, video_ids: list[int]) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client(session: aiohttp.ClientSession):
+        nonlocal errors
+        for i in counter:
+            path, params = endpoint_path(endpoint, i, video_ids)
+            started = time.perf_counter()
+            async with session.get(f"{url}{path}", params=params) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+async def run_all(args) -> list[dict]:
+    video_ids = args.video_ids
+    if not video_ids and any(e != "list" for e in args.endpoints):
+        async with aiohttp.ClientSession() as session:
+            video_ids = await discover_video_ids(session, args.url)
+        if not video_ids:
+            raise SystemExit("No videos found; upload some videos or pass --video-ids")
+
+    results = []
+    for endpoint in args.endpoints:
+        for concurrency in args.concurrency:
+            result = await run(args.url, endpoint, concurrency, args.requests, video_ids)
+            results.append({"label": args.label, **result})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--label", default="current", help="结果中标记本次测量的部署，例如 sync / async")
+    parser.add_argument("--endpoints", nargs="+", choices=["list", "detail", "subtitles"], default=["list", "detail"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--video-ids", type=int, nargs="*", default=[])
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run_all(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+CPU 推理配置的精度 / 速度对比：fp32 与动态 int8 量化（QUANTIZE_WHISPER / QUANTIZE_CLIP）在不同线程数下的表现。
+
+  - Whisper：转写墙钟耗时、实时率 (RTF)，以及相对参考文本的词错误率 (WER；中文按字计算，即 CER)。
+    不提供 --reference 时以 fp32 模型的转写结果为参考，此时 WER 衡量的是量化带来的偏差。
+  - CLIP：文本 / 图像编码的吞吐量，与 fp32 向量的余弦相似度（均值 / 最小值），
+    以及以文搜图 top-1 结果与 fp32 一致的比例。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.cpu_inference_benchmark --audio /media/clip.wav --reference /media/clip.txt \\
+        --images "/media/frames/demo/*.jpg" --threads 2 4 8
+"""
+import argparse
+import glob
+import json
+import re
+import time
+import unicodedata
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.core.config import settings
+from app.services.ai_models import AIModels, load_clip_model, load_whisper_model
+from app.services.model_client import process_memory
+from app.services.transcription import SAMPLE_RATE, read_wav
+
+DEFAULT_QUERIES = [
+    "a person speaking in front of a whiteboard", "a slide with a chart", "a car driving on a road",
+    "people sitting in a meeting room", "a close-up of a computer screen", "an outdoor landscape with trees",
+    "a dog running on grass", "a crowd at a concert",
+]
+
+
+def _tokens(text: str) -> list[str]:
+    # 去掉标点并统一大小写；中日韩文字没有空格分词，逐字作为一个 token
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text.lower())
+    tokens = []
+    for word in text.split():
+        tokens.extend(re.findall(r"[\u3040-\u30ff\u3400-\u9fff]|[^\u3040-\u30ff\u3400-\u9fff]+", word))
+    return tokens
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_token in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_token != hyp_token))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def model_size_mb(model) -> float:
+    # 量化后的权重打包在 packed_params 中，不出现在 parameters() 里，按 state_dict 统计
+    total = 0
+    for value in model.state_dict().values():
+        if isinstance(value, torch.Tensor):
+            total += value.numel() * value.element_size()
+        elif isinstance(value, tuple):
+            total += sum(v.numel() * v.element_size() for v in value if isinstance(v, torch.Tensor))
+    return round(total / 1024 ** 2, 1)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_images(pattern: str | None, count: int) -> list:
+    if pattern:
+        paths = sorted(glob.glob(pattern))[:count]
+        if not paths:
+            raise SystemExit(f"No images match {pattern}")
+        return [Image.open(path).convert("RGB") for path in paths]
+    # 没有提供帧时用确定性的合成图像，只能衡量速度与向量偏差，检索一致率参考意义有限
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 255, (1, 1, 3))
+        gradient = np.linspace(0, 1, 224)[None, :, None] * rng.integers(0, 255, (1, 1, 3))
+        noise = rng.normal(0, 20, (224, 224, 3))
+        images.append(Image.fromarray(np.clip(base * 0.5 + gradient + noise, 0, 255).astype(np.uint8)))
+    return images
+
+
+def bench_whisper(audio_path: str, reference: str | None, threads: list[int]) -> list[dict]:
+    audio = read_wav(audio_path)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    results = []
+    for quantize in (False, True):
+        started = time.perf_counter()
+        model = load_whisper_model(settings.WHISPER_MODEL_SIZE, quantize=quantize)
+        load_seconds = time.perf_counter() - started
+        for num_threads in threads:
+            torch.set_num_threads(num_threads)
+            started = time.perf_counter()
+            with torch.inference_mode():
+                text = model.transcribe(audio, fp16=False)["text"]
+            seconds = time.perf_counter() - started
+            if reference is None and not quantize:
+                reference = text  # 以第一次 fp32 转写为参考
+            results.append({
+                "model": f"whisper-{settings.WHISPER_MODEL_SIZE}",
+                "int8": quantize,
+                "threads": num_threads,
+                "load_seconds": round(load_seconds, 2),
+                "size_mb": model_size_mb(model),
+                "seconds": round(seconds, 2),
+                "real_time_factor": round(seconds / audio_seconds, 3),
+                "wer": round(word_error_rate(reference, text), 4),
+            })
+        del model
+    return results
+
+
+def bench_clip(images: list, queries: list[str], threads: list[int], batch_size: int) -> list[dict]:
+    from transformers import CLIPProcessor
+
+    processor = CLIPProcessor.from_pretrained(AIModels.CLIP_MODEL_NAME)
+    pixel_values = processor(images=images, return_tensors="pt")["pixel_values"]
+    text_inputs = processor(text=queries, return_tensors="pt", padding=True)
+
+    def encode(model):
+        with torch.inference_mode():
+            image_started = time.perf_counter()
+            image_vectors = np.concatenate([
+                model.get_image_features(pixel_values=pixel_values[i:i + batch_size]).numpy()
+                for i in range(0, len(pixel_values), batch_size)
+            ])
+            image_seconds = time.perf_counter() - image_started
+            text_started = time.perf_counter()
+            text_vectors = model.get_text_features(**text_inputs).numpy()
+            text_seconds = time.perf_counter() - text_started
+        return _normalize(image_vectors), _normalize(text_vectors), image_seconds, text_seconds
+
+    reference = None
+    results = []
+    for quantize in (False, True):
+        model = load_clip_model(quantize=quantize)
+        for num_threads in threads:
+            torch.set_num_threads(num_threads)
+            encode(model)  # 预热
+            image_vectors, text_vectors, image_seconds, text_seconds = encode(model)
+            if reference is None:
+                reference = (image_vectors, text_vectors)
+            ref_images, ref_texts = reference
+            image_cosine = np.sum(image_vectors * ref_images, axis=1)
+            text_cosine = np.sum(text_vectors * ref_texts, axis=1)
+            top1 = np.argmax(text_vectors @ image_vectors.T, axis=1)
+            ref_top1 = np.argmax(ref_texts @ ref_images.T, axis=1)
+            results.append({
+                "model": AIModels.CLIP_MODEL_NAME,
+                "int8": quantize,
+                "threads": num_threads,
+                "size_mb": model_size_mb(model),
+                "images_per_sec": round(len(images) / image_seconds, 1),
+                "texts_per_sec": round(len(queries) / text_seconds, 1),
+                "image_cosine_mean": round(float(image_cosine.mean()), 4),
+                "image_cosine_min": round(float(image_cosine.min()), 4),
+                "text_cosine_mean": round(float(text_cosine.mean()), 4),
+                "text_cosine_min": round(float(text_cosine.min()), 4),
+                "top1_agreement": round(float(np.mean(top1 == ref_top1)), 3),
+            })
+        del model
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default=None, help="16kHz 单声道 WAV；不提供则跳过 Whisper")
+    parser.add_argument("--reference", default=None, help="音频的参考文本文件")
+    parser.add_argument("--images", default=None, help="帧图像的 glob，例如 '/media/frames/demo/*.jpg'")
+    parser.add_argument("--image-count", type=int, default=128)
+    parser.add_argument("--batch-size", type=int, default=settings.CLIP_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, nargs="+", default=[torch.get_num_threads()])
+    parser.add_argument("--skip-clip", action="store_true")
+    args = parser.parse_args()
+
+    report = {"torch": torch.__version__, "quantized_engine": torch.backends.quantized.engine}
+    if args.audio:
+        reference = open(args.reference, encoding="utf-8").read() if args.reference else None
+        report["whisper"] = bench_whisper(args.audio, reference, args.threads)
+    if not args.skip_clip:
+        images = load_images(args.images, args.image_count)
+        report["clip"] = bench_clip(images, DEFAULT_QUERIES, args.threads, args.batch_size)
+    report["memory"] = process_memory()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
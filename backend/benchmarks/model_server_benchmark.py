@@ -0,0 +1,108 @@
+"""
+对比三种模型部署方式下，每个 worker 进程的内存占用与冷启动耗时：
+
+  - local   : 每个进程各自加载 Whisper 与 CLIP（旧行为，spawn 出全新的解释器）
+  - preload : 父进程先加载模型再 fork 子进程，权重页写时复制共享（WORKER_PRELOAD_MODELS）
+  - client  : 进程只作为模型服务的客户端（MODEL_SERVER_ADDRESS），需先启动模型服务
+
+冷启动 = 从启动子进程到拿到第一个文本向量与图像向量的墙钟时间。
+rss 包含共享页，pss 按共享进程数均摊；多进程的总内存应看 pss 之和。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.model_server_benchmark --modes local preload --workers 4
+    export MODEL_SERVER_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(16))")
+    python -m app.services.model_server --address /tmp/model.sock &
+    python -m benchmarks.model_server_benchmark --modes client --address /tmp/model.sock --workers 4
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.model_client import ModelClient
+
+
+def _first_inference(started: float, results, barrier):
+    # 子进程在这里才导入应用模块，local 模式下导入与加载的耗时都计入冷启动
+    from app.services.model_client import get_model_client, process_memory
+
+    image = np.random.default_rng(0).integers(0, 255, (224, 224, 3), dtype=np.uint8)
+    client = get_model_client()
+    if client is not None:
+        client.embed_texts(["a person walking a dog"])
+        client.embed_images([image])
+    else:
+        from app.services.ai_models import models_loader
+        models_loader.get_whisper_model()
+        models_loader.encode_texts(["a person walking a dog"])
+        models_loader.encode_images([image])
+    cold_start = time.time() - started
+    # 等所有子进程都完成首次推理后再测内存，pss 才能反映共享情况
+    barrier.wait()
+    results.put({"pid": os.getpid(), "cold_start_seconds": round(cold_start, 2), **process_memory()})
+    barrier.wait()
+
+
+def run_mode(mode: str, workers: int, address: str | None) -> dict:
+    if mode == "client" and not address:
+        raise SystemExit("--address is required for client mode")
+    # spawn 的子进程从环境变量读取配置，fork 的子进程沿用父进程的 settings，两处都要设置
+    os.environ["MODEL_SERVER_ADDRESS"] = address if mode == "client" else ""
+    settings.MODEL_SERVER_ADDRESS = os.environ["MODEL_SERVER_ADDRESS"]
+
+    parent_load_seconds = None
+    if mode == "preload":
+        context = mp.get_context("fork")
+        from app.services.ai_models import models_loader
+        loaded = time.perf_counter()
+        models_loader.get_clip_model_and_processor()
+        models_loader.get_whisper_model()
+        parent_load_seconds = round(time.perf_counter() - loaded, 2)
+    else:
+        context = mp.get_context("spawn")
+
+    results = context.Queue()
+    barrier = context.Barrier(workers)
+    started = time.time()
+    processes = [context.Process(target=_first_inference, args=(started, results, barrier)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    per_worker = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    def mean(key):
+        values = [w[key] for w in per_worker if key in w]
+        return round(float(np.mean(values)), 1) if values else None
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "parent_load_seconds": parent_load_seconds,
+        "cold_start_seconds_mean": mean("cold_start_seconds"),
+        "rss_mb_mean": mean("rss_mb"),
+        "pss_mb_mean": mean("pss_mb"),
+        "pss_mb_total": round(sum(w.get("pss_mb", 0.0) for w in per_worker), 1),
+        "per_worker": per_worker,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=["local", "preload", "client"], default=["local", "preload"])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--address", default=None, help="client 模式使用的模型服务地址")
+    args = parser.parse_args()
+
+    report = [run_mode(mode, args.workers, args.address) for mode in args.modes]
+    if "client" in args.modes:
+        report.append({"model_server": ModelClient(args.address, settings.MODEL_SERVER_AUTHKEY).stats()})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+"""
+端到端基准：用 ffmpeg 测试源合成视频，走与线上相同的入口（enqueue_video_processing → process_video，
+或 PIPELINE_MODE=split 时的 extract → transcribe / embed → finalize 任务链）逐个处理，再对三个检索接口压测。
+
+所有外部服务都换成进程内的替代品，离线即可运行，结果只取决于代码与机器：
+  - 数据库      : 临时目录中的 SQLite（POSTGRES_URL）
+  - 任务队列    : Celery eager 模式，任务在当前进程内同步执行（含字幕索引任务）
+  - 向量库      : VECTOR_BACKEND=local（或 --vector-backend ivfpq）
+  - 全文检索    : TEXT_SEARCH_BACKEND=local
+  - 模型        : --models stub（默认）时用 StubModels 代替模型服务：帧向量由缩小后的像素做随机投影得到
+                  （同一镜头的帧向量相近），转写按音频能量每 3.5 秒生成一条合成字幕；
+                  测量的是模型之外的全部开销（解码、抽帧、写库、索引、检索）。
+                  --models real 时在本进程加载真实模型（Whisper 默认 tiny，需要 torch）。
+
+报告（JSON，写入 --output）：
+  - stages : 各阶段累计耗时与吞吐量（帧 / 秒、音频秒 / 秒、条 / 秒），数据来自 video_stage_metrics 表；
+             fused 模式下各阶段并发执行，耗时按阶段各自计算，总墙钟时间见 ingest
+  - ingest : 合成视频总时长、处理墙钟时间与实时倍数
+  - search : /text、/image-by-text、/hybrid 在不同并发下的 QPS 与 p50/p95/p99 延迟（直接调用接口函数，不经过 HTTP）
+  - memory : 入库后与检索后本进程的峰值 RSS，以及子进程（ffmpeg）的峰值 RSS
+加 --compare 与之前保存的结果对比：吞吐量下降或延迟 / 内存上升超过 --tolerance 的指标视为回归，以非零状态码退出。
+
+用法（在 backend 目录下，需要 ffmpeg / ffprobe 与 celery）:
+    python -m benchmarks.pipeline_benchmark --videos 4 --duration 120 --output pipeline_baseline.json
+    python -m benchmarks.pipeline_benchmark --videos 4 --duration 120 --compare pipeline_baseline.json
+    python -m benchmarks.pipeline_benchmark --pipeline split --models real --videos 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# 与线上报告的阶段名一致（见 app/tasks/pipeline.py、worker.py），按产出的单位分组计算吞吐量
+FRAME_STAGES = ("extract_frames", "embed", "vector_insert")
+AUDIO_STAGES = ("extract_audio", "transcribe")
+ITEM_STAGES = ("persist_subtitles", "es_index")
+
+# 合成视频的镜头轮流使用这些 lavfi 测试源，相邻镜头的画面差异足以触发镜头切换
+VIDEO_SOURCES = ["testsrc2", "smptebars", "mandelbrot", "rgbtestsrc", "life", "testsrc", "cellauto", "smptehdbars"]
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "de", "fu", "ho", "ji", "pe", "qu", "zo", "ba"]
+
+# 对比时只看这些指标：前者越大越好，后者越小越好
+HIGHER_IS_BETTER = ("_per_sec", "qps", "realtime_factor")
+LOWER_IS_BETTER = ("_ms", "rss_mb")
+
+
+def _configure_environment(workdir: Path, args):
+    """
+    app.core.config 在导入时读取环境变量、app.database.base 在导入时创建引擎，
+    因此必须在导入任何 app 模块之前把各个后端指向临时目录。
+    """
+    os.environ.update({
+        "POSTGRES_URL": f"sqlite:///{workdir / 'benchmark.db'}",
+        "VECTOR_BACKEND": args.vector_backend,
+        "LOCAL_VECTOR_INDEX_PATH": str(workdir / "vector_index"),
+        "TEXT_SEARCH_BACKEND": "local",
+        "LOCAL_TEXT_INDEX_PATH": str(workdir / "text_index"),
+        "MEDIA_PATH": str(workdir / "media"),
+        "PIPELINE_MODE": args.pipeline,
+        "WHISPER_MODEL_SIZE": args.whisper_size,
+        "TEXT_EMBEDDING_CACHE_REDIS": "false",
+        "WORKER_METRICS_PORT": "0",
+    })
+    # eager 模式不连接 broker，只是配置项要求有值
+    os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
+
+
+def _word(rank: int) -> str:
+    return "".join(SYLLABLES[(rank // len(SYLLABLES) ** k) % len(SYLLABLES)] for k in range(3))
+
+
+class StubModels:
+    """
+    与 ModelClient 接口相同的替代模型（embed_texts / embed_images / transcribe / stats），结果是确定的。
+    通过模型服务的客户端接入：流水线与检索接口都把推理交给它，本进程不导入 torch。
+    """
+
+    def __init__(self, dim: int, seed: int = 0, segment_seconds: float = 3.5, vocab: int = 5000):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.segment_seconds = segment_seconds
+        self.vocab = vocab
+        # 16x16 RGB 缩略图 -> dim 维的随机投影
+        self._projection = (rng.normal(size=(16 * 16 * 3, dim)) / np.sqrt(16 * 16 * 3)).astype(np.float32)
+        weights = 1.0 / np.arange(1, vocab + 1) ** 1.07
+        self._word_weights = weights / weights.sum()
+        self.calls = {"embed_texts": 0, "embed_images": 0, "transcribe": 0}
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        self.calls["embed_texts"] += 1
+        vectors = [np.random.default_rng(zlib.crc32(text.encode())).normal(size=self.dim) for text in texts]
+        return self._normalize(np.asarray(vectors, dtype=np.float32))
+
+    def embed_images(self, images: list[np.ndarray]) -> np.ndarray:
+        from PIL import Image
+        self.calls["embed_images"] += 1
+        pixels = np.stack([
+            np.asarray(Image.fromarray(image).resize((16, 16)), dtype=np.float32).reshape(-1) / 255.0 - 0.5
+            for image in images
+        ])
+        return self._normalize(pixels @ self._projection)
+
+    def transcribe(self, audio_path) -> dict:
+        from app.services.transcription import SAMPLE_RATE, read_wav
+        self.calls["transcribe"] += 1
+        audio = read_wav(Path(audio_path))
+        step = int(self.segment_seconds * SAMPLE_RATE)
+        rng = np.random.default_rng(zlib.crc32(str(audio_path).encode()))
+        segments = []
+        for i, start in enumerate(range(0, len(audio), step)):
+            window = audio[start:start + step]
+            if float(np.sqrt(np.mean(np.square(window)))) < 1e-3:
+                continue  # 静音段没有字幕
+            words = rng.choice(self.vocab, size=int(rng.integers(6, 19)), p=self._word_weights)
+            segments.append({
+                "id": len(segments),
+                "start": start / SAMPLE_RATE,
+                "end": (start + len(window)) / SAMPLE_RATE,
+                "text": " ".join(_word(int(w)) for w in words),
+            })
+        return {"text": " ".join(segment["text"] for segment in segments), "segments": segments}
+
+    def stats(self) -> dict:
+        return dict(self.calls)
+
+
+def synthesize_video(path: Path, duration: float, scene_seconds: float, resolution: str, fps: int,
+                     codec: str, seed: int):
+    """用 lavfi 测试源拼出若干镜头的视频，音轨为带节拍的正弦波（16kHz 单声道）。"""
+    scenes = max(1, int(np.ceil(duration / scene_seconds)))
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    for i in range(scenes):
+        source = VIDEO_SOURCES[(seed + i) % len(VIDEO_SOURCES)]
+        command += ["-f", "lavfi", "-t", str(scene_seconds), "-i", f"{source}=size={resolution}:rate={fps}"]
+    frequency = 220 + 40 * (seed % 10)
+    command += ["-f", "lavfi", "-t", str(duration), "-i", f"sine=frequency={frequency}:beep_factor=4:sample_rate=16000"]
+    concat = "".join(f"[{i}:v]" for i in range(scenes)) + f"concat=n={scenes}:v=1:a=0,format=yuv420p[v]"
+    command += [
+        "-filter_complex", concat, "-map", "[v]", "-map", f"{scenes}:a",
+        "-t", str(duration), "-c:v", codec, "-c:a", "aac", str(path),
+    ]
+    if codec == "libx264":
+        command[-2:-2] = ["-preset", "ultrafast"]
+    subprocess.run(command, check=True)
+
+
+def _percentiles(latencies: list[float]) -> dict:
+    latencies = np.array(latencies)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def _git_revision() -> dict:
+    def git(*args) -> str:
+        result = subprocess.run(["git", *args], capture_output=True, text=True, cwd=Path(__file__).resolve().parent)
+        return result.stdout.strip() if result.returncode == 0 else ""
+    return {"commit": git("rev-parse", "--short", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def ingest(args, media_dir: Path) -> tuple[list[int], dict]:
+    """合成视频并逐个处理。:return: (视频 id, 入库统计)"""
+    from app.database.base import SessionLocal
+    from app.models.video import TaskStatus, Video
+    from app.services.video_processing import probe_video
+    from app.tasks.worker import enqueue_video_processing
+
+    media_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    paths = []
+    for i in range(args.videos):
+        path = media_dir / f"benchmark_{i:03d}.mp4"
+        synthesize_video(path, args.duration, args.scene_seconds, args.resolution, args.fps, args.codec, args.seed + i)
+        paths.append(path)
+    synthesize_seconds = time.perf_counter() - started
+
+    video_ids, statuses, wall_seconds, video_seconds = [], {}, 0.0, 0.0
+    for path in paths:
+        info = probe_video(path)
+        db = SessionLocal()
+        try:
+            video = Video(filename=path.name, filepath=str(path), duration=info["duration"],
+                          size_bytes=path.stat().st_size, status=TaskStatus.PENDING)
+            db.add(video)
+            db.commit()
+            video_id = video.id
+        finally:
+            db.close()
+
+        started = time.perf_counter()
+        enqueue_video_processing(video_id, info["duration"])
+        wall_seconds += time.perf_counter() - started
+        video_seconds += info["duration"]
+
+        db = SessionLocal()
+        try:
+            status = db.query(Video.status).filter(Video.id == video_id).scalar()
+        finally:
+            db.close()
+        statuses[status.value] = statuses.get(status.value, 0) + 1
+        video_ids.append(video_id)
+        print(f"Benchmark video {video_id} ({info['duration']:.0f}s): {status.value}")
+
+    return video_ids, {
+        "videos": len(video_ids),
+        "statuses": statuses,
+        "video_seconds": round(video_seconds, 1),
+        "synthesize_seconds": round(synthesize_seconds, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        "realtime_factor": round(video_seconds / wall_seconds, 2) if wall_seconds else None,
+    }
+
+
+def stage_report(video_ids: list[int], video_seconds: float) -> dict:
+    """按阶段汇总 video_stage_metrics 中这些视频的记录，并按产出的单位换算吞吐量。"""
+    from sqlalchemy import func
+    from app.database.base import SessionLocal
+    from app.models.stage_metric import VideoStageMetric
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            VideoStageMetric.stage, func.sum(VideoStageMetric.seconds), func.sum(VideoStageMetric.items),
+        ).filter(VideoStageMetric.video_id.in_(video_ids)).group_by(VideoStageMetric.stage).all()
+    finally:
+        db.close()
+
+    report = {}
+    for stage, seconds, items in rows:
+        record = {"seconds": round(seconds or 0.0, 3)}
+        if items is not None:
+            record["items"] = int(items)
+        if seconds:
+            if stage in FRAME_STAGES and items:
+                record["frames_per_sec"] = round(items / seconds, 1)
+            elif stage in AUDIO_STAGES:
+                record["audio_seconds_per_sec"] = round(video_seconds / seconds, 1)
+            elif stage in ITEM_STAGES and items:
+                record["items_per_sec"] = round(items / seconds, 1)
+            elif stage == "total":
+                record["video_seconds_per_sec"] = round(video_seconds / seconds, 2)
+        report[stage] = record
+    return report
+
+
+def _sample_queries(rng: np.random.Generator, count: int) -> list[str]:
+    """从入库的字幕中随机取两个词作为全文检索的查询（保证有命中）。"""
+    from app.database.base import SessionLocal
+    from app.models.subtitle import Subtitle
+
+    db = SessionLocal()
+    try:
+        texts = [row[0] for row in db.query(Subtitle.text).limit(50_000).all()]
+    finally:
+        db.close()
+    if not texts:
+        return [f"{_word(i)} {_word(i + 1)}" for i in range(count)]
+    queries = []
+    for i in rng.integers(len(texts), size=count):
+        words = texts[i].split()
+        queries.append(" ".join(rng.choice(words, min(2, len(words)), replace=False)))
+    return queries
+
+
+async def _measure(call, queries: list[str], concurrency: int) -> dict:
+    latencies: list[float] = []
+    pending = iter(queries)
+
+    async def client():
+        for query in pending:
+            started = time.perf_counter()
+            await call(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"requests": len(latencies), "qps": round(len(latencies) / elapsed, 1), **_percentiles(latencies)}
+
+
+async def search_report(args) -> dict:
+    """直接调用检索接口函数（包括查询向量缓存与合并推理），每次请求使用不同的查询。"""
+    from app.api import search
+    from app.core.config import settings
+
+    rng = np.random.default_rng(args.seed)
+    endpoints = {
+        "text": lambda q: search.search_by_text(q=q, size=10, phrase=False, slop=0, video_id=None, search_after=None),
+        "image-by-text": lambda q: search.search_image_by_text(
+            q=q, size=10, frames_per_video=settings.VISUAL_SEARCH_FRAMES_PER_VIDEO, mode=None),
+        "hybrid": lambda q: search.search_hybrid(q=q, size=10, window_seconds=10.0),
+    }
+    report = {}
+    for name, call in endpoints.items():
+        report[name] = {}
+        for concurrency in args.concurrency:
+            queries = _sample_queries(rng, args.requests)
+            if name == "image-by-text":
+                # 查询向量缓存按文本命中，加上序号让每个请求都走一次编码
+                queries = [f"{query} {i}" for i, query in enumerate(queries)]
+            await call(queries[0])  # 预热：打开索引文件、启动合并推理的后台协程
+            report[name][f"c{concurrency}"] = await _measure(call, queries, concurrency)
+    report["text_embedding"] = search.text_embedding_stats()
+    return report
+
+
+def _flatten(report: dict, prefix: str = "") -> dict[str, float]:
+    values = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values |= _flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> dict:
+    """
+    逐项对比吞吐量、延迟与内存。:return: {"regressions": [...], "improvements": [...]}，
+    每项含指标名、基线值、当前值与相对变化；两次运行的配置不同时附带 config_mismatch。
+    """
+    result = {"baseline_commit": baseline.get("revision", {}).get("commit"), "regressions": [], "improvements": []}
+    if baseline.get("config") != current.get("config"):
+        result["config_mismatch"] = True
+    old, new = _flatten(baseline), _flatten(current)
+    for name, value in new.items():
+        before = old.get(name)
+        if not before:
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            change = (value - before) / before
+        elif name.endswith(LOWER_IS_BETTER):
+            change = (before - value) / before
+        else:
+            continue
+        item = {"metric": name, "baseline": before, "current": value, "change": round((value - before) / before, 3)}
+        if change < -tolerance:
+            result["regressions"].append(item)
+        elif change > tolerance:
+            result["improvements"].append(item)
+    return result
+
+
+def run(args, workdir: Path) -> dict:
+    _configure_environment(workdir, args)
+    from app.core.config import settings
+    from app.database.base import Base, engine
+    from app.services import model_client
+    from app.tasks.worker import celery_app
+
+    Base.metadata.create_all(bind=engine)
+    celery_app.conf.update(task_always_eager=True, task_eager_propagates=True, result_backend="cache+memory://")
+    stub = None
+    if args.models == "stub":
+        # 客户端已存在时 get_model_client() 直接返回它，流水线与检索接口都把推理交给替代模型
+        stub = StubModels(settings.VECTOR_DIM, seed=args.seed)
+        settings.MODEL_SERVER_ADDRESS = "stub"
+        model_client._client = stub
+
+    video_ids, ingest_stats = ingest(args, workdir / "media")
+    report = {
+        "label": args.label,
+        "revision": _git_revision(),
+        "config": {
+            "videos": args.videos, "duration": args.duration, "scene_seconds": args.scene_seconds,
+            "resolution": args.resolution, "fps": args.fps, "codec": args.codec, "models": args.models,
+            "whisper_size": args.whisper_size if args.models == "real" else None,
+            "pipeline": settings.PIPELINE_MODE, "vector_backend": settings.VECTOR_BACKEND,
+            "frame_sampling": settings.FRAME_SAMPLING_MODE, "video_summary": settings.VIDEO_SUMMARY_METHOD,
+            "requests": args.requests, "concurrency": args.concurrency,
+        },
+        "environment": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "ingest": ingest_stats,
+        "stages": stage_report(video_ids, ingest_stats["video_seconds"]),
+        "memory": {"ingest_peak_rss_mb": _peak_rss_mb()},
+    }
+    report["search"] = asyncio.run(search_report(args))
+    report["memory"]["search_peak_rss_mb"] = _peak_rss_mb()
+    report["memory"]["children_peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    if stub is not None:
+        report["stub_calls"] = stub.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=120, help="每个合成视频的时长（秒）")
+    parser.add_argument("--scene-seconds", type=float, default=8, help="每个镜头的时长（秒）")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--fps", type=int, default=25)
+    parser.add_argument("--codec", default="libx264", help="合成视频的编码器；ffmpeg 没有 libx264 时用 mpeg4")
+    parser.add_argument("--pipeline", choices=["fused", "split"], default="fused")
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--whisper-size", default="tiny", help="--models real 时的 Whisper 模型大小")
+    parser.add_argument("--vector-backend", choices=["local", "ivfpq"], default="local")
+    parser.add_argument("--requests", type=int, default=200, help="每个检索接口、每个并发度的请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--label", default="", help="写入结果的标记，例如分支名")
+    parser.add_argument("--output", default="pipeline_benchmark.json")
+    parser.add_argument("--compare", help="之前保存的结果文件，对比并报告回归")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="相对变化超过该比例才算回归 / 改进")
+    parser.add_argument("--workdir", help="数据目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="pipeline_benchmark_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        report = run(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.compare:
+        report["comparison"] = compare(report, json.loads(Path(args.compare).read_text()), args.tolerance)
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
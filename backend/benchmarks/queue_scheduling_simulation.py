@@ -0,0 +1,264 @@
+"""
+任务调度的模拟负载测试：用内存中的 broker 替身（每个队列一个按优先级排序的堆，模拟 Redis 的优先级分桶）
+和若干个 worker 节点做离散事件模拟，比较短视频与长视频的排队等待时间。不需要 Redis 或真实的模型。
+
+路由与优先级直接调用 app/tasks/routing.py 中的 queue_for / priority_for，对比的调度方案：
+
+  - single-prefetch4 : 旧配置，所有任务在同一个队列，Celery 默认的 prefetch_multiplier=4
+  - single-prefetch1 : 同一个队列，prefetch_multiplier=1
+  - fast-lane        : 按时长分流到 video-fast / video 队列（fused 模式），同一队列内先进先出
+  - fast-lane-prio   : 在 fast-lane 基础上按时长设置优先级
+  - split            : PIPELINE_MODE=split，解码 / 转写 / 向量化分别排队，转写与向量化在不同节点上并行；
+                       长视频各阶段的进程数按实时率成比例分配
+
+各方案使用相同数量的 worker 进程（快速通道占其中一个）。处理时间 = 视频时长 × 各阶段的实时率（--*-rtf）；
+各阶段都受 CPU 限制，fused 模式的实时率默认取各阶段之和（总计算量相同，只是调度方式不同）。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.queue_scheduling_simulation --jobs 500 --utilization 0.7 --long-fraction 0.15
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.core.config import settings
+from app.tasks.routing import (
+    QUEUE_EMBED, QUEUE_EXTRACT, QUEUE_FAST, QUEUE_INDEX, QUEUE_TRANSCRIBE, QUEUE_VIDEO,
+    is_short, priority_for, queue_for,
+)
+
+
+@dataclass
+class Job:
+    id: int
+    arrival: float
+    duration: float
+    first_start: float | None = None
+    finished: float | None = None
+    pending_stages: int = 0
+    work: float = 0.0
+
+
+@dataclass
+class Message:
+    job: Job
+    stage: str
+    seconds: float
+
+
+class InMemoryBroker:
+    """每个队列一个 (优先级, 入队序号) 的最小堆；不使用优先级时退化为先进先出。"""
+
+    def __init__(self, use_priority: bool):
+        self.use_priority = use_priority
+        self.queues: dict[str, list] = {}
+        self._seq = itertools.count()
+
+    def put(self, queue: str, message: Message, priority: int):
+        key = priority if self.use_priority else 0
+        heapq.heappush(self.queues.setdefault(queue, []), (key, next(self._seq), message))
+
+    def get(self, queues: list[str]) -> Message | None:
+        # 按 worker 声明的队列顺序取第一个非空队列中优先级最高的消息
+        for queue in queues:
+            if self.queues.get(queue):
+                return heapq.heappop(self.queues[queue])[2]
+        return None
+
+
+@dataclass
+class Node:
+    """一个 worker 节点（celery worker -Q ... -c concurrency），最多预取 concurrency × prefetch 条消息。"""
+    name: str
+    queues: list[str]
+    concurrency: int
+    prefetch: int
+    running: int = 0
+    reserved: deque = field(default_factory=deque)
+
+    def capacity(self) -> int:
+        return self.concurrency * self.prefetch - self.running - len(self.reserved)
+
+
+class Simulation:
+    def __init__(self, nodes: list[Node], use_priority: bool, mode: str, rtf: dict):
+        self.nodes = nodes
+        self.broker = InMemoryBroker(use_priority)
+        self.mode = mode
+        self.rtf = rtf
+        self.routed = mode != "single"
+        self.events: list = []
+        self._seq = itertools.count()
+        self.now = 0.0
+
+    def _schedule(self, at: float, kind: str, payload):
+        heapq.heappush(self.events, (at, next(self._seq), kind, payload))
+
+    def _route(self, stage: str, duration: float) -> str:
+        if not self.routed:
+            return QUEUE_VIDEO
+        return queue_for(stage, duration)
+
+    def _enqueue(self, job: Job, stage: str):
+        if stage == "process":
+            seconds = job.duration * self.rtf["fused"]
+        else:
+            seconds = job.duration * self.rtf[stage]
+        job.work += seconds
+        self.broker.put(self._route(stage, job.duration), Message(job, stage, seconds), priority_for(job.duration))
+        self._dispatch()
+
+    def _dispatch(self):
+        # 有空余预取额度的节点从 broker 取消息，有空闲进程时立即开始执行
+        progress = True
+        while progress:
+            progress = False
+            for node in self.nodes:
+                if node.capacity() > 0:
+                    message = self.broker.get(node.queues)
+                    if message is not None:
+                        node.reserved.append(message)
+                        progress = True
+                while node.reserved and node.running < node.concurrency:
+                    self._start(node, node.reserved.popleft())
+                    progress = True
+
+    def _start(self, node: Node, message: Message):
+        node.running += 1
+        if message.job.first_start is None:
+            message.job.first_start = self.now
+        self._schedule(self.now + message.seconds, "done", (node, message))
+
+    def _finish(self, node: Node, message: Message):
+        node.running -= 1
+        job = message.job
+        if message.stage == "extract":
+            job.pending_stages = 2
+            self._enqueue(job, "transcribe")
+            self._enqueue(job, "embed")
+        elif message.stage in ("transcribe", "embed"):
+            job.pending_stages -= 1
+            if job.pending_stages == 0:
+                job.finished = self.now
+        else:
+            job.finished = self.now
+        self._dispatch()
+
+    def run(self, jobs: list[Job]) -> list[Job]:
+        for job in jobs:
+            self._schedule(job.arrival, "arrive", job)
+        while self.events:
+            self.now, _, kind, payload = heapq.heappop(self.events)
+            if kind == "arrive":
+                self._enqueue(payload, "extract" if self.mode == "split" else "process")
+            else:
+                self._finish(*payload)
+        return jobs
+
+
+def generate_jobs(count: int, long_fraction: float, utilization: float, processes: int, rtf: float, seed: int) -> list[Job]:
+    rng = random.Random(seed)
+    durations = [
+        rng.uniform(3600, 4 * 3600) if rng.random() < long_fraction else rng.uniform(30, settings.FAST_LANE_MAX_SECONDS)
+        for _ in range(count)
+    ]
+    # 按目标利用率反推到达率：λ = ρ × 进程数 / 平均处理时间
+    mean_work = float(np.mean(durations)) * rtf
+    rate = utilization * processes / mean_work
+    arrival, jobs = 0.0, []
+    for i, duration in enumerate(durations):
+        arrival += rng.expovariate(rate)
+        jobs.append(Job(id=i, arrival=arrival, duration=duration))
+    return jobs
+
+
+def _split_allocation(processes: int, rtf: dict) -> dict[str, int]:
+    """split 模式下长视频各阶段的进程数按各阶段的实时率成比例分配，每个阶段至少一个进程。"""
+    stages = ["extract", "transcribe", "embed"]
+    total = sum(rtf[stage] for stage in stages)
+    allocation = {stage: max(1, round(processes * rtf[stage] / total)) for stage in stages}
+    # 四舍五入后多出或不足的进程从占比最大的阶段上增减
+    largest = max(stages, key=lambda stage: rtf[stage])
+    allocation[largest] = max(1, allocation[largest] + processes - sum(allocation.values()))
+    return allocation
+
+
+def scenarios(processes: int, rtf: dict) -> dict[str, dict]:
+    # 各方案的 worker 进程总数相同。快速通道固定占一个进程；其余 worker 自己的队列为空时也消费快速通道
+    # （-Q video,video-fast），短视频多时不会只能排在一个进程上
+    lanes = max(1, processes - 1)
+    split = _split_allocation(lanes, rtf)
+    return {
+        "single-prefetch4": {"mode": "single", "priority": False, "nodes": [
+            Node(f"w{i}", [QUEUE_VIDEO], 1, 4) for i in range(processes)]},
+        "single-prefetch1": {"mode": "single", "priority": False, "nodes": [
+            Node(f"w{i}", [QUEUE_VIDEO], 1, 1) for i in range(processes)]},
+        "fast-lane": {"mode": "fused", "priority": False, "nodes": [
+            Node("fast", [QUEUE_FAST], 1, 1), *[Node(f"w{i}", [QUEUE_VIDEO, QUEUE_FAST], 1, 1) for i in range(lanes)]]},
+        "fast-lane-prio": {"mode": "fused", "priority": True, "nodes": [
+            Node("fast", [QUEUE_FAST], 1, 1), *[Node(f"w{i}", [QUEUE_VIDEO, QUEUE_FAST], 1, 1) for i in range(lanes)]]},
+        "split": {"mode": "split", "priority": True, "nodes": [
+            Node("fast", [QUEUE_FAST], 1, 1),
+            *[Node(f"extract{i}", [QUEUE_EXTRACT, QUEUE_INDEX, QUEUE_FAST], 1, 1) for i in range(split["extract"])],
+            *[Node(f"transcribe{i}", [QUEUE_TRANSCRIBE, QUEUE_FAST], 1, 1) for i in range(split["transcribe"])],
+            *[Node(f"embed{i}", [QUEUE_EMBED, QUEUE_FAST], 1, 1) for i in range(split["embed"])],
+        ]},
+    }
+
+
+def summarize(jobs: list[Job]) -> dict:
+    def stats(values):
+        values = np.asarray(values)
+        return {
+            "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1),
+            "max": round(float(values.max()), 1),
+        }
+
+    report = {}
+    for label, selected in (("short", [j for j in jobs if is_short(j.duration)]),
+                            ("long", [j for j in jobs if not is_short(j.duration)])):
+        if not selected:
+            continue
+        report[label] = {
+            "jobs": len(selected),
+            "queue_wait_seconds": stats([j.first_start - j.arrival for j in selected]),
+            "turnaround_seconds": stats([j.finished - j.arrival for j in selected]),
+            # 周转时间 / 各阶段处理时间之和：fused 模式下 1 表示没有任何等待；split 模式下转写与向量化并行，可能小于 1
+            "slowdown_mean": round(float(np.mean([(j.finished - j.arrival) / j.work for j in selected])), 2),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=8, help="每个方案的 worker 进程总数")
+    parser.add_argument("--long-fraction", type=float, default=0.15, help="1~4 小时长视频的比例，其余为短视频")
+    parser.add_argument("--utilization", type=float, default=0.7)
+    parser.add_argument("--fused-rtf", type=float, default=None, help="fused 模式整体处理的实时率，默认为各阶段之和")
+    parser.add_argument("--extract-rtf", type=float, default=0.05)
+    parser.add_argument("--transcribe-rtf", type=float, default=0.3)
+    parser.add_argument("--embed-rtf", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rtf = {"extract": args.extract_rtf, "transcribe": args.transcribe_rtf, "embed": args.embed_rtf}
+    rtf["fused"] = args.fused_rtf or sum(rtf.values())
+    report = {"jobs": args.jobs, "processes": args.processes, "utilization": args.utilization,
+              "fast_lane_max_seconds": settings.FAST_LANE_MAX_SECONDS, "scenarios": {}}
+    for name, scenario in scenarios(args.processes, rtf).items():
+        jobs = generate_jobs(args.jobs, args.long_fraction, args.utilization, args.processes, rtf["fused"], args.seed)
+        simulation = Simulation(scenario["nodes"], scenario["priority"], scenario["mode"], rtf)
+        report["scenarios"][name] = summarize(simulation.run(jobs))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+以文搜图接口的并发压测：统计 p50/p99 延迟与吞吐量。
+
+默认每个请求使用不同的查询文本，绕过查询向量缓存，测量的是合并推理本身的效果；
+加 --repeat-queries 则只使用少量固定查询，测量缓存命中时的表现。
+
+用法（API 服务运行中）:
+    python -m benchmarks.search_load_benchmark --url http://127.0.0.1:8000 --concurrency 32 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+import numpy as np
+
+QUERY_WORDS = ["a", "person", "red", "car", "dog", "cat", "city", "street", "night", "beach",
+               "mountain", "kitchen", "classroom", "laptop", "screen", "chart", "crowd", "tree"]
+
+
+def make_query(i: int, repeat: bool) -> str:
+    if repeat:
+        i %= 20
+    words = [QUERY_WORDS[(i * 7 + k * 3) % len(QUERY_WORDS)] for k in range(4)]
+    return " ".join(words) + f" {i}"
+
+
+async def run(url: str, concurrency: int, total: int, repeat: bool) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def client(session: aiohttp.ClientSession):
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            async with session.get(f"{url}/api/search/image-by-text", params={"q": make_query(i, repeat)}) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{url}/api/search/image-by-text/stats") as resp:
+            server_stats = await resp.json() if resp.status == 200 else None
+
+    ms = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "server_stats": server_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--repeat-queries", action="store_true")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run(args.url, c, args.requests, args.repeat_queries)) for c in args.concurrency]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
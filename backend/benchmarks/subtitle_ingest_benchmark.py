@@ -0,0 +1,137 @@
+"""
+字幕写入路径的吞吐量测试（默认 10 万条字幕）：
+
+1. 数据库：逐个构造 ORM 对象 + add_all（旧路径）与 bulk_insert_subtitles（INSERT ... RETURNING 批量写入）对比；
+2. Elasticsearch：按不同的 bulk 块大小与并发数流式写入一个临时索引，结束后删除。
+
+用法（在 backend 目录下，数据库与 Elasticsearch 可访问）:
+    python -m benchmarks.subtitle_ingest_benchmark --segments 100000
+    python -m benchmarks.subtitle_ingest_benchmark --db-url sqlite:////tmp/bench.db --skip-es
+    python -m benchmarks.subtitle_ingest_benchmark --chunk-sizes 500 2000 5000 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.database.base import Base
+from app.models.subtitle import Subtitle
+from app.models.video import Video
+from app.services.search_engine_service import ElasticsearchTextBackend
+from app.services.subtitle_store import bulk_insert_subtitles, iter_subtitle_documents
+
+WORDS = ["the", "model", "frame", "video", "search", "index", "lecture", "slide", "example", "result",
+         "network", "training", "data", "query", "vector", "time", "scene", "audio", "speaker", "question"]
+
+
+def synthetic_segments(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    for _ in range(count):
+        duration = rng.uniform(1.5, 6.0)
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18)))
+        segments.append({"start": round(t, 3), "end": round(t + duration, 3), "text": text})
+        t += duration
+    return segments
+
+
+def bench_db(session_factory, segments: list[dict]) -> tuple[dict, int]:
+    db = session_factory()
+    video = Video(filename="subtitle_ingest_benchmark.mp4", filepath="/dev/null")
+    db.add(video)
+    db.commit()
+    video_id = video.id
+    results = {}
+    try:
+        started = time.perf_counter()
+        objects = [Subtitle(video_id=video_id, start_time=s["start"], end_time=s["end"], text=s["text"]) for s in segments]
+        db.add_all(objects)
+        db.commit()
+        _ = [obj.id for obj in objects]  # 旧路径在提交后读取 id
+        results["orm_add_all_seconds"] = round(time.perf_counter() - started, 2)
+        db.execute(delete(Subtitle).where(Subtitle.video_id == video_id))
+        db.commit()
+
+        started = time.perf_counter()
+        ids = bulk_insert_subtitles(db, video_id, segments)
+        db.commit()
+        results["bulk_insert_seconds"] = round(time.perf_counter() - started, 2)
+        results["bulk_insert_rows_per_sec"] = round(len(ids) / results["bulk_insert_seconds"])
+        results["speedup"] = round(results["orm_add_all_seconds"] / results["bulk_insert_seconds"], 1)
+
+        started = time.perf_counter()
+        read = sum(len(batch) for batch in iter_subtitle_documents(db, video_id))
+        results["chunked_read_seconds"] = round(time.perf_counter() - started, 2)
+        results["chunked_read_rows"] = read
+    finally:
+        db.close()
+    return results, video_id
+
+
+async def bench_es(session_factory, video_id: int, chunk_sizes: list[int], concurrencies: list[int]) -> list[dict]:
+    service = ElasticsearchTextBackend(index_name="subtitles_ingest_benchmark")
+    await service.client.options(ignore_status=404).indices.delete(index=service.index_name)
+    await service.create_index_if_not_exists()
+    db = session_factory()
+    documents = [doc for batch in iter_subtitle_documents(db, video_id) for doc in batch]
+    db.close()
+
+    results = []
+    try:
+        for chunk_size in chunk_sizes:
+            for concurrency in concurrencies:
+                started = time.perf_counter()
+                totals = await service.index_subtitle_batches(
+                    (documents[i:i + 10000] for i in range(0, len(documents), 10000)),
+                    chunk_size=chunk_size, concurrency=concurrency,
+                )
+                elapsed = time.perf_counter() - started
+                results.append({
+                    "chunk_size": chunk_size,
+                    "concurrency": concurrency,
+                    "indexed": totals["indexed"],
+                    "failed": totals["failed"],
+                    "seconds": round(elapsed, 2),
+                    "docs_per_sec": round(totals["indexed"] / elapsed) if elapsed else None,
+                })
+    finally:
+        await service.client.options(ignore_status=404).indices.delete(index=service.index_name)
+        await service.client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=100_000)
+    parser.add_argument("--db-url", default=settings.POSTGRES_URL)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--skip-es", action="store_true")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_url)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    segments = synthetic_segments(args.segments)
+
+    db_results, video_id = bench_db(session_factory, segments)
+    report = {"segments": args.segments, "database": db_results}
+    try:
+        if not args.skip_es:
+            report["elasticsearch"] = asyncio.run(bench_es(session_factory, video_id, args.chunk_sizes, args.concurrency))
+    finally:
+        db = session_factory()
+        db.execute(delete(Subtitle).where(Subtitle.video_id == video_id))
+        db.execute(delete(Video).where(Video.id == video_id))
+        db.commit()
+        db.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+字幕全文检索：本地倒排索引（TEXT_SEARCH_BACKEND=local）与 Elasticsearch 的对比。
+
+生成一个合成的字幕语料（词频服从 Zipf 分布，每个视频 --per-video 条字幕），按视频逐个写入（与索引任务相同），
+然后对各类查询测量延迟：
+  - match-2 / match-3 : 从某条字幕中随机取 2 / 3 个词，AND 匹配
+  - common            : 两个高频词，倒排表最长的情况
+  - phrase-2          : 某条字幕中相邻的两个词，短语匹配
+  - common-page10     : common 查询用 search_after 连续翻到第 10 页，只计最后一页的耗时
+同时给出两个后端第一页结果的重合度（BM25 参数相同，长度归一化的精度不同，得分接近但不完全相等）。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.text_search_benchmark --segments 1000000
+    python -m benchmarks.text_search_benchmark --segments 200000 --es   # 同时测试 Elasticsearch（需要服务在线）
+"""
+import argparse
+import asyncio
+import json
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services.local_text_index import LocalTextIndex
+from app.services.search_engine_service import ElasticsearchTextBackend
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "de", "fu", "ho", "ji", "pe", "qu", "zo", "ba"]
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def disk_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 / 1024
+
+
+def synthetic_corpus(rng: np.random.Generator, segments: int, per_video: int, vocab_size: int) -> tuple[list[dict], np.ndarray]:
+    # 由音节拼成的不重复的词，词频服从 Zipf 分布（少数词极常见，大部分词很少出现）
+    vocab = np.array(["".join(SYLLABLES[(i // len(SYLLABLES) ** k) % len(SYLLABLES)] for k in range(4)) + str(i // 65536)
+                      for i in range(vocab_size)])
+    weights = 1.0 / np.arange(1, vocab_size + 1) ** 1.07
+    lengths = rng.integers(6, 19, segments)
+    words = rng.choice(vocab_size, size=int(lengths.sum()), p=weights / weights.sum())
+    docs, offset = [], 0
+    for i, length in enumerate(lengths):
+        docs.append({
+            "id": i + 1,
+            "video_id": i // per_video + 1,
+            "start_time": round((i % per_video) * 3.5, 3),
+            "text": " ".join(vocab[words[offset:offset + length]]),
+        })
+        offset += length
+    return docs, vocab
+
+
+def build_queries(rng: np.random.Generator, docs: list[dict], vocab: np.ndarray, count: int) -> dict[str, list[dict]]:
+    def words_of(doc):
+        return doc["text"].split()
+
+    queries = {"match-2": [], "match-3": [], "common": [], "phrase-2": []}
+    for _ in range(count):
+        words = words_of(docs[rng.integers(len(docs))])
+        queries["match-2"].append({"query_text": " ".join(rng.choice(words, 2, replace=False))})
+        queries["match-3"].append({"query_text": " ".join(rng.choice(words, 3, replace=False))})
+        queries["common"].append({"query_text": " ".join(vocab[rng.choice(20, 2, replace=False)])})
+        start = rng.integers(len(words) - 1)
+        queries["phrase-2"].append({"query_text": " ".join(words[start:start + 2]), "phrase": True})
+    return queries
+
+
+async def measure(backend, queries: dict[str, list[dict]], size: int) -> tuple[dict, dict]:
+    report, first_pages = {}, {}
+    for kind, items in queries.items():
+        latencies, totals = [], []
+        for i, query in enumerate(items):
+            started = time.perf_counter()
+            page = await backend.search(size=size, **query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            totals.append(page["total"])
+            first_pages[(kind, i)] = [hit["id"] for hit in page["hits"]]
+        report[kind] = _latency_stats(latencies) | {"mean_total_hits": round(float(np.mean(totals)), 1)}
+
+    latencies = []
+    for query in queries["common"][:max(1, len(queries["common"]) // 4)]:
+        after = None
+        for _ in range(10):
+            started = time.perf_counter()
+            page = await backend.search(size=size, search_after=after, **query)
+            elapsed = (time.perf_counter() - started) * 1000
+            after = page["next_search_after"]
+            if after is None:
+                break
+        latencies.append(elapsed)
+    report["common-page10"] = _latency_stats(latencies)
+    return report, first_pages
+
+
+def _latency_stats(latencies: list[float]) -> dict:
+    latencies = np.array(latencies)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def _videos(docs: list[dict], per_video: int):
+    for start in range(0, len(docs), per_video):
+        yield docs[start:start + per_video]
+
+
+async def bench_local(docs, per_video, queries, size, merge_factor) -> tuple[dict, dict]:
+    path = Path(tempfile.mkdtemp(prefix="text_index_benchmark_"))
+    try:
+        backend = LocalTextIndex(path, merge_factor=merge_factor)
+        started = time.perf_counter()
+        for video_docs in _videos(docs, per_video):
+            await backend.index_subtitle_batches([video_docs])
+        elapsed = time.perf_counter() - started
+        report = {
+            "index_seconds": round(elapsed, 2),
+            "docs_per_sec": round(len(docs) / elapsed),
+            "disk_mb": round(disk_mb(path), 1),
+            **backend.stats(),
+        }
+        report["queries"], first_pages = await measure(backend, queries, size)
+        report["peak_rss_mb"] = round(rss_mb(), 1)
+        return report, first_pages
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+async def bench_es(docs, per_video, queries, size) -> tuple[dict, dict]:
+    backend = ElasticsearchTextBackend(index_name="subtitles_search_benchmark")
+    client = backend.client
+    await client.options(ignore_status=404).indices.delete(index=backend.index_name)
+    await backend.create_index_if_not_exists()
+    try:
+        started = time.perf_counter()
+        for video_docs in _videos(docs, per_video):
+            await backend.index_subtitle_batches([video_docs])
+        await client.indices.refresh(index=backend.index_name)
+        elapsed = time.perf_counter() - started
+        stats = await client.indices.stats(index=backend.index_name)
+        report = {
+            "index_seconds": round(elapsed, 2),
+            "docs_per_sec": round(len(docs) / elapsed),
+            "disk_mb": round(stats["_all"]["primaries"]["store"]["size_in_bytes"] / 1024 / 1024, 1),
+        }
+        report["queries"], first_pages = await measure(backend, queries, size)
+        return report, first_pages
+    finally:
+        await client.options(ignore_status=404).indices.delete(index=backend.index_name)
+        await backend.close()
+
+
+def overlap(a: dict, b: dict) -> dict:
+    by_kind: dict[str, list[float]] = {}
+    for key, ids in a.items():
+        other = b.get(key, [])
+        if ids or other:
+            by_kind.setdefault(key[0], []).append(len(set(ids) & set(other)) / max(len(ids), len(other)))
+    return {kind: round(float(np.mean(values)), 3) for kind, values in by_kind.items()}
+
+
+async def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    started = time.perf_counter()
+    docs, vocab = synthetic_corpus(rng, args.segments, args.per_video, args.vocab)
+    queries = build_queries(rng, docs, vocab, args.queries)
+    report = {"segments": args.segments, "per_video": args.per_video, "vocab": args.vocab,
+              "corpus_seconds": round(time.perf_counter() - started, 2)}
+
+    report["local"], local_pages = await bench_local(docs, args.per_video, queries, args.size, args.merge_factor)
+    if args.es:
+        report["elasticsearch"], es_pages = await bench_es(docs, args.per_video, queries, args.size)
+        report["top_k_overlap"] = overlap(local_pages, es_pages)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=1_000_000, help="字幕总条数")
+    parser.add_argument("--per-video", type=int, default=1000, help="每个视频的字幕条数（每次写入的批大小）")
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200, help="每类查询的数量")
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--merge-factor", type=int, default=10)
+    parser.add_argument("--es", action="store_true", help="同时测试 ELASTICSEARCH_HOSTS 上的 Elasticsearch")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
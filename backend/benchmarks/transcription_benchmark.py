@@ -0,0 +1,43 @@
+"""
+对比单次调用 Whisper 与分块并行转写的墙钟耗时。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.transcription_benchmark /media/lecture.wav --workers 4
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from app.services.ai_models import models_loader
+from app.services.transcription import SAMPLE_RATE, read_wav, transcribe_chunked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", type=Path, help="16kHz 单声道 WAV 文件")
+    parser.add_argument("--workers", type=int, default=None, help="分块模式的进程数")
+    args = parser.parse_args()
+
+    audio_seconds = len(read_wav(args.audio)) / SAMPLE_RATE
+
+    started = time.perf_counter()
+    single = models_loader.transcribe(str(args.audio))
+    single_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    chunked = transcribe_chunked(args.audio, workers=args.workers)
+    chunked_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "audio_seconds": round(audio_seconds, 1),
+        "single_seconds": round(single_seconds, 2),
+        "single_segments": len(single["segments"]),
+        "chunked_seconds": round(chunked_seconds, 2),
+        "chunked_segments": len(chunked["segments"]),
+        "speedup": round(single_seconds / chunked_seconds, 2) if chunked_seconds else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
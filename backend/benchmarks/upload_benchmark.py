@@ -0,0 +1,124 @@
+"""
+上传路径的并发压测：N 个客户端同时上传同一个视频文件，同时用一个探测客户端持续请求 /health，
+统计上传吞吐量，以及上传期间其他请求的 p50/p99 延迟（事件循环被阻塞时这里会明显升高）。
+
+每次上传都会在文件末尾追加不同的字节，避免命中重复内容的复用逻辑，保证每次都真正写盘。
+--mode chunked 使用可断点续传的分块上传接口。
+
+用法（API 服务运行中）:
+    python -m benchmarks.upload_benchmark --file sample.mp4 --concurrency 1 4 16 --uploads 32
+    python -m benchmarks.upload_benchmark --file sample.mp4 --mode chunked --chunk-mb 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+
+
+def _payload(data: bytes, i: int) -> bytes:
+    # 大多数容器格式会忽略末尾多余的字节，内容哈希因此各不相同
+    return data + os.urandom(16) + i.to_bytes(8, "big")
+
+
+async def upload_multipart(session: aiohttp.ClientSession, url: str, name: str, payload: bytes) -> int:
+    form = aiohttp.FormData()
+    form.add_field("file", payload, filename=name, content_type="video/mp4")
+    async with session.post(f"{url}/api/videos/upload", data=form) as resp:
+        await resp.read()
+        return resp.status
+
+
+async def upload_chunked(session: aiohttp.ClientSession, url: str, name: str, payload: bytes, chunk_size: int) -> int:
+    async with session.post(f"{url}/api/videos/uploads", json={"filename": name, "size": len(payload)}) as resp:
+        if resp.status != 200:
+            return resp.status
+        upload_id = (await resp.json())["upload_id"]
+    for offset in range(0, len(payload), chunk_size):
+        async with session.put(f"{url}/api/videos/uploads/{upload_id}", params={"offset": offset},
+                               data=payload[offset:offset + chunk_size]) as resp:
+            await resp.read()
+            if resp.status != 200:
+                return resp.status
+    async with session.post(f"{url}/api/videos/uploads/{upload_id}/complete") as resp:
+        await resp.read()
+        return resp.status
+
+
+async def run(url: str, data: bytes, name: str, concurrency: int, total: int, mode: str, chunk_size: int) -> dict:
+    upload_seconds: list[float] = []
+    probe_latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+    done = asyncio.Event()
+
+    async def uploader(session: aiohttp.ClientSession):
+        nonlocal errors
+        for i in counter:
+            payload = _payload(data, i)
+            started = time.perf_counter()
+            if mode == "chunked":
+                status = await upload_chunked(session, url, name, payload, chunk_size)
+            else:
+                status = await upload_multipart(session, url, name, payload)
+            upload_seconds.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    async def prober(session: aiohttp.ClientSession):
+        while not done.is_set():
+            started = time.perf_counter()
+            async with session.get(f"{url}/health") as resp:
+                await resp.read()
+            probe_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.02)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as session:
+        probe_task = asyncio.create_task(prober(session))
+        await asyncio.gather(*(uploader(session) for _ in range(concurrency)))
+        done.set()
+        await probe_task
+    elapsed = time.perf_counter() - started
+
+    probe_ms = np.array(probe_latencies or [0.0]) * 1000
+    uploaded_mb = len(upload_seconds) * len(data) / 1024 ** 2
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "uploads": len(upload_seconds),
+        "errors": errors,
+        "file_mb": round(len(data) / 1024 ** 2, 1),
+        "throughput_mb_s": round(uploaded_mb / elapsed, 1),
+        "upload_p50_s": round(float(np.percentile(upload_seconds, 50)), 2),
+        "health_p50_ms": round(float(np.percentile(probe_ms, 50)), 2),
+        "health_p99_ms": round(float(np.percentile(probe_ms, 99)), 2),
+        "health_max_ms": round(float(probe_ms.max()), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--file", type=Path, required=True, help="用于上传的视频文件")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--mode", choices=["multipart", "chunked"], default="multipart")
+    parser.add_argument("--chunk-mb", type=float, default=8)
+    args = parser.parse_args()
+
+    data = args.file.read_bytes()
+    chunk_size = int(args.chunk_mb * 1024 ** 2)
+    results = [
+        asyncio.run(run(args.url, data, args.file.name, c, args.uploads, args.mode, chunk_size))
+        for c in args.concurrency
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+本地内存映射向量索引与 ChromaDB 的对比：查询延迟（p50/p99）与内存占用。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.vector_index_benchmark --frames 1000000 --dtype float16
+    python -m benchmarks.vector_index_benchmark --frames 100000 --chroma   # 同时测试 Chroma（需要服务在线）
+"""
+import argparse
+import json
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.vector_db_service import ChromaVectorBackend
+
+INSERT_BATCH = 10000
+
+
+def synthetic_vectors(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    # 模拟 CLIP 向量：按视频聚成簇，并做 L2 归一化
+    centers = rng.normal(size=(max(1, n // 200), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_queries(backend, queries: np.ndarray, k: int) -> dict:
+    latencies = []
+    for q in queries:
+        started = time.perf_counter()
+        backend.query([q], n_results=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies = np.array(latencies)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def fill(backend, rng, frames: int, dim: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, frames, INSERT_BATCH):
+        n = min(INSERT_BATCH, frames - start)
+        vectors = synthetic_vectors(rng, n, dim)
+        ids = [f"video_{(start + i) // 720}_frame_{(start + i) % 720 + 1:04d}" for i in range(n)]
+        metadatas = [{"video_id": (start + i) // 720, "timestamp_approx": ((start + i) % 720) * 5.0} for i in range(n)]
+        backend.add(vectors, metadatas, ids)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--chroma", action="store_true", help="同时测试 ChromaDB 服务")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dim = settings.VECTOR_DIM
+    queries = synthetic_vectors(rng, args.queries, dim)
+    report = {"frames": args.frames, "dim": dim}
+
+    index_dir = Path(tempfile.mkdtemp(prefix="vector_index_bench_"))
+    try:
+        rss_before = rss_mb()
+        local = LocalVectorIndex(index_dir, dim=dim, dtype=args.dtype)
+        insert_seconds = fill(local, rng, args.frames, dim)
+        # 重新打开，测量冷启动（重放元数据日志 + 计算范数）
+        started = time.perf_counter()
+        local = LocalVectorIndex(index_dir, dim=dim, dtype=args.dtype)
+        load_seconds = time.perf_counter() - started
+        report["local"] = {
+            "dtype": args.dtype,
+            "insert_seconds": round(insert_seconds, 1),
+            "load_seconds": round(load_seconds, 2),
+            "vectors_file_mb": round((index_dir / "vectors.bin").stat().st_size / 2**20, 1),
+            "metadata_file_mb": round((index_dir / "metadata.jsonl").stat().st_size / 2**20, 1),
+            **measure_queries(local, queries, args.k),
+            "peak_rss_growth_mb": round(rss_mb() - rss_before, 1),
+        }
+    finally:
+        shutil.rmtree(index_dir, ignore_errors=True)
+
+    if args.chroma:
+        import chromadb
+        chroma = ChromaVectorBackend(collection_name="benchmark_frames")
+        insert_seconds = fill(chroma, rng, args.frames, dim)
+        report["chroma"] = {
+            "insert_seconds": round(insert_seconds, 1),
+            **measure_queries(chroma, queries, args.k),
+        }
+        chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT).delete_collection("benchmark_frames")
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+以文搜图：粗排 → 精排（先按视频摘要选候选视频）与直接检索全部帧的对比，衡量延迟与结果的多样性。
+
+合成数据模拟 CLIP 帧向量的结构：每个视频有一个主题方向，视频内分若干镜头，同一镜头内的帧几乎相同。
+查询取某个镜头中心加噪声，该镜头所在的视频即为目标视频。两个方案都在本地内存映射索引（LocalVectorIndex）上运行：
+  - flat-raw     : 旧的 /image-by-text，直接取最近的 --size 帧
+  - flat-grouped : 检索全部帧后按视频分组去重
+  - coarse       : 先在摘要集合中选 --candidates 个候选视频，再只检索这些视频的帧，分组去重
+指标：延迟、目标视频命中率、结果中的不同视频数、近重复帧（与排名更靠前的帧同一视频同一镜头）的比例，
+以及 coarse 与 flat-grouped 返回的视频集合的重合度。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.visual_search_benchmark --videos 1000
+    python -m benchmarks.visual_search_benchmark --videos 2000 --method kmeans --candidates 30
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.vector_db_service import VectorDBService
+from app.services.video_summaries import VideoSummaryBuilder
+from app.services.visual_search import candidate_videos, search_grouped
+
+
+def synthetic_videos(rng: np.random.Generator, videos: int, dim: int):
+    """逐个视频产出 (video_id, 帧向量, 时间戳, 镜头编号, 镜头中心)。"""
+    for video_id in range(1, videos + 1):
+        theme = rng.normal(size=dim).astype(np.float32)
+        scenes = int(rng.integers(5, 40))
+        centers = theme + 0.8 * rng.normal(size=(scenes, dim)).astype(np.float32)
+        per_scene = rng.integers(3, 30, scenes)
+        scene_ids = np.repeat(np.arange(scenes), per_scene)
+        vectors = centers[scene_ids] + 0.05 * rng.normal(size=(len(scene_ids), dim)).astype(np.float32)
+        timestamps = np.arange(len(scene_ids)) * 2.0
+        yield video_id, vectors, timestamps, scene_ids, centers
+
+
+def build(service: VectorDBService, rng: np.random.Generator, args, dim: int) -> tuple[list, dict, dict]:
+    """:return: (查询目标 [(video_id, 镜头中心)], 构建耗时等统计, 每个视频的帧数)"""
+    targets, frames_by_video = [], {}
+    report = {"frames": 0, "summaries": 0, "summary_seconds": 0.0}
+    started = time.perf_counter()
+    for video_id, vectors, timestamps, scene_ids, centers in synthetic_videos(rng, args.videos, dim):
+        filename = f"video_{video_id}.mp4"
+        metadatas = [{"video_id": video_id, "video_filename": filename, "timestamp_approx": float(t), "scene": int(s)}
+                     for t, s in zip(timestamps, scene_ids)]
+        ids = [f"video_{video_id}_frame_{i + 1:04d}" for i in range(len(vectors))]
+        service.add_embeddings(vectors, metadatas, ids)
+
+        summary_started = time.perf_counter()
+        builder = VideoSummaryBuilder(method=args.method, max_segments=args.max_segments)
+        builder.add(vectors, timestamps.tolist(), scene_ids.tolist())
+        summary_vectors, summary_metadatas, summary_ids = builder.build(video_id, filename)
+        service.replace_video_summaries(video_id, summary_vectors, summary_metadatas, summary_ids)
+        report["summary_seconds"] += time.perf_counter() - summary_started
+
+        frames_by_video[video_id] = len(vectors)
+        report["frames"] += len(vectors)
+        report["summaries"] += len(summary_ids)
+        for scene in rng.choice(len(centers), 2, replace=False):
+            targets.append((video_id, centers[scene]))
+    report["build_seconds"] = round(time.perf_counter() - started, 2)
+    report["summary_seconds"] = round(report["summary_seconds"], 2)
+    return targets, report, frames_by_video
+
+
+def _latency(latencies: list[float]) -> dict:
+    latencies = np.array(latencies)
+    return {"p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2)}
+
+
+def _duplicates(metadatas: list[dict]) -> float:
+    """与排名更靠前的某一帧同一视频同一镜头的帧所占比例。"""
+    seen, duplicates = set(), 0
+    for metadata in metadatas:
+        key = (metadata["video_id"], metadata.get("scene"))
+        duplicates += key in seen
+        seen.add(key)
+    return duplicates / max(1, len(metadatas))
+
+
+def evaluate(service: VectorDBService, queries: list, args, frames_by_video: dict) -> dict:
+    results = {name: {"latencies": [], "hit": [], "videos": [], "duplicates": []} for name in ("flat-raw", "flat-grouped", "coarse")}
+    overlaps, scanned = [], []
+    for target_video, query in queries:
+        started = time.perf_counter()
+        raw = service.query([query], n_results=args.size)
+        results["flat-raw"]["latencies"].append((time.perf_counter() - started) * 1000)
+        metadatas = raw["metadatas"][0]
+        results["flat-raw"]["hit"].append(any(m["video_id"] == target_video for m in metadatas))
+        results["flat-raw"]["videos"].append(len({m["video_id"] for m in metadatas}))
+        results["flat-raw"]["duplicates"].append(_duplicates(metadatas))
+
+        grouped = {}
+        for name, mode in (("flat-grouped", "flat"), ("coarse", "coarse")):
+            started = time.perf_counter()
+            groups = search_grouped(query, size=args.size, frames_per_video=args.frames_per_video, mode=mode, service=service)
+            results[name]["latencies"].append((time.perf_counter() - started) * 1000)
+            frames = [frame for group in groups for frame in group["frames"]]
+            results[name]["hit"].append(any(group["video_id"] == target_video for group in groups))
+            results[name]["videos"].append(len(groups))
+            results[name]["duplicates"].append(_duplicates(frames))
+            grouped[name] = {group["video_id"] for group in groups}
+        overlaps.append(len(grouped["coarse"] & grouped["flat-grouped"]) / max(1, len(grouped["flat-grouped"])))
+        scanned.append(sum(frames_by_video[v] for v in candidate_videos(query, args.candidates, service)))
+
+    report = {}
+    for name, values in results.items():
+        report[name] = _latency(values["latencies"]) | {
+            "target_video_hit_rate": round(float(np.mean(values["hit"])), 3),
+            "distinct_videos_mean": round(float(np.mean(values["videos"])), 2),
+            "near_duplicate_fraction": round(float(np.mean(values["duplicates"])), 3),
+        }
+    report["coarse"]["frames_scanned_mean"] = round(float(np.mean(scanned)))
+    report["coarse_vs_flat_video_overlap"] = round(float(np.mean(overlaps)), 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--size", type=int, default=10, help="返回的视频数（flat-raw 为帧数）")
+    parser.add_argument("--frames-per-video", type=int, default=settings.VISUAL_SEARCH_FRAMES_PER_VIDEO)
+    parser.add_argument("--candidates", type=int, default=settings.VISUAL_SEARCH_CANDIDATE_VIDEOS)
+    parser.add_argument("--method", choices=["mean", "kmeans"], default=settings.VIDEO_SUMMARY_METHOD)
+    parser.add_argument("--max-segments", type=int, default=settings.VIDEO_SUMMARY_MAX_SEGMENTS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    settings.VISUAL_SEARCH_CANDIDATE_VIDEOS = args.candidates
+    settings.VIDEO_SUMMARY_MAX_SEGMENTS = args.max_segments
+    dim = settings.VECTOR_DIM
+    rng = np.random.default_rng(args.seed)
+    path = Path(tempfile.mkdtemp(prefix="visual_search_benchmark_"))
+    try:
+        service = VectorDBService(
+            backend=LocalVectorIndex(path / "video_frames", dim=dim),
+            summary_backend=LocalVectorIndex(path / "video_summaries", dim=dim),
+        )
+        targets, report, frames_by_video = build(service, rng, args, dim)
+        report |= {"videos": args.videos, "method": args.method, "candidates": args.candidates}
+        picks = rng.choice(len(targets), min(args.queries, len(targets)), replace=False)
+        queries = [(targets[i][0], targets[i][1] + 0.3 * rng.normal(size=dim).astype(np.float32)) for i in picks]
+        report["search"] = evaluate(service, queries, args, frames_by_video)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
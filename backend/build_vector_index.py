@@ -0,0 +1,61 @@
+import argparse
+import json
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.ivfpq_index import IVFPQIndex
+from app.services.vector_db_service import create_vector_backend, vector_db_service
+
+
+def build_index(sample_size: int, iterations: int):
+    """在已入库的帧向量上训练 IVF-PQ 索引（VECTOR_BACKEND=ivfpq 时使用）。"""
+    index = create_vector_backend("ivfpq")
+    assert isinstance(index, IVFPQIndex)
+    print(f"--- Training IVF-PQ index at {index.path} (nlist={settings.IVF_NLIST}, m={settings.PQ_SUBSPACES}) ---")
+    report = index.train(sample_size=sample_size, iterations=iterations)
+    print(json.dumps(report, indent=2))
+
+
+def snapshot_codes():
+    """保存增量编码的快照，缩短下次启动时的编码时间。"""
+    index = create_vector_backend("ivfpq")
+    index.save_codes()
+    print(f"Saved PQ codes snapshot for {index.count()} vectors.")
+
+
+def build_summaries(missing_only: bool):
+    """为已处理完成的视频（重新）生成视频摘要向量，用于启用摘要之前入库的视频。"""
+    from app.database.base import SessionLocal
+    from app.models.video import TaskStatus, Video
+    from app.services.video_summaries import rebuild_video_summary
+
+    db = SessionLocal()
+    try:
+        videos = db.query(Video.id, Video.filepath).filter(Video.status == TaskStatus.COMPLETED).order_by(Video.id).all()
+    finally:
+        db.close()
+    built = 0
+    for video_id, filepath in videos:
+        if missing_only and vector_db_service.summary_backend.get(where={"video_id": video_id}, limit=1)["ids"]:
+            continue
+        # 与帧元数据一致，记录存储的文件名
+        frames = rebuild_video_summary(video_id, Path(filepath).name)
+        built += 1
+        print(f"Video {video_id}: summarized {frames} frames.")
+    print(f"Built summaries for {built} of {len(videos)} completed videos.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the local IVF-PQ frame index and the video summaries.")
+    parser.add_argument("command", choices=["train", "snapshot", "summaries"], nargs="?", default="train")
+    parser.add_argument("--sample-size", type=int, default=100_000, help="训练使用的向量样本数")
+    parser.add_argument("--iterations", type=int, default=20, help="k-means 迭代次数")
+    parser.add_argument("--all", action="store_true", help="summaries: 重建全部视频的摘要，而不只是缺少摘要的")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        build_index(args.sample_size, args.iterations)
+    elif args.command == "summaries":
+        build_summaries(missing_only=not args.all)
+    else:
+        snapshot_codes()
@@ -9,9 +9,10 @@ from transformers import CLIPProcessor, CLIPModel
 from sentence_transformers import SentenceTransformer
 
 def download_all_models():
-    print("--- Downloading Whisper model (base) ---")
+    whisper_size = os.environ.get("WHISPER_MODEL_SIZE", "base")
+    print(f"--- Downloading Whisper model ({whisper_size}) ---")
     try:
-        whisper.load_model("base")
+        whisper.load_model(whisper_size)
         print("Whisper model downloaded successfully.")
     except Exception as e:
         print(f"Failed to download Whisper model: {e}")
@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# 测试不连接任何后端：导入 app.core.config 前填入占位配置，数据库使用 SQLite
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
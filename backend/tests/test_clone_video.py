@@ -0,0 +1,47 @@
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.database.base import Base
+from app.models.subtitle import Subtitle
+from app.models.video import Video
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.subtitle_store import bulk_insert_subtitles, clone_subtitles
+from app.services.vector_db_service import VectorDBService
+
+
+def test_clone_subtitles_is_idempotent():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([Video(id=1, filename="a.mp4"), Video(id=2, filename="b.mp4")])
+        bulk_insert_subtitles(db, 1, [{"start": i, "end": i + 1, "text": f"line {i}"} for i in range(5)])
+        db.commit()
+
+        # 任务被重新投递：第二次执行不应产生重复的字幕
+        for _ in range(2):
+            clone_subtitles(db, 1, 2)
+            db.commit()
+
+        texts = db.scalars(select(Subtitle.text).where(Subtitle.video_id == 2).order_by(Subtitle.start_time)).all()
+        assert texts == [f"line {i}" for i in range(5)]
+        assert db.scalar(select(func.count(Subtitle.id)).where(Subtitle.video_id == 1)) == 5
+
+
+def test_copy_video_embeddings_is_idempotent(tmp_path):
+    service = VectorDBService(
+        backend=LocalVectorIndex(tmp_path / "frames", dim=4),
+        summary_backend=LocalVectorIndex(tmp_path / "summaries", dim=4),
+    )
+    vectors = np.eye(4, dtype=np.float32)
+    service.add_embeddings(vectors, [{"video_id": 1, "timestamp_approx": float(i)} for i in range(4)],
+                           [f"video_1_frame_{i:04d}" for i in range(4)])
+    service.replace_video_summaries(1, vectors[:1], [{"video_id": 1, "kind": "video"}], ["video_1_summary"])
+
+    for _ in range(2):
+        assert service.copy_video_embeddings(1, 2) == 4
+
+    copied = service.backend.get(where={"video_id": 2})
+    assert sorted(copied["ids"]) == [f"video_2_frame_{i:04d}" for i in range(4)]
+    assert service.summary_backend.get(where={"video_id": 2})["ids"] == ["video_2_summary"]
+    assert service.backend.count() == 8
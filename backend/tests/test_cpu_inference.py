@@ -0,0 +1,57 @@
+import sys
+import types
+
+import pytest
+
+from app.core.config import settings
+from app.services import ai_models
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def eval(self):
+        return self
+
+
+@pytest.fixture
+def fake_whisper(monkeypatch):
+    loaded = []
+    module = types.ModuleType("whisper")
+    module.load_model = lambda size, device: loaded.append((size, device)) or FakeModel(size)
+    monkeypatch.setitem(sys.modules, "whisper", module)
+    monkeypatch.setattr(ai_models, "quantize_linear_layers", lambda model: FakeModel(f"int8-{model.name}"))
+    return loaded
+
+
+@pytest.mark.parametrize("device, quantize, expected", [
+    ("cpu", True, "int8-tiny"),
+    ("cpu", False, "tiny"),
+    # 动态量化只适用于 CPU 推理
+    ("cuda", True, "tiny"),
+])
+def test_whisper_profile_follows_settings(monkeypatch, fake_whisper, device, quantize, expected):
+    monkeypatch.setattr(ai_models, "get_device", lambda: device)
+    monkeypatch.setattr(settings, "WHISPER_MODEL_SIZE", "tiny")
+    monkeypatch.setattr(settings, "QUANTIZE_WHISPER", quantize)
+    assert ai_models.load_whisper_model().name == expected
+    assert fake_whisper == [("tiny", device)]
+
+
+def test_quantize_linear_layers_handles_linear_subclasses():
+    torch = pytest.importorskip("torch")
+
+    class CastingLinear(torch.nn.Linear):
+        # 与 whisper.model.Linear 一样只是 nn.Linear 的子类
+        pass
+
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(CastingLinear(16, 32), torch.nn.ReLU(), torch.nn.Linear(32, 4)).eval()
+    inputs = torch.randn(8, 16)
+    expected = model(inputs)
+
+    quantized = ai_models.quantize_linear_layers(model)
+    # 子类也被替换为动态量化的 Linear，不再有 fp32 的 Linear 层
+    assert not any(isinstance(module, torch.nn.Linear) for module in quantized.modules())
+    assert torch.allclose(quantized(inputs), expected, atol=0.1)
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.database import base
+from app.database.base import _async_url, _pool_options
+
+
+@pytest.mark.parametrize("url, driver", [
+    ("postgresql://user:pw@db/videos", "postgresql+asyncpg"),
+    ("postgresql+psycopg2://user:pw@db/videos", "postgresql+asyncpg"),
+    ("sqlite:///videos.db", "sqlite+aiosqlite"),
+    ("sqlite://", "sqlite+aiosqlite"),
+])
+def test_async_url_swaps_driver(url, driver):
+    async_url = _async_url(url)
+    assert async_url.drivername == driver
+    assert async_url.database == (url.rsplit("/", 1)[-1] or None)
+
+
+def test_pool_options(monkeypatch):
+    # SQLite 使用默认连接池，不接受这些参数
+    assert _pool_options(20, 10) == {}
+
+    monkeypatch.setattr(settings, "POSTGRES_URL", "postgresql://user:pw@db/videos")
+    options = _pool_options(20, 10)
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 10
+    assert options["pool_pre_ping"] == settings.DB_POOL_PRE_PING
+
+
+def test_async_session_dependency_runs_queries():
+    async def main():
+        dependency = base.get_async_db()
+        db = await anext(dependency)
+        try:
+            return (await db.execute(text("select 1"))).scalar()
+        finally:
+            await dependency.aclose()
+
+    assert asyncio.run(main()) == 1
@@ -0,0 +1,42 @@
+from app.services import embedding_cache
+from app.services.embedding_cache import EmbeddingCache
+
+
+def test_lookup_normalizes_query_text():
+    cache = EmbeddingCache(max_size=4)
+    cache.put("A  Red   Car", "ViT-B/32", [1.0, 2.0])
+    assert cache.get("a red car", "ViT-B/32") == [1.0, 2.0]
+    # 不同模型的向量不能混用
+    assert cache.get("a red car", "ViT-L/14") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", "m", [1.0])
+    cache.put("b", "m", [2.0])
+    cache.get("a", "m")
+    cache.put("c", "m", [3.0])
+    assert cache.get("b", "m") is None
+    assert cache.get("a", "m") == [1.0]
+    assert cache.get("c", "m") == [3.0]
+    assert cache.stats()["size"] == 2
+
+
+def test_expired_entries_are_recomputed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(max_size=4, ttl_seconds=60)
+    calls = []
+
+    def compute(text):
+        calls.append(text)
+        return [float(len(calls))]
+
+    assert cache.get_or_compute("dog", "m", compute) == [1.0]
+    now[0] += 59
+    assert cache.get_or_compute("dog", "m", compute) == [1.0]
+    now[0] += 2
+    assert cache.get_or_compute("dog", "m", compute) == [2.0]
+    assert calls == ["dog", "dog"]
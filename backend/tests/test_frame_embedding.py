@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.services import frame_embedding
+from app.services.frame_embedding import FrameEmbedder
+
+
+class FakeModelClient:
+    def __init__(self):
+        self.batches = []
+
+    def embed_images(self, images):
+        self.batches.append(len(images))
+        return np.array([[float(image.mean()), 1.0] for image in images], dtype=np.float32)
+
+
+def test_batches_keep_order_and_skip_unreadable_frames(monkeypatch):
+    client = FakeModelClient()
+    monkeypatch.setattr(frame_embedding, "get_model_client", lambda: client)
+
+    def load_image(i):
+        if i == 4:
+            raise OSError("truncated JPEG")
+        return np.full((2, 2, 3), i, dtype=np.uint8)
+
+    embedder = FrameEmbedder(batch_size=3, prefetch_workers=2)
+    batches = list(embedder.iter_batches(range(8), load_image))
+
+    assert [items for items, _ in batches] == [[0, 1, 2], [3, 5], [6, 7]]
+    assert [float(v) for _, embeddings in batches for v in embeddings[:, 0]] == [0, 1, 2, 3, 5, 6, 7]
+    assert client.batches == [3, 2, 2]
+    assert embedder.frames == 7
+
+
+def test_batches_with_no_readable_frames_are_skipped(monkeypatch):
+    client = FakeModelClient()
+    monkeypatch.setattr(frame_embedding, "get_model_client", lambda: client)
+
+    def load_image(i):
+        if i < 2:
+            raise OSError("missing")
+        return np.zeros((2, 2, 3), dtype=np.uint8)
+
+    batches = list(FrameEmbedder(batch_size=2).iter_batches(range(3), load_image))
+    assert [items for items, _ in batches] == [[2]]
+    assert client.batches == [1]
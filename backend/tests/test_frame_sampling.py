@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.services.frame_sampling import AdaptiveFrameSampler
+from app.services.video_processing import StreamedFrame
+
+
+def _gradient(low: int, high: int, flip: bool = False) -> np.ndarray:
+    row = np.linspace(low, high, 64, dtype=np.float32)
+    if flip:
+        row = row[::-1]
+    return np.repeat(np.tile(row, (48, 1))[:, :, None], 3, axis=2).astype(np.uint8)
+
+
+def _run(sampler: AdaptiveFrameSampler, images: list[np.ndarray], step: float = 1.0):
+    frames = [StreamedFrame(index=i, timestamp=i * step, image=image) for i, image in enumerate(images)]
+    return [(frame.index, frame.scene) for frame in frames if sampler.accept(frame)]
+
+
+def test_keeps_first_frame_of_each_scene_and_drops_duplicates():
+    dark, bright = _gradient(0, 120), _gradient(130, 250)
+    sampler = AdaptiveFrameSampler(max_gap_seconds=0)
+    kept = _run(sampler, [dark, dark, dark, bright, bright, dark])
+    assert kept == [(0, 0), (3, 1), (5, 2)]
+    assert sampler.stats() == {"candidates": 6, "kept": 3, "scenes": 3}
+
+
+def test_keeps_changed_frame_within_a_scene():
+    # 灰度直方图相同（同一镜头），但画面结构不同（dHash 距离大）
+    sampler = AdaptiveFrameSampler(max_gap_seconds=0)
+    kept = _run(sampler, [_gradient(0, 120), _gradient(0, 120, flip=True)])
+    assert kept == [(0, 0), (1, 0)]
+
+
+def test_static_scene_is_resampled_after_max_gap():
+    dark = _gradient(0, 120)
+    sampler = AdaptiveFrameSampler(max_gap_seconds=10)
+    kept = _run(sampler, [dark] * 25, step=1.0)
+    assert kept == [(0, 0), (10, 0), (20, 0)]
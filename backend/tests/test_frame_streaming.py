@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from app.services.video_processing import VideoProcessingError, _iter_piped_frames, _scaled_size
+
+WIDTH, HEIGHT = 4, 2
+
+
+def _fake_ffmpeg(frames: int, returncode: int = 0) -> list[str]:
+    """代替 ffmpeg 的子进程：stdout 输出 rgb24 原始帧，stderr 输出 showinfo 的时间戳行。"""
+    script = (
+        "import sys\n"
+        f"for i in range({frames}):\n"
+        "    sys.stderr.write(f'[Parsed_showinfo_1 @ 0x0] n:{i} pts:{i} pts_time:{i * 2.5 + 0.04} fmt:rgb24\\n')\n"
+        "    sys.stderr.write('frame= noise\\n')\n"
+        "    sys.stderr.flush()\n"
+        f"    sys.stdout.buffer.write(bytes([i]) * {WIDTH * HEIGHT * 3})\n"
+        "    sys.stdout.flush()\n"
+        "sys.stderr.write('last error line\\n')\n"
+        f"sys.exit({returncode})\n"
+    )
+    return [sys.executable, "-c", script]
+
+
+def test_frames_are_read_with_showinfo_timestamps():
+    frames = []
+    for frame in _iter_piped_frames(_fake_ffmpeg(5), WIDTH, HEIGHT, 2.5, buffer_count=8, error_label="test"):
+        assert frame.image.shape == (HEIGHT, WIDTH, 3)
+        frames.append((frame.index, frame.timestamp, int(frame.image[0, 0, 0])))
+    assert frames == [(i, pytest.approx(i * 2.5 + 0.04), i) for i in range(5)]
+
+
+def test_ring_buffer_slots_are_reused():
+    images = [frame.image for frame in _iter_piped_frames(_fake_ffmpeg(4), WIDTH, HEIGHT, 1, 2, "test")]
+    assert np.shares_memory(images[0], images[2]) and np.shares_memory(images[1], images[3])
+    assert not np.shares_memory(images[0], images[1])
+    assert int(images[0][0, 0, 0]) == 2
+
+
+def test_stopping_early_reaps_the_process(monkeypatch):
+    processes = []
+    popen = subprocess.Popen
+
+    def record(*args, **kwargs):
+        processes.append(popen(*args, **kwargs))
+        return processes[-1]
+
+    monkeypatch.setattr(subprocess, "Popen", record)
+    frames = _iter_piped_frames(_fake_ffmpeg(100000), WIDTH, HEIGHT, 1, 4, "test")
+    next(frames)
+    frames.close()
+    assert processes[0].poll() is not None
+
+
+def test_failed_process_raises_with_stderr_tail():
+    with pytest.raises(VideoProcessingError, match="last error line"):
+        list(_iter_piped_frames(_fake_ffmpeg(2, returncode=1), WIDTH, HEIGHT, 1, 4, "test"))
+
+
+def test_scaled_size_keeps_even_dimensions():
+    assert _scaled_size(1920, 1080, 224) == (398, 224)
+    assert _scaled_size(1080, 1920, 224) == (224, 398)
+    assert _scaled_size(3, 3, 1) == (2, 2)
@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.hybrid_search import fuse_results
+
+
+def _frames(*hits):
+    return {
+        "ids": [[f"frame_{i}" for i in range(len(hits))]],
+        "metadatas": [[{"video_id": video_id, "timestamp_approx": t} for video_id, t in hits]],
+        "distances": [[0.1 * (i + 1) for i in range(len(hits))]],
+    }
+
+
+def test_hits_in_the_same_window_are_fused():
+    subtitles = [
+        {"video_id": 1, "start_time": 12.0, "text": "red car"},
+        {"video_id": 2, "start_time": 3.0, "text": "blue car"},
+    ]
+    results = fuse_results(subtitles, _frames((1, 15.0), (3, 40.0)), window_seconds=10, rrf_k=60)
+
+    assert [(r["video_id"], r["window_start"]) for r in results] == [(1, 10), (2, 0), (3, 40)]
+    assert results[0]["sources"] == {"text": 1, "visual": 1}
+    assert results[0]["score"] == pytest.approx(2 / 61, abs=1e-6)
+    assert results[1]["score"] == results[2]["score"] == pytest.approx(1 / 62, abs=1e-6)
+
+
+def test_repeated_hits_in_a_window_count_once():
+    subtitles = [{"video_id": 1, "start_time": t, "text": "car"} for t in (0.0, 2.0, 4.0)]
+    subtitles.append({"video_id": 2, "start_time": 0.0, "text": "car"})
+    results = fuse_results(subtitles, _frames((2, 1.0)), window_seconds=10)
+    # 视频 1 的三条字幕只按排名最高的一条计分，两个后端都命中的视频 2 排在前面
+    assert [r["video_id"] for r in results] == [2, 1]
+    assert len(results[1]["subtitles"]) == 3
+
+
+def test_weights_and_size():
+    subtitles = [{"video_id": 1, "start_time": 0.0, "text": "car"}]
+    results = fuse_results(subtitles, _frames((2, 0.0)), text_weight=0.5, visual_weight=2.0, size=1)
+    assert [r["video_id"] for r in results] == [2]
+
+
+def test_missing_backend_results():
+    assert fuse_results([], None) == []
+    results = fuse_results([{"video_id": 1, "start_time": None, "text": "car"}], None)
+    assert results[0]["window_start"] == 0
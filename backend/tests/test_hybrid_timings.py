@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app.api.search import _timed
+
+
+def test_timed_records_cancellation_without_masking_it():
+    timings = {}
+
+    async def main():
+        task = asyncio.create_task(_timed("visual", asyncio.sleep(10), timeout=5, timings=timings))
+        await asyncio.sleep(0)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+    assert timings["visual"]["status"] == "cancelled"
+    assert "ms" in timings["visual"]
+
+
+def test_timed_records_timeout_and_error():
+    timings = {}
+
+    async def fail():
+        raise RuntimeError("backend down")
+
+    async def main():
+        return await asyncio.gather(
+            _timed("text", asyncio.sleep(10), timeout=0.01, timings=timings),
+            _timed("visual", fail(), timeout=1, timings=timings),
+            _timed("ok", asyncio.sleep(0, result=[1]), timeout=1, timings=timings),
+        )
+
+    assert asyncio.run(main()) == [None, None, [1]]
+    assert [timings[name]["status"] for name in ("text", "visual", "ok")] == ["timeout", "error", "ok"]
@@ -0,0 +1,24 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.import_time_check import FORBIDDEN_MODULES, PLACEHOLDER_ENV
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_importing_app_main_does_not_load_heavy_modules():
+    # 在全新的解释器中导入，避免其他测试已经加载的模块影响结果
+    script = (
+        "import json, sys\n"
+        "import app.main\n"
+        f"print(json.dumps(sorted(m for m in {FORBIDDEN_MODULES!r} if m in sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True, text=True, cwd=BACKEND_DIR, env={**os.environ, **PLACEHOLDER_ENV},
+    )
+    assert result.returncode == 0, result.stderr[-3000:]
+    assert json.loads(result.stdout.splitlines()[-1]) == []
@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.services.ivfpq_index import IVFPQIndex
+
+
+def _add(index: IVFPQIndex, vectors: np.ndarray, start: int):
+    ids = [f"frame_{start + i}" for i in range(len(vectors))]
+    index.add(vectors, [{"video_id": 1, "timestamp_approx": float(start + i)} for i in range(len(vectors))], ids)
+
+
+def test_reader_picks_up_model_trained_by_another_process(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((600, 16)).astype(np.float32)
+
+    # 两个实例共享同一目录，模拟 API 进程与执行 train 命令的进程
+    reader = IVFPQIndex(tmp_path, dim=16, nlist=8, m=4, nprobe=8, rerank=600)
+    _add(reader, vectors[:500], 0)
+    assert not reader.is_trained
+
+    trainer = IVFPQIndex(tmp_path, dim=16, nlist=8, m=4, nprobe=8, rerank=600)
+    trainer.train(sample_size=500, iterations=5)
+
+    # 训练后新增的向量也应在重新加载后被增量编码
+    _add(trainer, vectors[500:], 500)
+    result = reader.query(vectors[550:551], n_results=1)
+    assert reader.is_trained
+    assert reader.nlist == trainer.nlist
+    assert reader._encoded == 600
+    assert result["ids"] == [["frame_550"]]
+
+
+def test_retraining_discards_stale_code_snapshot(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((400, 16)).astype(np.float32)
+    trainer = IVFPQIndex(tmp_path, dim=16, nlist=8, m=4)
+    _add(trainer, vectors, 0)
+    trainer.train(sample_size=400, iterations=5, seed=0)
+
+    reader = IVFPQIndex(tmp_path, dim=16, nlist=8, m=4)
+    trainer.train(sample_size=400, iterations=5, seed=1)
+    reader.count()
+
+    np.testing.assert_array_equal(reader._coarse, trainer._coarse)
+    np.testing.assert_array_equal(reader._codes, trainer._codes[:trainer._encoded])
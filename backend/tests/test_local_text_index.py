@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from app.services.local_text_index import LocalTextIndex, highlight, tokenize
+
+DOCS = [
+    {"id": 1, "video_id": 1, "start_time": 0.0, "text": "the red car stops"},
+    {"id": 2, "video_id": 1, "start_time": 5.0, "text": "a car that is red"},
+    {"id": 3, "video_id": 2, "start_time": 0.0, "text": "red red car"},
+    {"id": 4, "video_id": 2, "start_time": 9.0, "text": "红色的汽车停下了"},
+    {"id": 5, "video_id": 3, "start_time": 1.0, "text": "blue bicycle"},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LocalTextIndex(tmp_path, merge_factor=2)
+    # 分三批写入，触发段合并
+    for batch in (DOCS[:2], DOCS[2:4], DOCS[4:]):
+        index.add_documents(batch)
+    return index
+
+
+def _bm25(tf: int, length: int, df: int, docs: int, avgdl: float) -> float:
+    idf = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+    return idf * tf / (tf + 1.2 * (1 - 0.75 + 0.75 * length / avgdl))
+
+
+def test_tokenize_splits_cjk_per_character():
+    assert [token for token, _, _ in tokenize("Hello, 世界 it's OK")] == ["hello", "世", "界", "it's", "ok"]
+
+
+def test_bm25_scores_match_reference(index):
+    result = index.search_sync("red", size=10)
+    lengths = {doc["id"]: len(tokenize(doc["text"])) for doc in DOCS}
+    avgdl = sum(lengths.values()) / len(DOCS)
+    expected = {
+        1: _bm25(1, lengths[1], 3, 5, avgdl),
+        2: _bm25(1, lengths[2], 3, 5, avgdl),
+        3: _bm25(2, lengths[3], 3, 5, avgdl),
+    }
+    assert [hit["id"] for hit in result["hits"]] == sorted(expected, key=lambda id_: (-expected[id_], id_))
+    for hit in result["hits"]:
+        assert hit["score"] == pytest.approx(expected[hit["id"]])
+    assert result["total"] == 3
+
+
+def test_phrase_and_slop(index):
+    assert [hit["id"] for hit in index.search_sync("red car", phrase=True)["hits"]] == [3, 1]
+    # "car that is red" 词序相反，slop 也不能匹配
+    assert {hit["id"] for hit in index.search_sync("red car", phrase=True, slop=3)["hits"]} == {1, 3}
+    assert {hit["id"] for hit in index.search_sync("car red", phrase=True, slop=2)["hits"]} == {2}
+    assert [hit["id"] for hit in index.search_sync("汽车", phrase=True)["hits"]] == [4]
+    assert index.search_sync("汽红", phrase=True)["hits"] == []
+
+
+def test_search_after_pages_and_video_filter(index):
+    first = index.search_sync("car", size=2)
+    second = index.search_sync("car", size=2, search_after=first["next_search_after"])
+    ids = [hit["id"] for hit in first["hits"] + second["hits"]]
+    assert sorted(ids) == [1, 2, 3]
+    assert second["next_search_after"] is None
+    assert [hit["id"] for hit in index.search_sync("car", video_id=2)["hits"]] == [3]
+
+
+def test_overwrite_delete_and_cross_instance_visibility(index, tmp_path):
+    reader = LocalTextIndex(tmp_path)
+    index.add_documents([{"id": 5, "video_id": 3, "start_time": 1.0, "text": "green bicycle"}])
+    assert reader.search_sync("blue")["hits"] == []
+    assert [hit["id"] for hit in reader.search_sync("bicycle")["hits"]] == [5]
+
+    assert index.delete_where(1, max_id=2) == 1
+    assert [hit["id"] for hit in reader.search_sync("car", video_id=1)["hits"]] == [2]
+    assert index.delete_where(2) == 2
+    assert reader.search_sync("汽车")["hits"] == []
+
+
+def test_highlight_marks_phrase_terms_only():
+    assert highlight("red car and red bus", ["red", "car"], phrase=True) == "<em>red</em> <em>car</em> and red bus"
+    assert highlight("红色的汽车", ["汽", "车"]) == "红色的<em>汽车</em>"
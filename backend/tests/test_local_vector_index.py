@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.services.local_vector_index import LocalVectorIndex, _matches
+
+
+def _index_with_vectors(path, count=50, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    index = LocalVectorIndex(path, dim=dim)
+    index.add(vectors, [{"video_id": i % 5, "timestamp_approx": float(i)} for i in range(count)],
+              [f"frame_{i}" for i in range(count)])
+    return index, vectors
+
+
+def test_query_matches_brute_force(tmp_path):
+    index, vectors = _index_with_vectors(tmp_path)
+    queries = vectors[:3] + 0.01
+    result = index.query(queries, n_results=5)
+    for query, ids, distances in zip(queries, result["ids"], result["distances"]):
+        expected = np.argsort(((vectors - query) ** 2).sum(axis=1))[:5]
+        assert ids == [f"frame_{i}" for i in expected]
+        np.testing.assert_allclose(distances, ((vectors[expected] - query) ** 2).sum(axis=1), rtol=1e-4, atol=1e-5)
+
+
+def test_video_filter_and_delete(tmp_path):
+    index, vectors = _index_with_vectors(tmp_path)
+    result = index.query(vectors[:1], n_results=50, where={"video_id": {"$in": [1, 2]}})
+    assert {meta["video_id"] for meta in result["metadatas"][0]} == {1, 2}
+    assert len(result["ids"][0]) == 20
+
+    index.delete(where={"video_id": 0})
+    assert index.count() == 40
+    assert "frame_0" not in index.query(vectors[:1], n_results=50)["ids"][0]
+
+
+def test_other_instances_see_appended_vectors(tmp_path):
+    writer, vectors = _index_with_vectors(tmp_path, count=10)
+    reader = LocalVectorIndex(tmp_path, dim=8)
+    writer.add(vectors[:1] * 2, [{"video_id": 9}], ["frame_new"])
+    assert reader.count() == 11
+    assert reader.query(vectors[:1] * 2, n_results=1)["ids"] == [["frame_new"]]
+    # 同一 id 重复写入时，旧的行不再返回
+    writer.add(vectors[:1] * 3, [{"video_id": 9}], ["frame_new"])
+    assert reader.count() == 11
+    assert reader.get(where={"video_id": 9})["ids"] == ["frame_new"]
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"video_id": 1}, True),
+    ({"video_id": {"$ne": 1}}, False),
+    ({"video_id": {"$in": [2, 3]}}, False),
+    ({"$and": [{"video_id": 1}, {"kind": "frame"}]}, True),
+    ({"$or": [{"video_id": 2}, {"kind": "video"}]}, False),
+    ({"kind": {"$nin": ["video"]}}, True),
+])
+def test_where_filter_subset(where, expected):
+    assert _matches({"video_id": 1, "kind": "frame"}, where) is expected
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.services import video_processing
+from app.services.video_processing import StreamedFrame, extract_media
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    info = {"width": 640, "height": 360, "duration": 1.2, "has_audio": True}
+    monkeypatch.setattr(video_processing, "probe_video", lambda path: dict(info))
+    commands = []
+
+    def fake_frames(command, width, height, interval_seconds, buffer_count, error_label):
+        commands.append(command)
+        cover = next(arg for arg in command if arg.endswith("cover.jpg"))
+        open(cover, "wb").close()
+        for i in range(4):
+            yield StreamedFrame(index=i, timestamp=i * interval_seconds, image=np.zeros((height, width, 3), np.uint8))
+
+    monkeypatch.setattr(video_processing, "_iter_piped_frames", fake_frames)
+    path = tmp_path / "clip.mp4"
+    path.touch()
+    return path, info, commands
+
+
+def test_single_command_produces_frames_cover_and_audio(video):
+    path, _, commands = video
+    extraction = extract_media(path, interval_seconds=5, cover_time=1.0)
+    frames = list(extraction.frames())
+
+    command = commands[0]
+    assert command.count("-i") == 1
+    assert "fps=1/5" in command[command.index("-filter_complex") + 1]
+    # 视频只有 1.2s，封面取中间位置
+    assert "trim=start=0.6:" in command[command.index("-filter_complex") + 1]
+    assert command[command.index("0:a:0") + 1:][-1] == str(path.with_suffix(".wav"))
+    assert [frame.image.shape for frame in frames[:1]] == [(224, 398, 3)]
+    assert extraction.frame_count == 4
+    assert extraction.cover_path == path.parent / "clip" / "cover.jpg"
+    assert set(extraction.timings) == {"cover", "first_frame", "frames", "audio", "total"}
+
+
+def test_audio_can_be_left_out(video):
+    path, info, commands = video
+    extraction = extract_media(path, include_audio=False)
+    list(extraction.frames())
+    assert extraction.audio_path is None
+    assert "0:a:0" not in commands[0]
+
+    info["has_audio"] = False
+    assert extract_media(path).audio_path is None
+
+
+def test_frame_filter_uses_candidate_rate(video):
+    path, _, commands = video
+    extraction = extract_media(path, frame_filter=lambda frame: frame.index % 2 == 0, candidate_fps=2)
+    kept = [frame.index for frame in extraction.frames()]
+    assert kept == [0, 2]
+    assert "fps=1/0.5" in commands[0][commands[0].index("-filter_complex") + 1]
+    assert (extraction.candidate_count, extraction.frame_count) == (4, 2)
@@ -0,0 +1,72 @@
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import pytest
+
+from app.core.config import settings
+from app.services import transcription
+from app.services.model_client import ModelClient, ModelServerTimeout
+from app.services.model_server import ModelServer
+
+
+def _serve(listener: Listener, replies: list):
+    """依次接受连接：replies 中为 None 的连接收到请求后不回复（模拟卡住的服务）。"""
+    for reply in replies:
+        conn = listener.accept()
+        method, args = conn.recv()
+        if reply is not None:
+            conn.send(("ok", reply))
+        else:
+            time.sleep(1)
+        conn.close()
+
+
+def test_client_times_out_and_reconnects(tmp_path):
+    address = str(tmp_path / "model.sock")
+    with Listener(address, family="AF_UNIX", authkey=b"secret") as listener:
+        threading.Thread(target=_serve, args=(listener, [None, {"pid": 1}]), daemon=True).start()
+        client = ModelClient(address, "secret", timeout=0.2)
+
+        started = time.perf_counter()
+        with pytest.raises(ModelServerTimeout, match="stats"):
+            client.stats()
+        assert time.perf_counter() - started < 1
+
+        # 超时的连接被丢弃，下一次调用使用新连接，不会读到上一次的迟到结果
+        assert client.stats() == {"pid": 1}
+
+
+def test_transcribe_uses_its_own_timeout(monkeypatch):
+    client = ModelClient("/tmp/model.sock", "secret", timeout=1, transcribe_timeout=3600)
+    calls = []
+    monkeypatch.setattr(client, "_call", lambda method, *args, timeout=None: calls.append((method, timeout)))
+    client.transcribe("/media/a.wav")
+    client.embed_texts(["a"])
+    assert calls == [("transcribe", 3600), ("embed_texts", None)]
+
+
+@pytest.mark.parametrize("concurrency, expected_peak", [(1, 1), (3, 3)])
+def test_transcriptions_run_up_to_configured_concurrency(monkeypatch, concurrency, expected_peak):
+    monkeypatch.setattr(settings, "MODEL_SERVER_TRANSCRIBE_CONCURRENCY", concurrency)
+    server = ModelServer("127.0.0.1:9123", "secret")
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def fake_transcribe(path):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.1)
+        with lock:
+            active[0] -= 1
+        return {"text": str(path)}
+
+    monkeypatch.setattr(transcription, "transcribe_audio", fake_transcribe)
+    threads = [threading.Thread(target=server.transcribe, args=(f"/media/{i}.wav",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == expected_peak
+    assert server._transcriptions == 4
+    assert server._active_transcriptions == 0
@@ -0,0 +1,17 @@
+import pytest
+
+from app.services.model_client import ModelClient
+from app.services.model_server import ModelServer
+
+
+@pytest.mark.parametrize("address", ["/tmp/model.sock", "127.0.0.1:9123"])
+def test_refuses_to_start_without_authkey(address):
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        ModelServer(address, "")
+    with pytest.raises(ValueError, match="MODEL_SERVER_AUTHKEY"):
+        ModelClient(address, "")
+
+
+def test_uses_configured_authkey():
+    assert ModelServer("127.0.0.1:9123", "s3cret").authkey == b"s3cret"
+    assert ModelClient("/tmp/model.sock", "s3cret").authkey == b"s3cret"
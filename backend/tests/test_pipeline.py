@@ -0,0 +1,94 @@
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.video_processing import StreamedFrame
+from app.tasks import pipeline
+
+
+class _FakeExtraction:
+    """代替 MediaExtraction：不启动 ffmpeg，产出固定数量的帧并记录已解码的帧数。"""
+
+    def __init__(self, tmp_path: Path, frames: int):
+        self.info = {"has_audio": True, "duration": frames}
+        self.frames_dir = tmp_path
+        self.audio_path = None
+        self.frame_count = 0
+        self.timings = {"frames": 0.0}
+        self.total = frames
+        self.decoded = 0
+
+    def frames(self):
+        image = np.zeros((4, 4, 3), dtype=np.uint8)
+        for i in range(self.total):
+            self.decoded += 1
+            self.frame_count += 1
+            yield StreamedFrame(i, float(i), image)
+
+
+@pytest.fixture
+def fake_stages(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CLIP_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "SAVE_FRAME_THUMBNAILS", False)
+    monkeypatch.setattr(settings, "FRAME_SAMPLING_MODE", "fixed")
+    monkeypatch.setattr(pipeline, "_configure_torch_threads", lambda: None)
+    extraction = _FakeExtraction(tmp_path, frames=200)
+    monkeypatch.setattr(pipeline, "_create_extraction", lambda *args, **kwargs: extraction)
+    audio_path = tmp_path / "audio.wav"
+    monkeypatch.setattr(pipeline, "extract_audio", lambda video_path: audio_path)
+    transcribed = {}
+
+    def transcribe(video_id, path, timings, index_subtitles):
+        transcribed["audio_path"] = path
+        return 0
+
+    monkeypatch.setattr(pipeline, "_transcribe_and_persist", transcribe)
+    return extraction, audio_path, transcribed
+
+
+def test_decode_is_bounded_by_slow_embedding(monkeypatch, fake_stages):
+    extraction, audio_path, transcribed = fake_stages
+    max_ahead = 0
+
+    def slow_embed(frames, video_id, video_filename, thumbnails_dir, timings):
+        nonlocal max_ahead
+        consumed = 0
+        for _ in frames:
+            consumed += 1
+            max_ahead = max(max_ahead, extraction.decoded - consumed)
+            time.sleep(0.001)
+        return consumed
+
+    monkeypatch.setattr(pipeline, "_embed_frames", slow_embed)
+    result = pipeline.run_video_pipeline(1, Path("video.mp4"), "video.mp4", index_subtitles=lambda video_id: None)
+
+    assert result["frames"] == 200
+    # 队列容量 2 * CLIP_BATCH_SIZE，另有一帧可能正在入队
+    assert max_ahead <= 2 * settings.CLIP_BATCH_SIZE + 1
+    assert transcribed["audio_path"] == audio_path
+
+
+def test_embedding_failure_stops_decoding(monkeypatch, fake_stages):
+    extraction, _, _ = fake_stages
+
+    def failing_embed(frames, *args):
+        next(iter(frames))
+        raise RuntimeError("embedding failed")
+
+    monkeypatch.setattr(pipeline, "_embed_frames", failing_embed)
+    finished = threading.Event()
+
+    def run():
+        with pytest.raises(RuntimeError, match="embedding failed"):
+            pipeline.run_video_pipeline(1, Path("video.mp4"), "video.mp4", index_subtitles=lambda video_id: None)
+        finished.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert finished.is_set(), "decoding stayed blocked on the full frame queue"
+    assert extraction.decoded < extraction.total
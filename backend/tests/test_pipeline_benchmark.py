@@ -0,0 +1,56 @@
+import wave
+
+import numpy as np
+
+from benchmarks.pipeline_benchmark import StubModels, compare
+
+
+def _report(fps: float, p95: float, rss: float, config: dict | None = None) -> dict:
+    return {
+        "config": config or {"videos": 4},
+        "revision": {"commit": "abc123"},
+        "stages": {"embed": {"frames_per_sec": fps, "seconds": 10.0}},
+        "search": {"text": {"c8": {"qps": 100.0, "p95_ms": p95}}},
+        "memory": {"peak_rss_mb": rss},
+    }
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    result = compare(_report(fps=80.0, p95=12.0, rss=500.0), _report(fps=100.0, p95=10.0, rss=505.0), tolerance=0.1)
+    assert result["baseline_commit"] == "abc123"
+    assert {item["metric"] for item in result["regressions"]} == {
+        "stages.embed.frames_per_sec", "search.text.c8.p95_ms",
+    }
+    assert result["improvements"] == []
+    assert "config_mismatch" not in result
+
+
+def test_compare_reports_improvements_and_config_changes():
+    result = compare(_report(fps=150.0, p95=5.0, rss=500.0, config={"videos": 8}),
+                     _report(fps=100.0, p95=10.0, rss=500.0), tolerance=0.1)
+    assert result["regressions"] == []
+    assert {item["metric"]: item["change"] for item in result["improvements"]} == {
+        "stages.embed.frames_per_sec": 0.5, "search.text.c8.p95_ms": -0.5,
+    }
+    assert result["config_mismatch"] is True
+
+
+def test_stub_models_are_deterministic(tmp_path):
+    models = StubModels(dim=8)
+    np.testing.assert_array_equal(models.embed_texts(["red car"]), StubModels(dim=8).embed_texts(["red car"]))
+    frames = [np.zeros((32, 32, 3), np.uint8), np.full((32, 32, 3), 255, np.uint8)]
+    vectors = models.embed_images(frames)
+    assert vectors.shape == (2, 8)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+    # 前 4 秒静音，后 4 秒有声音：只有有声音的部分生成字幕
+    audio = np.concatenate([np.zeros(16000 * 4), np.sin(np.arange(16000 * 4) / 5) * 8000]).astype(np.int16)
+    path = tmp_path / "audio.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(audio.tobytes())
+    segments = models.transcribe(path)["segments"]
+    assert segments and all(segment["end"] > 4.0 for segment in segments)
+    assert segments == StubModels(dim=8).transcribe(path)["segments"]
@@ -0,0 +1,52 @@
+import pytest
+
+from app.core.config import settings
+from app.tasks.routing import (
+    QUEUE_EMBED,
+    QUEUE_EXTRACT,
+    QUEUE_FAST,
+    QUEUE_INDEX,
+    QUEUE_TRANSCRIBE,
+    QUEUE_VIDEO,
+    priority_for,
+    queue_for,
+)
+
+
+@pytest.mark.parametrize("stage, long_queue", [
+    ("process", QUEUE_VIDEO),
+    ("extract", QUEUE_EXTRACT),
+    ("transcribe", QUEUE_TRANSCRIBE),
+    ("embed", QUEUE_EMBED),
+])
+def test_queue_for_fast_lane_threshold(monkeypatch, stage, long_queue):
+    monkeypatch.setattr(settings, "FAST_LANE_MAX_SECONDS", 600)
+    assert queue_for(stage, 0) == QUEUE_FAST
+    assert queue_for(stage, 600) == QUEUE_FAST
+    assert queue_for(stage, 600.5) == long_queue
+    # 时长未知时按长视频处理
+    assert queue_for(stage, None) == long_queue
+
+
+@pytest.mark.parametrize("stage", ["index", "finalize", "clone"])
+def test_queue_for_light_stages_use_index_queue(stage):
+    assert queue_for(stage, 10) == QUEUE_INDEX
+    assert queue_for(stage, None) == QUEUE_INDEX
+
+
+@pytest.mark.parametrize("duration, priority", [
+    (0, 0),
+    (60, 0),
+    (61, 1),
+    (120, 1),
+    (121, 2),
+    (240, 2),
+    (241, 3),
+    (60 * 2 ** 8, 8),
+    (60 * 2 ** 8 + 1, 9),
+    (60 * 2 ** 9, 9),
+    (24 * 3600, 9),
+    (None, 5),
+])
+def test_priority_for_log2_steps(duration, priority):
+    assert priority_for(duration) == priority
@@ -0,0 +1,64 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.database.base import Base
+from app.models.stage_metric import VideoStageMetric
+from app.models.video import Video
+from app.services.metrics import render_latest, time_search_backend
+from app.services.stage_metrics import record_stage_metrics
+from app.tasks.pipeline import StageTimings
+
+
+def _sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_timings_accumulate_and_share_offset():
+    timings = StageTimings(offset=100.0)
+    for _ in range(2):
+        with timings.stage("embed"):
+            pass
+    timings.add_items("embed", 3)
+    timings.add_items("embed", 4)
+    timings.record("decode", start=101.5, seconds=2.0, items=10)
+
+    records = {record["stage"]: record for record in timings.records()}
+    assert records["embed"]["items"] == 7
+    assert records["embed"]["start"] >= 100.0
+    assert records["decode"] == {"stage": "decode", "start": 101.5, "seconds": 2.0, "items": 10}
+    assert records["total"]["seconds"] >= 100.0
+    assert "total" not in {record["stage"] for record in timings.records(include_total=False)}
+
+
+def test_record_stage_metrics_writes_rows_and_histograms():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    before = _sample("video_pipeline_stage_seconds_count", {"stage": "transcribe"})
+    items_before = _sample("video_pipeline_stage_items_total", {"stage": "transcribe"})
+    with Session(engine) as db:
+        db.add(Video(id=1, filename="a.mp4"))
+        record_stage_metrics(db, 1, [
+            {"stage": "transcribe", "start": 0.5, "seconds": 12.0, "items": 40},
+            {"stage": "total", "start": 0.0, "seconds": 13.0, "items": None},
+        ])
+        db.commit()
+        rows = db.execute(select(VideoStageMetric.stage, VideoStageMetric.seconds, VideoStageMetric.items)
+                          .order_by(VideoStageMetric.id)).all()
+    assert [tuple(row) for row in rows] == [("transcribe", 12.0, 40), ("total", 13.0, None)]
+    assert _sample("video_pipeline_stage_seconds_count", {"stage": "transcribe"}) == before + 1
+    assert _sample("video_pipeline_stage_items_total", {"stage": "transcribe"}) == items_before + 40
+
+
+def test_search_backend_timer_labels_errors():
+    labels = {"endpoint": "test", "backend": "text", "status": "error"}
+    before = _sample("search_backend_seconds_count", labels)
+    with pytest.raises(RuntimeError):
+        with time_search_backend("test", "text"):
+            raise RuntimeError("down")
+    assert _sample("search_backend_seconds_count", labels) == before + 1
+
+    body, content_type = render_latest()
+    assert content_type.startswith("text/plain")
+    assert b'search_backend_seconds_count{backend="text",endpoint="test",status="error"}' in body
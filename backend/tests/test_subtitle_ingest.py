@@ -0,0 +1,75 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.base import Base
+from app.models.video import Video
+from app.services.search_engine_service import ElasticsearchTextBackend
+from app.services.subtitle_store import bulk_insert_subtitles, iter_subtitle_documents
+
+
+class FakeBulkClient:
+    """记录 bulk 请求与同时在途的请求数；statuses 按文档 id 给出每次尝试的状态码。"""
+
+    def __init__(self, statuses: dict[int, list[int]] | None = None):
+        self.statuses = statuses or {}
+        self.requests: list[list[int]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def bulk(self, operations):
+        ids = [op["index"]["_id"] for op in operations[::2]]
+        self.requests.append(ids)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        items = []
+        for id_ in ids:
+            attempts = self.statuses.get(id_, [])
+            items.append({"index": {"status": attempts.pop(0) if attempts else 201}})
+        return {"items": items}
+
+
+def test_bulk_insert_and_chunked_read_back():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Video(id=1, filename="a.mp4"))
+        segments = [{"start": float(i), "end": i + 1.0, "text": f"line {i}"} for i in range(7)]
+        ids = bulk_insert_subtitles(db, 1, segments, chunk_size=3)
+        db.commit()
+        assert len(ids) == 7 and ids == sorted(ids)
+
+        chunks = list(iter_subtitle_documents(db, 1, chunk_size=3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert [doc["text"] for chunk in chunks for doc in chunk] == [f"line {i}" for i in range(7)]
+        assert [doc["id"] for chunk in chunks for doc in chunk] == ids
+
+
+def test_indexer_bounds_in_flight_requests():
+    backend = ElasticsearchTextBackend()
+    backend._client = client = FakeBulkClient()
+    docs = [{"id": i, "video_id": 1, "start_time": float(i), "text": "x"} for i in range(25)]
+    batches = [docs[i:i + 7] for i in range(0, 25, 7)]
+
+    totals = asyncio.run(backend.index_subtitle_batches(batches, chunk_size=4, concurrency=2))
+    assert totals == {"indexed": 25, "failed": 0, "errors": []}
+    assert [len(ids) for ids in client.requests] == [4, 4, 4, 4, 4, 4, 1]
+    assert client.max_in_flight == 2
+
+
+def test_indexer_retries_only_transient_failures(monkeypatch):
+    monkeypatch.setattr(settings, "ES_BULK_RETRY_BACKOFF_SECONDS", 0)
+    backend = ElasticsearchTextBackend()
+    # 文档 1 先返回 429 再成功；文档 2 是映射错误，不重试；文档 3 一直 503；文档 4 先返回 500 再成功
+    backend._client = client = FakeBulkClient({1: [429], 2: [400], 3: [503] * 10, 4: [500]})
+    docs = [{"id": i, "video_id": 1, "start_time": 0.0, "text": "x"} for i in range(5)]
+
+    totals = asyncio.run(backend.index_subtitle_batches([docs], chunk_size=10, max_retries=2))
+    assert totals["indexed"] == 3
+    assert totals["failed"] == 2
+    assert {error["id"] for error in totals["errors"]} == {2, 3}
+    assert client.requests == [[0, 1, 2, 3, 4], [1, 3, 4], [3]]
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.services.text_embedding_batcher import TextEmbeddingBatcher
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    batcher = TextEmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(*(batcher.embed(text) for text in ["a", "bb", "a", "ccc"]))
+
+    assert asyncio.run(main()) == [[1.0], [2.0], [1.0], [3.0]]
+    # 重复的查询在同一批中只计算一次
+    assert calls == [["a", "bb", "ccc"]]
+    assert batcher.stats()["requests"] == 4
+    assert batcher.stats()["batches"] == 1
+
+
+def test_batches_are_capped_at_max_batch_size():
+    sizes = []
+
+    def encode(texts):
+        sizes.append(len(texts))
+        return [[0.0] for _ in texts]
+
+    batcher = TextEmbeddingBatcher(encode, max_batch_size=3, max_wait_ms=50)
+
+    async def main():
+        await asyncio.gather(*(batcher.embed(f"query {i}") for i in range(7)))
+
+    asyncio.run(main())
+    assert sizes == [3, 3, 1]
+
+
+def test_encoder_error_is_raised_to_every_waiter_and_batcher_recovers():
+    fail = [True]
+
+    def encode(texts):
+        if fail[0]:
+            raise RuntimeError("model unavailable")
+        return [[1.0] for _ in texts]
+
+    batcher = TextEmbeddingBatcher(encode, max_batch_size=4, max_wait_ms=20)
+
+    async def main():
+        results = await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        fail[0] = False
+        return await batcher.embed("a")
+
+    assert asyncio.run(main()) == [1.0]
+
+
+def test_batcher_rebinds_to_a_new_event_loop():
+    batcher = TextEmbeddingBatcher(lambda texts: [[1.0] for _ in texts], max_wait_ms=1)
+    # 每次 asyncio.run 都是新的事件循环（例如测试或 worker 中多次调用）
+    for _ in range(2):
+        assert asyncio.run(batcher.embed("x")) == [1.0]
+
+
+def test_unexpected_batch_errors_fail_only_that_batch():
+    calls = []
+
+    def encode(texts):
+        calls.append(texts)
+        # 第一批返回的向量条数不对，在逐条分发结果时才会发现
+        return [] if len(calls) == 1 else [[1.0] for _ in texts]
+
+    batcher = TextEmbeddingBatcher(encode, max_batch_size=4, max_wait_ms=5)
+
+    async def main():
+        with pytest.raises(ValueError):
+            await asyncio.wait_for(batcher.embed("a"), 1)
+        return await asyncio.wait_for(batcher.embed("b"), 1)
+
+    assert asyncio.run(main()) == [1.0]
+
+
+def test_dead_worker_is_restarted_and_in_flight_batch_is_cancelled():
+    release = threading.Event()
+
+    def encode(texts):
+        release.wait(1)
+        return [[1.0] for _ in texts]
+
+    batcher = TextEmbeddingBatcher(encode, max_batch_size=4, max_wait_ms=1)
+
+    async def main():
+        waiter = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.sleep(0.05)
+        batcher._worker.cancel()
+        # 后台协程退出时，正在处理的请求被取消，而不是一直挂起
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, 1)
+        release.set()
+        return await asyncio.wait_for(batcher.embed("b"), 1)
+
+    assert asyncio.run(main()) == [1.0]
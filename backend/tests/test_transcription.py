@@ -0,0 +1,140 @@
+import multiprocessing
+import wave
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import transcription
+from app.services.transcription import SAMPLE_RATE, _merge_chunk_segments, find_split_points, read_wav
+
+
+def _write_wav(path, samples: np.ndarray):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.astype(np.int16).tobytes())
+
+
+def test_split_points_land_in_silence():
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, SAMPLE_RATE * 90).astype(np.float32)
+    # 下一个目标切分点从上一个切分点起算 30s：33s 处切分后，在 63s 前后寻找静音
+    for silence in (33, 62):
+        audio[silence * SAMPLE_RATE:(silence + 1) * SAMPLE_RATE] = 0
+    points = find_split_points(audio, chunk_seconds=30, search_seconds=5)
+    assert len(points) == 2
+    for point, silence in zip(points, (33, 62)):
+        assert silence * SAMPLE_RATE <= point < (silence + 1) * SAMPLE_RATE
+
+
+def test_split_points_for_short_audio():
+    assert find_split_points(np.zeros(SAMPLE_RATE * 20, dtype=np.float32), chunk_seconds=30) == []
+    assert find_split_points(np.zeros(10, dtype=np.float32), chunk_seconds=30) == []
+
+
+def test_merge_keeps_each_segment_once_on_global_timeline():
+    chunk_results = [
+        # (offset, own_start, own_end, segments)：分块读取了 [0, 32)，拥有 [0, 30)
+        (0.0, 0.0, 30.0, [
+            {"start": 0.0, "end": 4.0, "text": " first"},
+            {"start": 28.0, "end": 31.0, "text": " boundary"},
+            {"start": 30.5, "end": 32.0, "text": " overlap"},
+        ]),
+        # 分块读取了 [28, 60)，拥有 [30, 60)
+        (28.0, 30.0, 60.0, [
+            {"start": 0.0, "end": 3.0, "text": " boundary"},
+            {"start": 2.5, "end": 4.0, "text": " overlap"},
+            {"start": 10.0, "end": 12.0, "text": " last"},
+        ]),
+    ]
+    merged = _merge_chunk_segments(chunk_results)
+    assert [(s["start"], s["end"], s["text"]) for s in merged] == [
+        (0.0, 4.0, " first"),
+        (28.0, 31.0, " boundary"),
+        (30.5, 32.0, " overlap"),
+        (38.0, 40.0, " last"),
+    ]
+    assert [s["id"] for s in merged] == [0, 1, 2, 3]
+
+
+def test_read_wav_range(tmp_path):
+    samples = (np.arange(1000) - 500).astype(np.int16)
+    path = tmp_path / "audio.wav"
+    _write_wav(path, samples)
+    chunk = read_wav(path, 100, 200)
+    np.testing.assert_allclose(chunk, samples[100:200] / 32768.0)
+    assert len(read_wav(path, 900, 5000)) == 100
+
+
+class _SingleCallModels:
+    @staticmethod
+    def transcribe(audio):
+        return {"text": "single", "segments": []}
+
+
+def _transcribe_in_child(path, results):
+    try:
+        results.put(transcription.transcribe_audio(path)["text"])
+    except BaseException as e:
+        results.put(repr(e))
+
+
+def test_long_audio_in_daemonic_process_falls_back_to_single_call(tmp_path, monkeypatch):
+    path = tmp_path / "long.wav"
+    _write_wav(path, np.zeros(SAMPLE_RATE * 3))
+    monkeypatch.setattr(settings, "WHISPER_LONG_AUDIO_SECONDS", 1)
+    monkeypatch.setattr(settings, "WHISPER_CHUNK_WORKERS", 0)
+    monkeypatch.setattr(transcription, "get_model_client", lambda: None)
+    monkeypatch.setattr(transcription, "models_loader", _SingleCallModels)
+
+    # 与 Celery prefork 的 worker 子进程一样：fork 出的 daemon 进程
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_transcribe_in_child, args=(path, results), daemon=True)
+    child.start()
+    child.join(timeout=30)
+    assert results.get(timeout=5) == "single"
+
+    # 非 daemon 进程仍走分块并行
+    monkeypatch.setattr(transcription, "transcribe_chunked", lambda audio_path: {"text": "chunked"})
+    assert transcription.transcribe_audio(path)["text"] == "chunked"
+
+
+class _RecordingPool:
+    created = []
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        self.max_workers, self.initargs = max_workers, initargs
+        _RecordingPool.created.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result([])
+        return future
+
+
+def test_chunk_workers_share_the_configured_thread_budget(tmp_path, monkeypatch):
+    path = tmp_path / "long.wav"
+    _write_wav(path, np.zeros(SAMPLE_RATE * 40))
+    monkeypatch.setattr(settings, "WHISPER_CHUNK_SECONDS", 5)
+    monkeypatch.setattr(settings, "WHISPER_CHUNK_WORKERS", 0)
+    monkeypatch.setattr(transcription, "ProcessPoolExecutor", _RecordingPool)
+    _RecordingPool.created.clear()
+
+    # 例如 fused 流水线中分给转写阶段的 4 个线程
+    monkeypatch.setattr(transcription, "_thread_budget", lambda: 4)
+    transcription.transcribe_chunked(path)
+    assert (_RecordingPool.created[-1].max_workers, _RecordingPool.created[-1].initargs) == (2, (2,))
+
+    # 显式配置的进程数不超过线程预算
+    monkeypatch.setattr(settings, "WHISPER_CHUNK_WORKERS", 8)
+    transcription.transcribe_chunked(path)
+    assert (_RecordingPool.created[-1].max_workers, _RecordingPool.created[-1].initargs) == (4, (1,))
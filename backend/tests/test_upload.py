@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from app.core.config import settings
+from app.services import upload_service
+from app.services.upload_service import UploadError, save_upload
+
+BOUNDARY = "----benchmarkboundary"
+
+
+def _multipart(content: bytes, filename: str = "clip.mp4") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nholiday\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: video/mp4\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _headers(body: bytes, content_length: bool = True) -> dict:
+    headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if content_length:
+        headers["content-length"] = str(len(body))
+    return headers
+
+
+async def _chunks(body: bytes, size: int = 1000, consumed: list | None = None):
+    for start in range(0, len(body), size):
+        if consumed is not None:
+            consumed.append(start)
+        yield body[start:start + size]
+
+
+@pytest.fixture(autouse=True)
+def media_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "MEDIA_PATH", str(tmp_path))
+    monkeypatch.setattr(upload_service, "probe_video", lambda path: {"duration": 1.0})
+    return tmp_path
+
+
+def test_streams_file_part_to_disk(media_dir):
+    content = bytes(range(256)) * 100
+    body = _multipart(content)
+    upload = asyncio.run(save_upload(_headers(body), _chunks(body)))
+
+    assert upload.filename == "clip.mp4"
+    assert upload.size == len(content)
+    assert upload.content_hash == hashlib.sha256(content).hexdigest()
+    assert upload.path.read_bytes() == content
+    assert [path.name for path in media_dir.iterdir()] == [upload.path.name]
+
+
+def test_rejects_oversized_content_length_without_reading(media_dir):
+    body = _multipart(b"x" * 100_000)
+    consumed = []
+    with pytest.raises(UploadError) as error:
+        asyncio.run(save_upload(_headers(body), _chunks(body, consumed=consumed), max_bytes=1000))
+    assert error.value.status_code == 413
+    assert consumed == []
+
+
+def test_rejects_oversized_stream_and_removes_partial_file(media_dir):
+    body = _multipart(b"x" * 200_000)
+    with pytest.raises(UploadError) as error:
+        asyncio.run(save_upload(_headers(body, content_length=False), _chunks(body), max_bytes=50_000))
+    assert error.value.status_code == 413
+    assert list(media_dir.iterdir()) == []
+
+
+def test_requires_file_field(media_dir):
+    body = (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nholiday\r\n"
+            f"--{BOUNDARY}--\r\n").encode()
+    with pytest.raises(UploadError, match="No file"):
+        asyncio.run(save_upload(_headers(body), _chunks(body)))
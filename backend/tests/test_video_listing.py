@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.api.videos import get_video_list, get_video_subtitles
+from app.database.base import Base
+from app.models.subtitle import Subtitle
+from app.models.video import Video
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "videos.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    created = datetime(2026, 1, 1)
+    with Session(engine) as db:
+        # 视频 3 与 4 的上传时间相同，分页时按 id 区分
+        db.add_all([
+            Video(id=i, filename=f"{i}.mp4", filepath=f"stored_{i}.mp4",
+                  created_at=created + timedelta(minutes=min(i, 3)))
+            for i in range(1, 6)
+        ])
+        db.add_all([Subtitle(video_id=1, start_time=float(t), end_time=t + 1.0, text=f"line {t}") for t in range(10)])
+        # 视频 2 有多条开始时间相同的字幕，跨越分页边界
+        db.add_all([Subtitle(video_id=2, start_time=float(t), end_time=t + 1.0, text=f"{t}-{i}")
+                    for t, count in ((0, 2), (1, 5), (2, 1)) for i in range(count)])
+        db.commit()
+    engine.dispose()
+    return path
+
+
+def _call(db_path, endpoint, **kwargs):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            async with AsyncSession(engine) as db:
+                return await endpoint(db=db, **kwargs)
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def test_keyset_pages_cover_every_video_once(db_path):
+    seen, cursor = [], None
+    while True:
+        page = _call(db_path, get_video_list, limit=2, cursor=cursor)
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [5, 4, 3, 2, 1]
+    assert page["items"][-1]["cover_url"].endswith("/media/stored_1/cover.jpg")
+
+
+def test_invalid_cursor_is_rejected(db_path):
+    with pytest.raises(HTTPException) as exc_info:
+        _call(db_path, get_video_list, limit=2, cursor="not-a-cursor")
+    assert exc_info.value.status_code == 400
+
+
+def _subtitle_pages(db_path, video_id, limit, **window):
+    pages, cursor = [], None
+    while True:
+        page = _call(db_path, get_video_subtitles, video_id=video_id, limit=limit, cursor=cursor, **window)
+        pages.append([s["text"] for s in page["subtitles"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_subtitle_window_pages_follow_cursor(db_path):
+    assert _subtitle_pages(db_path, 1, 4, start=2.0, end=9.0) == [
+        ["line 2", "line 3", "line 4", "line 5"], ["line 6", "line 7", "line 8"],
+    ]
+
+
+def test_subtitles_sharing_a_start_time_are_paged_once(db_path):
+    # 同一时刻的字幕超过 limit 条时也能继续翻页，每条只返回一次
+    pages = _subtitle_pages(db_path, 2, 3, start=0.0, end=None)
+    assert pages == [["0-0", "0-1", "1-0"], ["1-1", "1-2", "1-3"], ["1-4", "2-0"]]
+
+
+def test_invalid_subtitle_cursor_is_rejected(db_path):
+    with pytest.raises(HTTPException) as exc_info:
+        _call(db_path, get_video_subtitles, video_id=1, start=0.0, end=None, limit=2, cursor="bad")
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.services.video_processing import StreamedFrame
+from app.services.video_summaries import VideoSummaryBuilder
+from app.services.visual_search import group_frame_hits
+from app.tasks.pipeline import _frame_metadata
+
+
+def _hits(metadatas: list[dict]) -> dict:
+    return {
+        "ids": [[f"frame_{i}" for i in range(len(metadatas))]],
+        "metadatas": [metadatas],
+        "distances": [[0.1 * i for i in range(len(metadatas))]],
+    }
+
+
+def test_fixed_sampling_frames_have_no_scene():
+    frame = StreamedFrame(index=0, timestamp=5.0, image=np.zeros((2, 2, 3), dtype=np.uint8))
+    metadata = _frame_metadata(frame, video_id=1, video_filename="a.mp4", with_thumbnail=False)
+    assert "scene" not in metadata
+
+    frame.scene = 3
+    assert _frame_metadata(frame, 1, "a.mp4", with_thumbnail=True)["scene"] == 3
+
+
+def test_group_fixed_mode_keeps_frames_per_video():
+    # 固定间隔抽帧：没有镜头编号，只按时间间隔去重
+    metadatas = [{"video_id": 1, "timestamp_approx": 5.0 * i} for i in range(10)]
+    groups = group_frame_hits(_hits(metadatas), size=10, frames_per_video=3, min_gap_seconds=10.0)
+    assert len(groups) == 1
+    assert [frame["timestamp_approx"] for frame in groups[0]["frames"]] == [0.0, 10.0, 20.0]
+
+
+def test_group_adaptive_mode_dedups_same_scene():
+    metadatas = [
+        {"video_id": 1, "timestamp_approx": 0.0, "scene": 0},
+        {"video_id": 1, "timestamp_approx": 30.0, "scene": 0},
+        {"video_id": 1, "timestamp_approx": 60.0, "scene": 1},
+        {"video_id": 2, "timestamp_approx": 0.0, "scene": 0},
+    ]
+    groups = group_frame_hits(_hits(metadatas), size=10, frames_per_video=3, min_gap_seconds=10.0)
+    assert [group["video_id"] for group in groups] == [1, 2]
+    assert [frame["scene"] for frame in groups[0]["frames"]] == [0, 1]
+
+
+def test_summary_fixed_mode_uses_minute_windows():
+    rng = np.random.default_rng(0)
+    timestamps = [5.0 * i for i in range(36)]  # 3 分钟
+    builder = VideoSummaryBuilder(method="mean", max_segments=16)
+    builder.add(rng.normal(size=(36, 8)), timestamps, [None] * 36)
+    vectors, metadatas, ids = builder.build(7, "a.mp4")
+
+    kinds = [metadata["kind"] for metadata in metadatas]
+    assert kinds == ["video", "scene", "scene", "scene"]
+    assert [(m["start"], m["end"]) for m in metadatas[1:]] == [(0.0, 55.0), (60.0, 115.0), (120.0, 175.0)]
+    assert all("scene" not in metadata for metadata in metadatas)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert ids[0] == "video_7_summary"
@@ -21,11 +21,38 @@ export interface Subtitle {
   text: string;
 }
 
+export interface VideoPage {
+  items: Video[];
+  next_cursor: string | null;
+}
+
+export interface SubtitleWindow {
+  video_id: number;
+  subtitles: Subtitle[];
+  next_cursor: string | null;
+}
+
 export interface SearchResult {
   query: string;
   results: any[];
 }
 
+export interface HybridSearchHit {
+  video_id: number;
+  window_start: number;
+  window_end: number;
+  score: number;
+  sources: { text?: number; visual?: number };
+  subtitles: any[];
+  frames: any[];
+}
+
+export interface HybridSearchResult {
+  query: string;
+  results: HybridSearchHit[];
+  timings: Record<string, { ms: number; status?: string; error?: string }>;
+}
+
 export interface VideoDetail {
   video: Video;
   subtitles: Subtitle[];
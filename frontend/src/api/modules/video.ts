@@ -1,9 +1,14 @@
 import http from '@/api/index';
-import type { Video, Subtitle, VideoDetail, SearchResult } from '@/api/interface/video';
+import type { VideoPage, Subtitle, SubtitleWindow, VideoDetail, SearchResult, HybridSearchResult } from '@/api/interface/video';
 
 // 获取视频列表
-export const getVideoListApi = () => {
-  return http.get<Video[]>(`/api/videos/`);
+export const getVideoListApi = (params: { limit?: number; cursor?: string } = {}) => {
+  return http.get<VideoPage>(`/api/videos/`, { params });
+};
+
+// 按时间窗口获取字幕
+export const getVideoSubtitlesApi = (id: string | number, params: { start?: number; end?: number; limit?: number; cursor?: string }) => {
+  return http.get<SubtitleWindow>(`/api/videos/${id}/subtitles`, { params });
 };
 
 // 获取视频详情
@@ -21,6 +26,11 @@ export const searchImageByTextApi = (query: string) => {
   return http.get<SearchResult>(`/api/search/image-by-text`, { params: { q: query } });
 };
 
+// 混合检索（字幕 + 画面，按视频时间窗口融合）
+export const searchHybridApi = (query: string, size = 10) => {
+  return http.get<HybridSearchResult>(`/api/search/hybrid`, { params: { q: query, size } });
+};
+
 // 上传视频
 export const uploadVideoApi = (formData: FormData) => {
   return http.post<{message: string; video_id: number}>(`/api/videos/upload`, formData, {